@@ -3,7 +3,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin # Pour personnaliser l'admin du modèle User
 from .models import (
-    User, Faculty, Department, Promotion, Teacher, Student, Company, Internship
+    User, Faculty, Department, Promotion, Teacher, Student, Company, Internship, Notification, TransitionStage, Changement,
+    AnneeArchivee, StageArchive,
 )
 from django.utils.translation import gettext_lazy as _ # Pour la traduction dans l'admin
 
@@ -17,12 +18,13 @@ class CustomUserAdmin(UserAdmin):
     """
     # Ajouter les champs de rôle personnalisés aux fieldsets existants ou en créer de nouveaux
     fieldsets = UserAdmin.fieldsets + (
-        (_('Rôles Spécifiques'), {'fields': ('est_facultaire', 'est_enseignant', 'est_etudiant')}),
+        # faculte : limite un compte facultaire à une faculté (vide : toute l'université)
+        (_('Rôles Spécifiques'), {'fields': ('est_facultaire', 'faculte', 'est_enseignant', 'est_etudiant')}),
         # Ajoutez ici d'autres fieldsets si vous ajoutez des champs au modèle User
     )
     # Ajouter les champs de rôle à la liste d'affichage
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'est_facultaire', 'est_enseignant', 'est_etudiant')
-    list_filter = ('is_staff', 'is_superuser', 'is_active', 'est_facultaire', 'est_enseignant', 'est_etudiant')
+    list_filter = ('is_staff', 'is_superuser', 'is_active', 'est_facultaire', 'faculte', 'est_enseignant', 'est_etudiant')
     search_fields = ('username', 'email', 'first_name', 'last_name') # Ajouter la recherche
 
 # Enregistrer le modèle User avec sa personnalisation
@@ -131,7 +133,8 @@ class CompanyAdmin(admin.ModelAdmin):
     Personnalise l'affichage du modèle Company.
     """
     list_display = ('nom', 'personne_contact', 'email_contact', 'telephone_contact')
-    search_fields = ('nom', 'personne_contact', 'email_contact', 'telephone_contact', 'adresse') # Rechercher
+    search_fields = ('nom', 'cle_normalisee', 'personne_contact', 'email_contact', 'telephone_contact', 'adresse') # Rechercher
+    readonly_fields = ('cle_normalisee',) # Calculée à l'enregistrement (voir normalisation.py)
     # list_filter = ('ville', 'pays') # Si vous ajoutez des champs de localisation
 
 admin.site.register(Company, CompanyAdmin)
@@ -180,4 +183,99 @@ class InternshipAdmin(admin.ModelAdmin):
     etudiant__promotion.short_description = _("Promotion")
 
 
-admin.site.register(Internship, InternshipAdmin)
\ No newline at end of file
+admin.site.register(Internship, InternshipAdmin)
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    """
+    Boîte d'envoi des emails : consultation et suivi des échecs (l'envoi est fait par la commande envoyer_notifications).
+    """
+    list_display = ('destinataire', 'evenement', 'statut', 'tentatives', 'date_creation', 'date_envoi')
+    list_filter = ('statut', 'evenement')
+    search_fields = ('destinataire', 'sujet', 'stage__etudiant__nom_complet')
+    readonly_fields = ('stage', 'evenement', 'destinataire', 'sujet', 'corps', 'date_creation', 'date_envoi', 'derniere_erreur')
+    raw_id_fields = ('stage',)
+
+
+admin.site.register(Notification, NotificationAdmin)
+
+
+class TransitionStageAdmin(admin.ModelAdmin):
+    """
+    Journal des transitions de statut, en lecture seule (ajout seul : aucune modification ni suppression).
+    """
+    list_display = ('date', 'stage_id', 'statut_avant', 'statut_apres', 'acteur_id')
+    list_filter = ('statut_apres',)
+    date_hierarchy = 'date'
+    show_full_result_count = False # Évite un COUNT(*) complet sur une table de plusieurs millions de lignes
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(TransitionStage, TransitionStageAdmin)
+
+
+class ChangementAdmin(admin.ModelAdmin):
+    """
+    Flux des changements (synchronisation des systèmes externes), en lecture seule.
+    """
+    list_display = ('id', 'date', 'ressource', 'objet_id', 'operation')
+    list_filter = ('ressource', 'operation')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(Changement, ChangementAdmin)
+
+
+class AnneeArchiveeAdmin(admin.ModelAdmin):
+    """
+    Années académiques archivées (commande archiver_annee), en lecture seule.
+    """
+    list_display = ('annee_academique', 'nb_stages', 'date_archivage')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(AnneeArchivee, AnneeArchiveeAdmin)
+
+
+class StageArchiveAdmin(admin.ModelAdmin):
+    """
+    Étudiants et stages des années archivées, en lecture seule.
+    """
+    list_display = ('matricule', 'nom_complet', 'annee_academique', 'promotion_nom', 'statut', 'note', 'entreprise_nom', 'encadreur_nom')
+    list_filter = ('annee_academique', 'statut')
+    search_fields = ('matricule', 'nom_complet')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(StageArchive, StageArchiveAdmin)
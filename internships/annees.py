@@ -0,0 +1,67 @@
+# gestion_stages_univ/internships/annees.py
+#
+# Année académique de travail des facultaires. Les listes et tableaux de bord ne portent que sur une
+# année à la fois (choisie dans la barre de navigation, gardée en session ; par défaut la plus récente
+# non archivée, ou settings.ANNEE_ACADEMIQUE_COURANTE) au lieu de parcourir toutes les années.
+#
+# - le décorateur perimetre.perimetre_facultaire place l'année de la session dans models.ANNEE_DE_TRAVAIL
+#   (avec la faculté du compte) ;
+# - les gestionnaires `perimetre` de Student, Internship et Promotion filtrent alors par
+#   promotion.annee_academique (index promotion_annee_dep_idx) : changer d'année ne change que ce filtre ;
+# - la liste des années est relue à chaque appel (une requête DISTINCT sur la colonne indexée, archives
+#   exclues en sous-requête) : pas de cache propre au processus, qu'une promotion créée ou une année
+#   archivée dans un autre processus (ex: `manage.py archiver_annee`) laisserait périmé.
+
+from django.conf import settings
+
+from .models import ANNEE_DE_TRAVAIL, TOUTES_LES_ANNEES, AnneeArchivee, Promotion
+
+
+CLE_SESSION = 'annee_academique'
+
+
+def annees_academiques():
+    """Années des promotions non archivées, de la plus récente à la plus ancienne (une requête)."""
+    archivees = AnneeArchivee.objects.values('annee_academique')
+    return list(
+        Promotion.objects.exclude(annee_academique__in=archivees)
+        .order_by('-annee_academique').values_list('annee_academique', flat=True).distinct()
+    )
+
+
+def annee_par_defaut():
+    configuree = getattr(settings, 'ANNEE_ACADEMIQUE_COURANTE', None)
+    if configuree:
+        return configuree
+    annees = annees_academiques()
+    return annees[0] if annees else None
+
+
+def _valider(annee):
+    if annee == TOUTES_LES_ANNEES or annee in annees_academiques():
+        return annee
+    return annee_par_defaut()
+
+
+def annee_de_la_session(request):
+    return _valider(request.session.get(CLE_SESSION))
+
+
+def choisir_annee(request, annee):
+    """Enregistre l'année de travail en session ; retourne False si elle n'est pas proposée."""
+    if annee != TOUTES_LES_ANNEES and annee not in annees_academiques():
+        return False
+    request.session[CLE_SESSION] = annee
+    return True
+
+
+def contexte_annee(request):
+    """Processeur de contexte : sélecteur d'année de la barre de navigation (comptes facultaires)."""
+    utilisateur = getattr(request, 'user', None)
+    if utilisateur is None or not utilisateur.is_authenticated or not utilisateur.est_facultaire:
+        return {}
+    return {
+        'annees_academiques': annees_academiques(),
+        'annee_de_travail': ANNEE_DE_TRAVAIL.get() or annee_de_la_session(request),
+        'toutes_les_annees': TOUTES_LES_ANNEES,
+    }
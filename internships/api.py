@@ -0,0 +1,474 @@
+# gestion_stages_univ/internships/api.py
+#
+# API JSON versionnée (/api/v1/, voir urls_api.py), réservée aux comptes facultaires : lecture des stages,
+# étudiants, enseignants, entreprises et promotions ; écriture des entreprises et des promotions ;
+# changements de statut des stages par les événements du workflow.
+#
+# - Les lignes sont lues avec values_list() (aucune instance de modèle) et seules les colonnes demandées
+#   par ?fields=a,b,c sont sélectionnées : les jointures des champs non demandés ne sont pas faites.
+# - Pagination par clé (?apres=<id>&limite=<n>) : WHERE id > apres ORDER BY id, coût constant quelle que
+#   soit la page, et pas de ligne sautée ou répétée si la table change entre deux pages.
+# - Lecture groupée : ?ids=1,2,3 en une seule requête.
+# - Export complet d'une ressource (/api/v1/<ressource>/export/) écrit par morceaux, et ?format=msgpack si le
+#   paquet est installé : voir serialisation.py.
+# - Flux des changements (/api/v1/changements/?curseur=X) : voir changements.py.
+# - Historique d'une année académique, courante ou archivée (/api/v1/historique/?annee=...) : voir archives.py.
+# - Authentification : session (avec jeton CSRF pour les écritures) ou HTTP Basic pour les systèmes externes.
+# - Un compte limité à une faculté (User.faculte) ne lit et n'écrit que les objets de celle-ci (voir
+#   perimetre.py) ; le flux des changements et l'historique, qui couvrent toute l'université, lui sont refusés.
+# - Les lectures (GET) passent par la réplique de la base si elle est configurée (voir repliques.py) ; un client
+#   par session lit ses propres écritures pendant quelques secondes, un client Basic sans cookie non.
+
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.forms import model_to_dict, modelform_factory
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+
+from . import archives
+from . import changements as flux
+from . import serialisation
+from .forms import CompanyForm, InternshipTransitionForm
+from .models import Company, Internship, Promotion, StageArchive, Student, Teacher
+from .perimetre import dans_le_perimetre, faculte_de_l_utilisateur, restreindre_choix
+from .repliques import base_de_lecture, lecture_replique
+from .workflow import ModificationConcurrente, TransitionInvalide
+
+
+TAILLE_PAGE_DEFAUT = 100
+TAILLE_PAGE_MAX = 1000
+MAX_IDS_PAR_LOT = 500
+METHODES_SURES = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ErreurAPI(Exception):
+    def __init__(self, statut, message, details=None):
+        super().__init__(message)
+        self.statut = statut
+        self.message = message
+        self.details = details
+
+
+class Ressource:
+    """
+    Modèle exposé : nom public de chaque champ -> chemin lu par values_list(), filtres de liste
+    (?parametre=valeur -> champ filtré) et formulaire d'écriture éventuels.
+    """
+
+    def __init__(self, modele, champs, formulaire=None, filtres=None):
+        self.modele = modele
+        self.champs = champs
+        self.formulaire = formulaire
+        self.filtres = filtres or {}
+
+    def objets(self):
+        """Objets accessibles : le périmètre du compte pour les modèles qui en ont un (voir perimetre.py)."""
+        return getattr(self.modele, 'perimetre', self.modele.objects).all()
+
+
+PromotionForm = modelform_factory(Promotion, fields=['departement', 'nom', 'annee_academique'])
+
+RESSOURCES = {
+    'stages': Ressource(Internship, {
+        'id': 'pk',
+        'etudiant': 'etudiant_id',
+        'etudiant_matricule': 'etudiant__matricule',
+        'etudiant_nom': 'etudiant__nom_complet',
+        'statut': 'statut',
+        'entreprise_selectionnee': 'entreprise_selectionnee_id',
+        'encadreur': 'encadreur_id',
+        'note': 'note',
+        'date_proposition_soumise': 'date_proposition_soumise',
+        'date_validation': 'date_validation',
+        'date_encadreur_affecte': 'date_encadreur_affecte',
+        'date_debut': 'date_debut',
+        'date_fin': 'date_fin',
+        'date_notation': 'date_notation',
+        'date_modification': 'date_modification',
+        'version': 'version',
+    }, filtres={'promotion': 'etudiant__promotion_id', 'statut': 'statut', 'encadreur': 'encadreur_id'}),
+    'etudiants': Ressource(Student, {
+        'id': 'pk',
+        'matricule': 'matricule',
+        'nom_complet': 'nom_complet',
+        'promotion': 'promotion_id',
+        'id_inscription_annee': 'id_inscription_annee',
+        'entreprise_proposee_1': 'entreprise_proposee_1_id',
+        'entreprise_proposee_2': 'entreprise_proposee_2_id',
+        'date_modification': 'date_modification',
+    }, filtres={'promotion': 'promotion_id'}),
+    'enseignants': Ressource(Teacher, {
+        'id': 'pk',
+        'matricule': 'matricule',
+        'nom_complet': 'nom_complet',
+        'departement': 'departement_id',
+        'date_modification': 'date_modification',
+    }, filtres={'departement': 'departement_id'}),
+    'entreprises': Ressource(Company, {
+        'id': 'pk',
+        'nom': 'nom',
+        'adresse': 'adresse',
+        'personne_contact': 'personne_contact',
+        'email_contact': 'email_contact',
+        'telephone_contact': 'telephone_contact',
+        'date_modification': 'date_modification',
+    }, formulaire=CompanyForm),
+    'promotions': Ressource(Promotion, {
+        'id': 'pk',
+        'departement': 'departement_id',
+        'nom': 'nom',
+        'annee_academique': 'annee_academique',
+    }, formulaire=PromotionForm, filtres={'departement': 'departement_id', 'annee_academique': 'annee_academique'}),
+}
+
+# Lecture seule, hors RESSOURCES : une année est lue dans les tables courantes et dans les archives
+HISTORIQUE = Ressource(StageArchive, {nom: nom for nom in archives.CHAMPS_ARCHIVE})
+
+
+# --- Authentification et enveloppe des vues ---
+
+def _utilisateur_basic(request):
+    entete = request.headers.get('Authorization', '')
+    type_auth, _, valeur = entete.partition(' ')
+    if type_auth.lower() != 'basic' or not valeur:
+        return None
+    try:
+        identifiant, _, mot_de_passe = base64.b64decode(valeur).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ErreurAPI(401, "En-tête Authorization mal formé.") from None
+    return authenticate(request, username=identifiant, password=mot_de_passe)
+
+
+def _verifier_csrf(request):
+    # Même contrôle que le middleware (désactivé sur ces vues) : seulement pour l'authentification par session
+    verification = CsrfViewMiddleware(lambda r: None)
+    verification.process_request(request)
+    if verification.process_view(request, None, (), {}) is not None:
+        raise ErreurAPI(403, "Jeton CSRF absent ou invalide.")
+
+
+def vue_api(*methodes):
+    """Vue de l'API : méthodes permises, authentification (session ou Basic), rôle facultaire, erreurs en JSON."""
+    def decorateur(vue):
+        @csrf_exempt
+        @lecture_replique
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            try:
+                if request.method not in methodes:
+                    reponse = _reponse_erreur(ErreurAPI(405, f"Méthode {request.method} non permise."))
+                    reponse['Allow'] = ', '.join(methodes)
+                    return reponse
+                if request.user.is_authenticated:
+                    if request.method not in METHODES_SURES:
+                        _verifier_csrf(request)
+                else:
+                    utilisateur = _utilisateur_basic(request)
+                    if utilisateur is None:
+                        reponse = _reponse_erreur(ErreurAPI(401, "Authentification requise."))
+                        reponse['WWW-Authenticate'] = 'Basic realm="api"'
+                        return reponse
+                    request.user = utilisateur
+                if not request.user.est_facultaire:
+                    raise ErreurAPI(403, "Réservé aux comptes facultaires.")
+                # Pas d'année de travail dans l'API : seule la faculté du compte restreint les lectures
+                with dans_le_perimetre(None, faculte_de_l_utilisateur(request.user)):
+                    return vue(request, *args, **kwargs)
+            except ErreurAPI as erreur:
+                return _reponse_erreur(erreur)
+        return enveloppe
+    return decorateur
+
+
+def _universite(request):
+    # Vues qui couvrent toute l'université, sans filtrage possible par faculté
+    if faculte_de_l_utilisateur(request.user) is not None:
+        raise ErreurAPI(403, "Réservé aux comptes facultaires de toute l'université.")
+
+
+def _reponse_erreur(erreur):
+    contenu = {'erreur': erreur.message}
+    if erreur.details:
+        contenu['details'] = erreur.details
+    return JsonResponse(contenu, status=erreur.statut)
+
+
+# --- Lecture ---
+
+def _ressource(nom):
+    try:
+        return RESSOURCES[nom]
+    except KeyError:
+        raise ErreurAPI(404, f"Ressource inconnue : '{nom}'.") from None
+
+
+def _champs_demandes(request, ressource):
+    demandes = request.GET.get('fields')
+    if not demandes:
+        return list(ressource.champs)
+    noms = list(dict.fromkeys(nom.strip() for nom in demandes.split(',') if nom.strip()))
+    inconnus = [nom for nom in noms if nom not in ressource.champs]
+    if inconnus or not noms:
+        raise ErreurAPI(400, f"Champ(s) inconnu(s) : {', '.join(inconnus) or '(aucun)'}.", {'disponibles': list(ressource.champs)})
+    return noms
+
+
+def _entier(request, parametre, defaut, minimum=0, maximum=None):
+    valeur = request.GET.get(parametre)
+    if valeur in (None, ''):
+        return defaut
+    try:
+        valeur = int(valeur)
+    except ValueError:
+        raise ErreurAPI(400, f"Paramètre '{parametre}' : entier attendu.") from None
+    if valeur < minimum or (maximum is not None and valeur > maximum):
+        limites = f"{minimum} à {maximum}" if maximum is not None else f"au moins {minimum}"
+        raise ErreurAPI(400, f"Paramètre '{parametre}' hors limites ({limites}).")
+    return valeur
+
+
+def _format(request):
+    format = request.GET.get('format') or 'json'
+    disponibles = serialisation.formats_disponibles()
+    if format not in disponibles:
+        raise ErreurAPI(406, f"Format '{format}' non disponible.", {'disponibles': disponibles})
+    return format
+
+
+def _filtrer(request, ressource):
+    """Queryset de la ressource restreint par ses filtres présents dans la requête (valeurs validées ici)."""
+    queryset = ressource.objets()
+    for parametre, chemin in ressource.filtres.items():
+        if parametre in request.GET:
+            champ = serialisation.champ_modele(ressource.modele, chemin)
+            try:
+                valeur = champ.to_python(request.GET[parametre])
+            except ValidationError:
+                raise ErreurAPI(400, f"Paramètre '{parametre}' : valeur invalide.") from None
+            queryset = queryset.filter(**{chemin: valeur})
+    return queryset
+
+
+def _objet(ressource, pk, noms=None):
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, noms or list(ressource.champs))
+    lignes = plan.lignes(ressource.objets().filter(pk=pk))
+    if not lignes:
+        raise ErreurAPI(404, "Objet introuvable.")
+    return lignes[0][1]
+
+
+def _lot(request, ressource, noms):
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.GET['ids'].split(',') if i.strip()))
+    except ValueError:
+        raise ErreurAPI(400, "Paramètre 'ids' : liste d'entiers séparés par des virgules attendue.") from None
+    if len(ids) > MAX_IDS_PAR_LOT:
+        raise ErreurAPI(400, f"Au plus {MAX_IDS_PAR_LOT} ids par requête.")
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, noms)
+    trouves = dict(plan.lignes(ressource.objets().filter(pk__in=ids)))
+    return serialisation.reponse({
+        'resultats': [trouves[pk] for pk in ids if pk in trouves],
+        'introuvables': [pk for pk in ids if pk not in trouves],
+    }, _format(request))
+
+
+def _page(request, ressource, noms):
+    apres = _entier(request, 'apres', 0)
+    limite = _entier(request, 'limite', TAILLE_PAGE_DEFAUT, minimum=1, maximum=TAILLE_PAGE_MAX)
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, noms)
+    # Une ligne de plus que la page : indique s'il existe une page suivante sans requête COUNT
+    lignes = plan.lignes(_filtrer(request, ressource).filter(pk__gt=apres).order_by('pk')[:limite + 1])
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        parametres = request.GET.copy()
+        parametres['apres'] = lignes[-1][0]
+        suivant = f"{request.path}?{parametres.urlencode()}"
+    return serialisation.reponse({'resultats': [champs for _, champs in lignes], 'suivant': suivant}, _format(request))
+
+
+# --- Écriture ---
+
+def _donnees_json(request):
+    try:
+        donnees = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        raise ErreurAPI(400, "Corps JSON invalide.") from None
+    if not isinstance(donnees, dict):
+        raise ErreurAPI(400, "Un objet JSON est attendu.")
+    return donnees
+
+
+def _valider(formulaire):
+    if not formulaire.is_valid():
+        raise ErreurAPI(400, "Données invalides.", {
+            champ: [str(message) for message in messages] for champ, messages in formulaire.errors.items()
+        })
+
+
+def _enregistrer(request, ressource, instance=None):
+    if ressource.formulaire is None:
+        raise ErreurAPI(405, "Ressource en lecture seule.")
+    donnees = _donnees_json(request)
+    champs = ressource.formulaire._meta.fields
+    inconnus = sorted(set(donnees) - set(champs))
+    if inconnus:
+        raise ErreurAPI(400, f"Champ(s) non modifiable(s) : {', '.join(inconnus)}.", {'modifiables': list(champs)})
+    if instance is not None and request.method == 'PATCH':
+        # Modification partielle : les champs absents gardent leur valeur actuelle
+        donnees = {**model_to_dict(instance, fields=champs), **donnees}
+    formulaire = restreindre_choix(ressource.formulaire(data=donnees, instance=instance))
+    _valider(formulaire)
+    return formulaire.save()
+
+
+# --- Vues ---
+
+@vue_api('GET')
+def racine(request):
+    """Ressources disponibles et leurs champs (pour ?fields=)."""
+    return JsonResponse({
+        'version': 1,
+        'ressources': {
+            nom: {
+                'url': reverse('api_liste', args=[nom]),
+                'export': reverse('api_export', args=[nom]),
+                'champs': list(ressource.champs),
+                'filtres': list(ressource.filtres),
+                'ecriture': ressource.formulaire is not None,
+            }
+            for nom, ressource in RESSOURCES.items()
+        },
+        'historique': {'url': reverse('api_historique'), 'champs': list(HISTORIQUE.champs)},
+        'formats': serialisation.formats_disponibles(),
+    })
+
+
+@vue_api('GET', 'POST')
+def liste(request, nom):
+    ressource = _ressource(nom)
+    if request.method == 'POST':
+        objet = _enregistrer(request, ressource)
+        reponse = JsonResponse(_objet(ressource, objet.pk), status=201)
+        reponse['Location'] = reverse('api_detail', args=[nom, objet.pk])
+        return reponse
+    noms = _champs_demandes(request, ressource)
+    if 'ids' in request.GET:
+        return _lot(request, ressource, noms)
+    return _page(request, ressource, noms)
+
+
+@vue_api('GET', 'PUT', 'PATCH', 'DELETE')
+def detail(request, nom, pk):
+    ressource = _ressource(nom)
+    if request.method == 'GET':
+        return serialisation.reponse(_objet(ressource, pk, _champs_demandes(request, ressource)), _format(request))
+
+    if ressource.formulaire is None:
+        raise ErreurAPI(405, "Ressource en lecture seule.")
+    instance = ressource.objets().filter(pk=pk).first()
+    if instance is None:
+        raise ErreurAPI(404, "Objet introuvable.")
+    if request.method == 'DELETE':
+        instance.delete()
+        return HttpResponse(status=204)
+    _enregistrer(request, ressource, instance)
+    return JsonResponse(_objet(ressource, pk))
+
+
+@vue_api('GET')
+def export(request, nom):
+    """
+    Toutes les lignes de la ressource (mêmes ?fields= et filtres que la liste), dans l'ordre des id, en une
+    réponse écrite par morceaux : la base est lue par lots pendant l'envoi, sans limite de taille.
+    """
+    ressource = _ressource(nom)
+    noms = _champs_demandes(request, ressource)
+    format = _format(request)
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, noms)
+    # Lu pendant l'envoi, après la vue : la base de lecture est fixée ici
+    queryset = _filtrer(request, ressource).order_by('pk').using(base_de_lecture())
+    reponse = serialisation.reponse_flux(plan.iterer(queryset), format, asynchrone=isinstance(request, ASGIRequest))
+    extension = 'msgpack' if format == 'msgpack' else 'json'
+    reponse['Content-Disposition'] = f'attachment; filename="{nom}.{extension}"'
+    return reponse
+
+
+@vue_api('POST')
+def transition_stage(request, pk):
+    """
+    Applique un événement du workflow au stage : {"evenement": "...", "version": n, ...champs de l'événement}.
+    "version" (lue sur le stage) est obligatoire : 400 sans elle, 409 si le statut ne le permet pas ou si la
+    version ne correspond plus (modification concurrente).
+    """
+    stage = Internship.perimetre.select_related('etudiant').filter(pk=pk).first()
+    if stage is None:
+        raise ErreurAPI(404, "Objet introuvable.")
+    formulaire = InternshipTransitionForm(data=_donnees_json(request), stage=stage)
+    _valider(formulaire)
+    try:
+        with transaction.atomic():
+            formulaire.save(acteur=request.user)
+    except TransitionInvalide as erreur:
+        contenu = {'erreur': ' '.join(erreur.messages), 'conflit': isinstance(erreur, ModificationConcurrente)}
+        return JsonResponse(contenu, status=409)
+    return JsonResponse(_objet(RESSOURCES['stages'], pk))
+
+
+@vue_api('GET')
+def changements(request):
+    """
+    Changements après ?curseur=X (0 : depuis le début du flux conservé), par lots de ?limite=n.
+    ?ressources=stages,etudiants restreint le flux ; ?compacter=1 ne garde qu'un changement par objet du lot.
+    410 si les changements suivant le curseur ont été purgés : resynchronisation complète nécessaire.
+    """
+    _universite(request)
+    curseur = _entier(request, 'curseur', 0)
+    limite = _entier(request, 'limite', TAILLE_PAGE_DEFAUT, minimum=1, maximum=TAILLE_PAGE_MAX)
+    ressources = [nom for nom in request.GET.get('ressources', '').split(',') if nom]
+    inconnues = [nom for nom in ressources if nom not in flux.CODES_RESSOURCE]
+    if inconnues:
+        raise ErreurAPI(400, f"Ressource(s) inconnue(s) : {', '.join(inconnues)}.", {'disponibles': list(flux.CODES_RESSOURCE)})
+    try:
+        lignes, curseur, encore = flux.changements_depuis(
+            curseur, limite, ressources, compacter=request.GET.get('compacter') in ('1', 'true'),
+        )
+    except flux.CurseurPerime as erreur:
+        raise ErreurAPI(410, str(erreur), {'curseur_actuel': flux.curseur_actuel()}) from None
+    return serialisation.reponse({'changements': lignes, 'curseur': curseur, 'encore': encore}, _format(request))
+
+
+@vue_api('GET')
+def historique(request):
+    """
+    Étudiants et stages de ?annee=AAAA-AAAA, qu'elle soit courante ou archivée, sous les mêmes champs
+    (?fields=, voir archives.CHAMPS_ARCHIVE) ; pagination par étudiant (?apres=<etudiant_id>&limite=n).
+    """
+    _universite(request)
+    annee = request.GET.get('annee', '')
+    if not annee:
+        raise ErreurAPI(400, "Paramètre 'annee' requis (ex: 2023-2024).")
+    noms = _champs_demandes(request, HISTORIQUE)
+    apres = _entier(request, 'apres', 0)
+    limite = _entier(request, 'limite', TAILLE_PAGE_DEFAUT, minimum=1, maximum=TAILLE_PAGE_MAX)
+    lignes, dernier = archives.page_historique(annee, noms, apres, limite)
+    suivant = None
+    if dernier is not None:
+        parametres = request.GET.copy()
+        parametres['apres'] = dernier
+        suivant = f"{request.path}?{parametres.urlencode()}"
+    return serialisation.reponse({
+        'annee': annee,
+        'archivee': annee in archives.annees_archivees(),
+        'resultats': lignes,
+        'suivant': suivant,
+    }, _format(request))
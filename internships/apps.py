@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InternshipsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "internships"
+
+    def ready(self):
+        # Enregistrer les récepteurs de signaux (invalidation du cache des lignes, etc.)
+        # et les vérifications système (compilation des templates)
+        from . import signals, checks  # noqa: F401
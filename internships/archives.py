@@ -0,0 +1,162 @@
+# gestion_stages_univ/internships/archives.py
+#
+# Archivage des années académiques closes. Tant qu'elles restent dans Student et Internship, les listes,
+# tableaux de bord, statistiques et empreintes parcourent aussi les années passées. archiver_annee()
+# déplace les étudiants d'une année (et leur stage) vers StageArchive, une ligne aplatie par étudiant :
+# les tables courantes ne gardent que les années en cours, et leurs index restent petits.
+#
+# - Le déplacement se fait par lots, chacun dans sa transaction (copie puis suppression) : un archivage
+#   interrompu se reprend en relançant la commande, chaque étudiant étant soit courant, soit archivé.
+# - Les suppressions sont directes (sans signaux ni collecte des instances) ; le flux des changements
+#   reçoit une opération « archivage » par étudiant et par stage, en une insertion groupée.
+# - Les comptes des étudiants archivés sont désactivés (ils n'ont plus de profil), sauf demande contraire.
+# - Lecture unifiée : lignes_historique() / page_historique() lisent une année dans les tables courantes
+#   et dans les archives, sous les mêmes noms de champs (API /api/v1/historique/?annee=...).
+
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .changements import ARCHIVAGE, enregistrer_changements
+from .models import AnneeArchivee, Internship, Notification, StageArchive, Student, User
+from .serialisation import PlanColonnes
+
+
+TAILLE_LOT_ARCHIVAGE = 1000
+STATUTS_CLOS = ('TERMINE', 'ANNULE')
+
+# Champ de StageArchive -> chemin lu sur Student par values_list() (le stage par la relation inverse)
+CHAMPS_ARCHIVE = {
+    'annee_academique': 'promotion__annee_academique',
+    'promotion_id': 'promotion_id',
+    'promotion_nom': 'promotion__nom',
+    'departement_id': 'promotion__departement_id',
+    'etudiant_id': 'pk',
+    'stage_id': 'stage__id',
+    'matricule': 'matricule',
+    'nom_complet': 'nom_complet',
+    'id_inscription_annee': 'id_inscription_annee',
+    'statut': 'stage__statut',
+    'note': 'stage__note',
+    'entreprise_id': 'stage__entreprise_selectionnee_id',
+    'entreprise_nom': 'stage__entreprise_selectionnee__nom',
+    'encadreur_id': 'stage__encadreur_id',
+    'encadreur_nom': 'stage__encadreur__nom_complet',
+    'date_proposition_soumise': 'stage__date_proposition_soumise',
+    'date_validation': 'stage__date_validation',
+    'date_encadreur_affecte': 'stage__date_encadreur_affecte',
+    'date_debut': 'stage__date_debut',
+    'date_fin': 'stage__date_fin',
+    'date_notation': 'stage__date_notation',
+}
+
+
+class ArchivageImpossible(Exception):
+    pass
+
+
+def etudiants_de_l_annee(annee_academique):
+    return Student.objects.filter(promotion__annee_academique=annee_academique)
+
+
+def annees_archivees():
+    return set(AnneeArchivee.objects.values_list('annee_academique', flat=True))
+
+
+def stages_ouverts(annee_academique):
+    """Stages de l'année qui ne sont ni terminés ni annulés (l'année n'est pas close)."""
+    return Internship.objects.filter(etudiant__promotion__annee_academique=annee_academique).exclude(statut__in=STATUTS_CLOS)
+
+
+def _archiver_lot(annee_academique, etudiants, desactiver_comptes):
+    """Copie puis supprime un lot d'étudiants (et leurs stages). Retourne le nombre d'étudiants archivés."""
+    with transaction.atomic():
+        lignes = list(etudiants.order_by('pk').values_list(*CHAMPS_ARCHIVE.values())[:TAILLE_LOT_ARCHIVAGE])
+        if not lignes:
+            return 0
+        maintenant = timezone.now()
+        archives = [StageArchive(date_archivage=maintenant, **dict(zip(CHAMPS_ARCHIVE, ligne))) for ligne in lignes]
+        StageArchive.objects.bulk_create(archives)
+
+        etudiant_pks = [archive.etudiant_id for archive in archives]
+        stage_pks = [archive.stage_id for archive in archives if archive.stage_id is not None]
+        # Suppressions directes : les seules relations vers ces lignes sont Notification.stage (SET_NULL,
+        # appliqué ici) et le journal des transitions (sans contrainte, conservé avec les id d'origine)
+        Notification.objects.filter(stage_id__in=stage_pks).update(stage=None)
+        Internship.objects.filter(pk__in=stage_pks)._raw_delete(Internship.objects.db)
+        Student.objects.filter(pk__in=etudiant_pks)._raw_delete(Student.objects.db)
+        if desactiver_comptes:
+            User.objects.filter(pk__in=etudiant_pks).update(is_active=False)
+        enregistrer_changements(Internship, stage_pks, ARCHIVAGE)
+        enregistrer_changements(Student, etudiant_pks, ARCHIVAGE)
+        return len(lignes)
+
+
+def archiver_annee(annee_academique, forcer=False, desactiver_comptes=True, progression=None):
+    """
+    Déplace les étudiants de l'année et leurs stages vers StageArchive. Refusé si des stages de l'année
+    sont encore ouverts, sauf `forcer`. `progression(nombre)` est appelée après chaque lot.
+    Retourne le nombre d'étudiants archivés par cet appel.
+    """
+    ouverts = stages_ouverts(annee_academique).count()
+    if ouverts and not forcer:
+        raise ArchivageImpossible(
+            f"{ouverts} stage(s) de {annee_academique} ne sont ni terminés ni annulés : l'année n'est pas close."
+        )
+    etudiants = etudiants_de_l_annee(annee_academique)
+    if not etudiants.exists() and not StageArchive.objects.filter(annee_academique=annee_academique).exists():
+        raise ArchivageImpossible(f"Aucun étudiant inscrit en {annee_academique}.")
+
+    total = 0
+    while nombre := _archiver_lot(annee_academique, etudiants, desactiver_comptes):
+        total += nombre
+        if progression is not None:
+            progression(total)
+    AnneeArchivee.objects.update_or_create(annee_academique=annee_academique, defaults={
+        'nb_stages': StageArchive.objects.filter(annee_academique=annee_academique).count(),
+        'date_archivage': timezone.now(),
+    })
+    return total
+
+
+# --- Lecture unifiée ---
+
+def _plans(noms):
+    """
+    Plans de lecture d'une même liste de champs dans les tables courantes et dans les archives.
+    Clé commune : l'étudiant (pk de Student, etudiant_id de l'archive), unique dans une année.
+    """
+    return (
+        PlanColonnes(Student, CHAMPS_ARCHIVE, noms),
+        PlanColonnes(StageArchive, {nom: nom for nom in CHAMPS_ARCHIVE}, noms, cle='etudiant_id'),
+    )
+
+
+def _sources(annee_academique, plans, apres=0, limite=None):
+    """
+    [(etudiant, ligne)] de l'année, triées par étudiant. Les deux sources sont toujours lues : une année
+    archivée n'a plus de lignes courantes (requête vide sur index), sauf archivage interrompu.
+    """
+    courant, archive = plans
+    courants = etudiants_de_l_annee(annee_academique).filter(pk__gt=apres).order_by('pk')
+    archives = StageArchive.objects.filter(annee_academique=annee_academique, etudiant_id__gt=apres).order_by('etudiant_id')
+    if limite is not None:
+        courants, archives = courants[:limite], archives[:limite]
+    return sorted([*courant.lignes(courants), *archive.lignes(archives)], key=itemgetter(0))
+
+
+def lignes_historique(annee_academique, noms=None):
+    """Lignes (champs de CHAMPS_ARCHIVE, ou `noms`) des étudiants de l'année, courants ou archivés."""
+    return [ligne for _, ligne in _sources(annee_academique, _plans(noms or list(CHAMPS_ARCHIVE)))]
+
+
+def page_historique(annee_academique, noms, apres=0, limite=100):
+    """
+    Page de l'année par clé (étudiant > `apres`), fusionnant les deux sources.
+    Retourne (lignes, dernier étudiant de la page ou None s'il n'y a pas de page suivante).
+    """
+    paires = _sources(annee_academique, _plans(noms), apres, limite + 1)
+    if len(paires) > limite:
+        return [ligne for _, ligne in paires[:limite]], paires[limite - 1][0]
+    return [ligne for _, ligne in paires], None
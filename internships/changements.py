@@ -0,0 +1,208 @@
+# gestion_stages_univ/internships/changements.py
+#
+# Flux des changements pour la synchronisation des systèmes externes (scolarité, ERP). Chaque écriture
+# sur Student, Teacher, Company ou Internship ajoute une ligne Changement dans sa propre transaction :
+# - signaux post_save / post_delete pour les enregistrements individuels (formulaires, admin, suppressions
+#   en cascade) ;
+# - workflow.transition_many() et mettre_a_jour() pour les écritures par update(), sans signal ;
+# - pre_delete des objets référencés en SET_NULL : leur suppression modifie les lignes qui les référencent
+#   par un UPDATE sans signal (ex: supprimer une entreprise vide entreprise_proposee_1 des étudiants).
+# Un consommateur lit « les changements après le curseur X » par lots bornés (API /api/v1/changements/
+# ou `manage.py flux_changements`), puis relit les objets concernés (API ?ids=...) : le coût suit le
+# volume des changements, pas la taille des tables.
+#
+# Sous PostgreSQL, les id sont attribués à l'insertion mais visibles à la validation : une transaction
+# longue (fusion d'entreprises, lot d'archivage) peut valider un id inférieur à un id déjà lu, et un
+# consommateur passé au-delà ne le verrait jamais. Le flux ne rend donc que les id sous un horizon :
+# - chaque écriture réserve d'abord une valeur de la séquence et pose dessus un verrou consultatif de
+#   transaction (pg_advisory_xact_lock_shared), libéré à sa validation ou à son annulation : tous ses id
+#   sont au-dessus de cette réservation ;
+# - l'horizon est la plus petite réservation encore verrouillée (pg_locks), sinon la prochaine valeur de la
+#   séquence : tout id en dessous appartient à une transaction terminée. Réservation et lecture de l'horizon
+#   sont sérialisées par un court verrou de session, pour qu'une réservation ne se glisse pas entre les deux.
+# Sous SQLite, les transactions d'écriture se suivent : les id sont validés dans l'ordre, sans horizon.
+
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Changement, Company, Internship, Student, Teacher
+
+
+CREATION, MODIFICATION, SUPPRESSION, ARCHIVAGE = 1, 2, 3, 4
+NOMS_OPERATION = {CREATION: 'creation', MODIFICATION: 'modification', SUPPRESSION: 'suppression', ARCHIVAGE: 'archivage'}
+
+# Modèle suivi -> code de ressource (les noms sont ceux de l'API : /api/v1/<ressource>/?ids=...)
+RESSOURCES = {Student: 1, Teacher: 2, Company: 3, Internship: 4}
+NOMS_RESSOURCE = dict(Changement.RESSOURCE_CHOICES)
+CODES_RESSOURCE = {nom: code for code, nom in Changement.RESSOURCE_CHOICES}
+
+TAILLE_LOT_CHANGEMENTS = 1000
+TAILLE_LOT_PURGE = 10000
+# Clés des verrous consultatifs (forme à deux entiers) : (ESPACE_VERROUS, 0) sérialise réservations et lecture
+# de l'horizon, (ESPACE_VERROUS + 1, réservation) marque une transaction d'écriture en cours
+ESPACE_VERROUS = 0x43480000
+
+
+class CurseurPerime(Exception):
+    """Les changements suivant le curseur ont été purgés : le consommateur doit tout resynchroniser."""
+
+
+def _en_int4(valeur):
+    # Second entier de la clé d'un verrou consultatif : int4 signé, relu non signé (oid) dans pg_locks
+    return valeur - 2 ** 32 if valeur >= 2 ** 31 else valeur
+
+
+def _sequence(curseur):
+    curseur.execute("SELECT pg_get_serial_sequence(%s, 'id')", [Changement._meta.db_table])
+    return curseur.fetchone()[0]
+
+
+def _reserver_position():
+    """PostgreSQL : réserve une valeur de la séquence, verrouillée jusqu'à la fin de la transaction en cours."""
+    with connection.cursor() as curseur:
+        sequence = _sequence(curseur)
+        curseur.execute("SELECT pg_advisory_lock_shared(%s, 0)", [ESPACE_VERROUS])
+        try:
+            curseur.execute("SELECT nextval(%s::regclass)", [sequence])
+            reservation = curseur.fetchone()[0]
+            curseur.execute("SELECT pg_advisory_xact_lock_shared(%s, %s)", [ESPACE_VERROUS + 1, _en_int4(reservation)])
+        finally:
+            curseur.execute("SELECT pg_advisory_unlock_shared(%s, 0)", [ESPACE_VERROUS])
+
+
+def horizon():
+    """
+    Premier id dont la transaction n'est peut-être pas terminée (PostgreSQL) : le flux ne rend que les id
+    inférieurs. None sous SQLite, où tout id visible est définitif.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as curseur:
+        sequence = _sequence(curseur)
+        curseur.execute("SELECT pg_advisory_lock(%s, 0)", [ESPACE_VERROUS])
+        try:
+            curseur.execute(
+                "SELECT min(objid::bigint) FROM pg_locks WHERE locktype = 'advisory' AND classid = %s "
+                "AND objsubid = 2 AND database = (SELECT oid FROM pg_database WHERE datname = current_database())",
+                [ESPACE_VERROUS + 1],
+            )
+            reservation = curseur.fetchone()[0]
+            # Nom de séquence déjà qualifié et échappé par pg_get_serial_sequence
+            curseur.execute(f"SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {sequence}")
+            suivant = curseur.fetchone()[0]
+        finally:
+            curseur.execute("SELECT pg_advisory_unlock(%s, 0)", [ESPACE_VERROUS])
+    return suivant if reservation is None else min(reservation, suivant)
+
+
+def enregistrer_changements(modele, pks, operation):
+    """Ajoute au flux une ligne par objet `pks` du modèle (à appeler dans la transaction de l'écriture)."""
+    pks = list(pks)
+    if not pks:
+        return []
+    maintenant = timezone.now()
+    # Réservation et lignes dans la même transaction (même en autocommit) : voir l'en-tête du module
+    with transaction.atomic(savepoint=False):
+        if connection.vendor == 'postgresql':
+            _reserver_position()
+        return Changement.objects.bulk_create([
+            Changement(ressource=RESSOURCES[modele], objet_id=pk, operation=operation, date=maintenant) for pk in pks
+        ], batch_size=TAILLE_LOT_CHANGEMENTS)
+
+
+@lru_cache(maxsize=None)
+def references_set_null():
+    """
+    [(modèle référencé, modèle suivi, champ)] pour chaque clé étrangère SET_NULL d'un modèle suivi :
+    la suppression de l'objet référencé modifie ces lignes sans signal.
+    """
+    references = []
+    for modele in RESSOURCES:
+        for champ in modele._meta.concrete_fields:
+            if champ.many_to_one and champ.remote_field.on_delete is models.SET_NULL:
+                references.append((champ.related_model, modele, champ.name))
+    return tuple(references)
+
+
+def enregistrer_references_videes(modele_reference, objet):
+    """Changements des objets suivis qui référencent `objet` en SET_NULL (appelé avant sa suppression)."""
+    for reference, modele, champ in references_set_null():
+        if reference is modele_reference:
+            pks = list(modele.objects.filter(**{champ: objet}).values_list('pk', flat=True))
+            if pks:
+                enregistrer_changements(modele, pks, MODIFICATION)
+
+
+def curseur_actuel():
+    """
+    Curseur de la fin du flux : à noter AVANT un export complet, pour reprendre ensuite à partir de là.
+    Sous l'horizon : les changements des transactions encore en cours seront lus à la reprise.
+    """
+    queryset = Changement.objects.all()
+    limite_id = horizon()
+    if limite_id is not None:
+        queryset = queryset.filter(id__lt=limite_id)
+    return queryset.aggregate(dernier=models.Max('id'))['dernier'] or 0
+
+
+def _verifier_curseur(curseur):
+    premier = Changement.objects.order_by('id').values_list('id', flat=True).first()
+    if curseur and premier is not None and curseur < premier - 1:
+        raise CurseurPerime(f"Les changements après {curseur} ont été purgés (le plus ancien conservé : {premier}).")
+
+
+def _compacter(lignes):
+    """Un seul changement par objet dans le lot : la dernière opération (création si l'objet y a été créé)."""
+    par_objet = {}
+    for ligne in lignes:
+        cle = (ligne['ressource'], ligne['objet'])
+        precedent = par_objet.pop(cle, None)
+        if precedent is not None and precedent['operation'] == 'creation' and ligne['operation'] == 'modification':
+            ligne = {**ligne, 'operation': 'creation'}
+        par_objet[cle] = ligne  # réinséré en fin : l'ordre suit le dernier changement
+    return list(par_objet.values())
+
+
+def changements_depuis(curseur=0, limite=TAILLE_LOT_CHANGEMENTS, ressources=None, compacter=False):
+    """
+    Changements d'id > `curseur`, au plus `limite`, éventuellement restreints à des noms de ressources.
+    Retourne (lignes, nouveau curseur, encore) ; `encore` indique qu'un autre lot est déjà disponible.
+    Lève CurseurPerime si la rétention a supprimé des changements que le consommateur n'a pas lus.
+    """
+    _verifier_curseur(curseur)
+    queryset = Changement.objects.filter(id__gt=curseur)
+    limite_id = horizon()
+    if limite_id is not None:
+        queryset = queryset.filter(id__lt=limite_id)
+    if ressources:
+        queryset = queryset.filter(ressource__in=[CODES_RESSOURCE[nom] for nom in ressources])
+    brutes = list(queryset.order_by('id').values_list('id', 'ressource', 'objet_id', 'operation', 'date')[:limite + 1])
+    encore = len(brutes) > limite
+    brutes = brutes[:limite]
+    lignes = [
+        {'id': id_, 'ressource': NOMS_RESSOURCE[ressource], 'objet': objet_id, 'operation': NOMS_OPERATION[operation], 'date': date}
+        for id_, ressource, objet_id, operation, date in brutes
+    ]
+    nouveau_curseur = brutes[-1][0] if brutes else curseur
+    return (_compacter(lignes) if compacter else lignes), nouveau_curseur, encore
+
+
+def purger_changements(avant=None, taille_lot=TAILLE_LOT_PURGE):
+    """
+    Supprime les changements antérieurs à `avant` (défaut : settings.RETENTION_CHANGEMENTS_JOURS), par
+    tranches de clés primaires. Un consommateur en retard au-delà reçoit CurseurPerime. Retourne le nombre supprimé.
+    """
+    if avant is None:
+        avant = timezone.now() - timedelta(days=getattr(settings, 'RETENTION_CHANGEMENTS_JOURS', 90))
+    anciens = Changement.objects.filter(date__lt=avant)
+    total = 0
+    while True:
+        tranche = list(anciens.order_by('id').values_list('id', flat=True)[:taille_lot])
+        if not tranche:
+            return total
+        # Aucune relation ni signal sur Changement : une seule requête DELETE par tranche
+        total += anciens.filter(id__lte=tranche[-1]).delete()[0]
@@ -0,0 +1,460 @@
+# gestion_stages_univ/internships/charge.py
+#
+# Test de charge de la période de dépôt des propositions : des milliers d'étudiants synthétiques
+# se connectent et soumettent leurs propositions en même temps. Les requêtes sont envoyées
+# directement à l'application ASGI (university_internships.asgi), dans le processus, sans serveur
+# ni réseau : on mesure l'application et la base, pas la pile HTTP. Avec plusieurs processus,
+# chacun joue le rôle d'un worker ASGI et tous écrivent dans la même base. Dans un processus, chaque
+# requête exécute ses vues synchrones dans son propre thread (ThreadSensitiveContext du handler ASGI),
+# avec sa propre connexion : les parcours simultanés se disputent donc déjà les verrous de la base.
+#
+# Mesures : durée de chaque étape (percentiles), débit, erreurs par étape et par statut HTTP,
+# durée des écritures SQL (une écriture lente attend le plus souvent un verrou), erreurs de verrou
+# SQLite (« database is locked ») et, sous PostgreSQL, sessions en attente de verrou et deadlocks.
+
+import asyncio
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import as_completed
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.urls import reverse
+
+from .models import CleIdempotence, Company, Department, Faculty, Internship, Promotion, Student, TransitionStage, User
+from .normalisation import cle_nom
+from .processus import pool_de_processus
+
+
+PREFIXE = 'charge'
+MOT_DE_PASSE = 'charge-mot-de-passe'
+# Hachage volontairement faible des comptes synthétiques : sans lui, le coût de PBKDF2 à chaque
+# connexion masque tout le reste (à réactiver avec hachage_reel pour mesurer ce coût)
+HACHEURS_RAPIDES = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# Une écriture SQL plus longue est comptée comme attente probable de verrou
+SEUIL_ECRITURE_LENTE = 0.1  # secondes
+TAILLE_LOT_CREATION = 1000
+# Intervalle d'échantillonnage de pg_stat_activity
+INTERVALLE_SURVEILLANCE = 0.1  # secondes
+# Hôte des requêtes simulées (ajouté à ALLOWED_HOSTS dans les processus du test)
+HOTE = 'localhost'
+
+ETAPES = ('page_connexion', 'connexion', 'formulaire', 'soumission', 'double_envoi')
+
+_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+_CLE = re.compile(r'name="cle_idempotence" value="([^"]*)"')
+_ECRITURES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+# --- Jeu de données synthétique ---
+
+def creer_jeu_de_donnees(nb_etudiants, nb_entreprises=50, mot_de_passe=MOT_DE_PASSE, prefixe=PREFIXE):
+    """
+    Crée une promotion de `nb_etudiants` étudiants (comptes, profils et stages en attente de proposition)
+    et `nb_entreprises` entreprises, en requêtes groupées. Retourne les noms d'utilisateur des étudiants.
+    """
+    code = prefixe[:10].upper()
+    faculte = Faculty.objects.create(nom="Faculté du test de charge", code=code)
+    departement = Department.objects.create(faculte=faculte, nom="Département du test de charge", code=code)
+    promotion = Promotion.objects.create(departement=departement, nom='L3', annee_academique='2024-2025')
+    # bulk_create() n'appelle pas Company.save() : la clé normalisée est calculée ici
+    noms_entreprises = [f"Entreprise {prefixe} {i}" for i in range(nb_entreprises)]
+    Company.objects.bulk_create(
+        [Company(nom=nom, cle_normalisee=cle_nom(nom)) for nom in noms_entreprises], batch_size=TAILLE_LOT_CREATION,
+    )
+
+    # Même mot de passe pour tous : haché une seule fois
+    hache = make_password(mot_de_passe)
+    noms = [f"{prefixe}{i:06d}" for i in range(nb_etudiants)]
+    User.objects.bulk_create(
+        [User(username=nom, password=hache, est_etudiant=True) for nom in noms], batch_size=TAILLE_LOT_CREATION,
+    )
+    utilisateurs = dict(User.objects.filter(username__startswith=prefixe, est_etudiant=True).values_list('username', 'pk'))
+    Student.objects.bulk_create([
+        Student(
+            user_id=utilisateurs[nom], matricule=f"2024-2025-{i}-{code}-L3", nom_complet=f"Étudiant {nom}",
+            promotion=promotion, id_inscription_annee=i,
+        )
+        for i, nom in enumerate(noms)
+    ], batch_size=TAILLE_LOT_CREATION)
+    Internship.objects.bulk_create(
+        [Internship(etudiant_id=utilisateurs[nom]) for nom in noms], batch_size=TAILLE_LOT_CREATION,
+    )
+    return noms
+
+
+# --- Client HTTP en mémoire ---
+
+class ReponseASGI:
+    def __init__(self, statut, entetes, corps, taille=None):
+        self.statut = statut
+        self.entetes = entetes
+        self.corps = corps
+        self.taille = len(corps) if taille is None else taille
+
+    @property
+    def texte(self):
+        return self.corps.decode('utf-8', errors='replace')
+
+
+class ClientASGI:
+    """
+    Client HTTP minimal qui appelle l'application ASGI directement (protocole ASGI 3, sans réseau).
+    Garde ses cookies (session, CSRF) d'une requête à l'autre, comme un navigateur.
+    """
+
+    def __init__(self, application, hote='localhost'):
+        self.application = application
+        self.hote = hote
+        self.cookies = {}
+
+    async def requete(self, methode, chemin, donnees=None, entetes=None, garder_corps=True):
+        """garder_corps=False : le corps est seulement compté (grosses réponses écrites par morceaux)."""
+        corps = urlencode(donnees).encode() if donnees is not None else b''
+        en_tetes = [(b'host', self.hote.encode())]
+        if self.cookies:
+            en_tetes.append((b'cookie', '; '.join(f"{k}={v}" for k, v in self.cookies.items()).encode()))
+        if donnees is not None:
+            en_tetes += [
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(corps)).encode()),
+            ]
+        en_tetes += [(nom.lower().encode(), valeur.encode()) for nom, valeur in (entetes or {}).items()]
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': methode, 'scheme': 'http', 'path': chemin, 'raw_path': chemin.encode(),
+            'query_string': b'', 'root_path': '', 'headers': en_tetes,
+            'client': ('127.0.0.1', 50000), 'server': (self.hote, 80),
+        }
+        corps_envoye = False
+        terminee = asyncio.Event()
+        reponse = {'statut': None, 'entetes': [], 'morceaux': [], 'taille': 0}
+
+        async def receive():
+            nonlocal corps_envoye
+            if not corps_envoye:
+                corps_envoye = True
+                return {'type': 'http.request', 'body': corps, 'more_body': False}
+            # Django écoute la déconnexion pendant la vue : le client reste connecté jusqu'à la réponse
+            await terminee.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                reponse['statut'] = message['status']
+                reponse['entetes'] = [(k.decode('latin-1').lower(), v.decode('latin-1')) for k, v in message.get('headers', [])]
+            elif message['type'] == 'http.response.body':
+                reponse['taille'] += len(message.get('body', b''))
+                if garder_corps:
+                    reponse['morceaux'].append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    terminee.set()
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            terminee.set()
+        self._lire_cookies(reponse['entetes'])
+        return ReponseASGI(reponse['statut'], reponse['entetes'], b''.join(reponse['morceaux']), reponse['taille'])
+
+    def _lire_cookies(self, entetes):
+        for nom, valeur in entetes:
+            if nom != 'set-cookie':
+                continue
+            for cle, morceau in SimpleCookie(valeur).items():
+                if morceau.value == '' or morceau['max-age'] == '0':
+                    self.cookies.pop(cle, None)
+                else:
+                    self.cookies[cle] = morceau.value
+
+
+# --- Mesures ---
+
+class Mesures:
+    """Mesures d'un processus ; transmises au processus principal sous forme de dictionnaire."""
+
+    def __init__(self):
+        self.durees = defaultdict(list)        # étape -> [secondes]
+        self.erreurs = Counter()               # (étape, statut HTTP ou exception) -> nombre
+        self.exceptions = Counter()            # exceptions levées dans les vues
+        self.ecritures = []                    # durées des requêtes INSERT / UPDATE / DELETE
+        self.verrous_sqlite = 0                # OperationalError « database is locked »
+        self.parcours_complets = 0
+
+    def ajouter(self, etape, duree, erreur=None):
+        self.durees[etape].append(duree)
+        if erreur is not None:
+            self.erreurs[(etape, str(erreur))] += 1
+
+    def vers_dict(self):
+        return {
+            'durees': dict(self.durees), 'erreurs': dict(self.erreurs), 'exceptions': dict(self.exceptions),
+            'ecritures': self.ecritures, 'verrous_sqlite': self.verrous_sqlite,
+            'parcours_complets': self.parcours_complets,
+        }
+
+    def fusionner(self, autre):
+        for etape, durees in autre['durees'].items():
+            self.durees[etape].extend(durees)
+        self.erreurs.update(autre['erreurs'])
+        self.exceptions.update(autre['exceptions'])
+        self.ecritures.extend(autre['ecritures'])
+        self.verrous_sqlite += autre['verrous_sqlite']
+        self.parcours_complets += autre['parcours_complets']
+
+
+def _surveiller_base(mesures):
+    """Chronomètre les écritures SQL et compte les erreurs de verrou, sur toutes les connexions du processus."""
+    def chronometrer(execute, sql, params, many, context):
+        ecriture = sql.lstrip()[:6].upper() in _ECRITURES
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if 'locked' in str(e):
+                mesures.verrous_sqlite += 1
+            raise
+        finally:
+            if ecriture:
+                mesures.ecritures.append(time.perf_counter() - debut)
+
+    def installer(sender, connection, **kwargs):
+        connection.execute_wrappers.append(chronometrer)
+
+    def exception_vue(sender, request=None, **kwargs):
+        erreur = sys.exc_info()[1]
+        if erreur is not None:
+            mesures.exceptions[f"{type(erreur).__name__}: {str(erreur)[:80]}"] += 1
+
+    connection_created.connect(installer, weak=False)
+    got_request_exception.connect(exception_vue, weak=False)
+    # Connexion déjà ouverte dans ce thread (création du jeu de données)
+    for conn in connections.all(initialized_only=True):
+        if chronometrer not in conn.execute_wrappers:
+            conn.execute_wrappers.append(chronometrer)
+
+
+class SurveillanceVerrousPostgres(threading.Thread):
+    """
+    Échantillonne pendant le test le nombre de sessions en attente d'un verrou (pg_stat_activity)
+    et relève le nombre de deadlocks détectés par PostgreSQL (pg_stat_database).
+    """
+
+    def __init__(self, intervalle=INTERVALLE_SURVEILLANCE):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.arret = threading.Event()
+        self.echantillons = []
+        self.deadlocks = None
+
+    def _deadlocks(self, curseur):
+        curseur.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+        return curseur.fetchone()[0]
+
+    def run(self):
+        try:
+            with connection.cursor() as curseur:
+                deadlocks_debut = self._deadlocks(curseur)
+                while not self.arret.wait(self.intervalle):
+                    curseur.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    self.echantillons.append(curseur.fetchone()[0])
+                # pg_stat_database est mis à jour de façon asynchrone : la valeur peut arriver avec retard
+                self.deadlocks = self._deadlocks(curseur) - deadlocks_debut
+        finally:
+            connection.close()
+
+    def arreter(self):
+        self.arret.set()
+        self.join()
+        return {
+            'attente_verrou_max': max(self.echantillons, default=0),
+            'attente_verrou_moyenne': sum(self.echantillons) / len(self.echantillons) if self.echantillons else 0,
+            'deadlocks': self.deadlocks,
+        }
+
+
+# --- Scénario ---
+
+async def parcours_etudiant(client, nom, mot_de_passe, entreprises, mesures, rng, proba_double_envoi):
+    """
+    Un étudiant : page de connexion, connexion, chargement du formulaire de proposition dans la modale,
+    soumission. Avec la probabilité `proba_double_envoi`, le formulaire est envoyé deux fois en même
+    temps (double clic), avec la même clé d'idempotence.
+    """
+    url_connexion = reverse('login')
+    url_proposition = reverse('proposer_entreprises_etudiant')
+
+    async def etape(nom_etape, methode, chemin, donnees=None, entetes=None, attendu=200):
+        debut = time.perf_counter()
+        try:
+            reponse = await client.requete(methode, chemin, donnees, entetes)
+        except Exception as e:
+            mesures.ajouter(nom_etape, time.perf_counter() - debut, type(e).__name__)
+            return None
+        ok = reponse.statut == attendu
+        mesures.ajouter(nom_etape, time.perf_counter() - debut, None if ok else reponse.statut)
+        return reponse if ok else None
+
+    reponse = await etape('page_connexion', 'GET', url_connexion)
+    if reponse is None:
+        return
+    jeton = _CSRF.search(reponse.texte).group(1)
+    reponse = await etape('connexion', 'POST', url_connexion, {
+        'username': nom, 'password': mot_de_passe, 'csrfmiddlewaretoken': jeton,
+    }, attendu=302)
+    if reponse is None:
+        return
+
+    # Le jeton CSRF change à la connexion : le relire dans le formulaire
+    reponse = await etape('formulaire', 'GET', url_proposition, entetes={'X-Requested-With': 'XMLHttpRequest'})
+    if reponse is None:
+        return
+    jeton = _CSRF.search(reponse.texte).group(1)
+    cle = _CLE.search(reponse.texte)
+    entreprise_1, entreprise_2 = rng.sample(entreprises, 2)
+    donnees = {
+        'csrfmiddlewaretoken': jeton, 'cle_idempotence': cle.group(1) if cle else '',
+        'entreprise_proposee_1': entreprise_1, 'entreprise_proposee_2': entreprise_2,
+    }
+
+    if rng.random() < proba_double_envoi:
+        resultats = await asyncio.gather(
+            etape('soumission', 'POST', url_proposition, donnees, attendu=302),
+            etape('double_envoi', 'POST', url_proposition, donnees, attendu=302),
+        )
+        ok = all(r is not None for r in resultats)
+    else:
+        ok = await etape('soumission', 'POST', url_proposition, donnees, attendu=302) is not None
+    if ok:
+        mesures.parcours_complets += 1
+
+
+async def _executer(application, noms, concurrence, mot_de_passe, entreprises, mesures, rng, proba_double_envoi):
+    # Tous les étudiants arrivent en même temps ; au plus `concurrence` parcours en cours à la fois
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def un_etudiant(nom):
+        async with semaphore:
+            client = ClientASGI(application, hote=HOTE)
+            await parcours_etudiant(client, nom, mot_de_passe, entreprises, mesures, rng, proba_double_envoi)
+
+    await asyncio.gather(*(un_etudiant(nom) for nom in noms))
+
+
+def _configurer_processus(nom_base, hacheurs):
+    """Base de test et hachage des mots de passe du processus principal, hôte de test autorisé."""
+    settings.DATABASES['default']['NAME'] = nom_base
+    settings.PASSWORD_HASHERS = hacheurs
+    if HOTE not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, HOTE]
+
+
+def executer_lot(noms, concurrence, mot_de_passe, proba_double_envoi, graine):
+    """Joue les parcours des étudiants `noms` dans une boucle asyncio ; exécuté dans un processus du pool."""
+    from university_internships.asgi import application
+
+    mesures = Mesures()
+    _surveiller_base(mesures)
+    entreprises = list(Company.objects.values_list('pk', flat=True))
+    rng = random.Random(graine)
+    asyncio.run(_executer(application, noms, concurrence, mot_de_passe, entreprises, mesures, rng, proba_double_envoi))
+    return mesures.vers_dict()
+
+
+def lancer_test_de_charge(noms, processus=1, concurrence=100, mot_de_passe=MOT_DE_PASSE, proba_double_envoi=0.1, graine=1):
+    """
+    Répartit les étudiants `noms` entre `processus` processus (chacun avec `concurrence` parcours
+    simultanés au plus) et retourne (Mesures fusionnées, durée totale en secondes).
+    La base doit déjà contenir le jeu de données (creer_jeu_de_donnees).
+    """
+    _configurer_processus(settings.DATABASES['default']['NAME'], settings.PASSWORD_HASHERS)
+    mesures = Mesures()
+    lots = [noms[i::processus] for i in range(processus)]
+    debut = time.perf_counter()
+
+    if processus <= 1:
+        mesures.fusionner(executer_lot(noms, concurrence, mot_de_passe, proba_double_envoi, graine))
+        return mesures, time.perf_counter() - debut
+
+    initargs = (settings.DATABASES['default']['NAME'], list(settings.PASSWORD_HASHERS))
+    with pool_de_processus(processus, 'internships.charge._configurer_processus', *initargs) as pool:
+        futures = [
+            pool.submit(executer_lot, lot, concurrence, mot_de_passe, proba_double_envoi, graine + i)
+            for i, lot in enumerate(lots)
+        ]
+        for future in as_completed(futures):
+            mesures.fusionner(future.result())
+    return mesures, time.perf_counter() - debut
+
+
+# --- Rapport ---
+
+def _percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))]
+
+
+def verifier_coherence(prefixe=PREFIXE):
+    """Invariants après le test : une seule transition de soumission par stage malgré les doubles envois."""
+    stages = Internship.objects.filter(etudiant__user__username__startswith=prefixe)
+    return {
+        'stages_soumis': stages.filter(statut='PROPOSITION_SOUMISE').count(),
+        'transitions_soumission_en_double': (
+            TransitionStage.objects.filter(stage_id__in=stages.values('pk'))
+            .values('stage_id').annotate(n=Count('pk')).filter(n__gt=1).count()
+        ),
+        'cles_idempotence': CleIdempotence.objects.count(),
+    }
+
+
+def rapport(mesures, duree):
+    """Synthèse des mesures (dictionnaire sérialisable en JSON)."""
+    requetes = sum(len(d) for d in mesures.durees.values())
+    erreurs = sum(mesures.erreurs.values())
+    etapes = {}
+    for etape in ETAPES:
+        durees = mesures.durees.get(etape, [])
+        if not durees:
+            continue
+        etapes[etape] = {
+            'requetes': len(durees),
+            'erreurs': sum(n for (e, _), n in mesures.erreurs.items() if e == etape),
+            'p50_ms': _percentile(durees, 50) * 1000,
+            'p95_ms': _percentile(durees, 95) * 1000,
+            'p99_ms': _percentile(durees, 99) * 1000,
+            'max_ms': max(durees) * 1000,
+        }
+    return {
+        'base': connection.vendor,
+        'duree_s': duree,
+        'requetes': requetes,
+        'debit_req_s': requetes / duree if duree else 0.0,
+        'parcours_complets': mesures.parcours_complets,
+        'taux_erreur': erreurs / requetes if requetes else 0.0,
+        'etapes': etapes,
+        'erreurs': {f"{etape} -> {statut}": n for (etape, statut), n in sorted(mesures.erreurs.items())},
+        'exceptions': dict(mesures.exceptions.most_common()),
+        'ecritures_sql': {
+            'nombre': len(mesures.ecritures),
+            'p95_ms': _percentile(mesures.ecritures, 95) * 1000,
+            'max_ms': max(mesures.ecritures, default=0.0) * 1000,
+            f'plus_de_{int(SEUIL_ECRITURE_LENTE * 1000)}_ms': sum(1 for d in mesures.ecritures if d > SEUIL_ECRITURE_LENTE),
+            'verrous_sqlite': mesures.verrous_sqlite,
+        },
+    }
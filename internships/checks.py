@@ -0,0 +1,21 @@
+# gestion_stages_univ/internships/checks.py
+
+from django.core.checks import Error, Tags, register
+
+from .gabarits import compiler_gabarits
+
+
+@register(Tags.templates)
+def verifier_compilation_gabarits(app_configs, **kwargs):
+    """
+    Compile tous les templates de l'application : `manage.py check` échoue (et donc le build)
+    si l'un d'eux contient une erreur de syntaxe, au lieu de le découvrir en production.
+    """
+    _nombre, _duree_ms, erreurs = compiler_gabarits()
+    return [
+        Error(
+            f"Le template '{nom}' ne compile pas : {erreur}",
+            id='internships.E001',
+        )
+        for nom, erreur in erreurs
+    ]
@@ -0,0 +1,126 @@
+# gestion_stages_univ/internships/conditionnel.py
+
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Model
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import ANNEE_DE_TRAVAIL, FACULTE_DE_TRAVAIL, Department, Faculty, Promotion
+
+
+# Tables de référence dont les noms s'affichent dans les lignes (promotion, département, faculté) : sources
+# à ajouter aux vues qui les montrent, pour qu'un renommage change l'empreinte (voir aussi fragments.py)
+MODELES_DE_REFERENCE = (Faculty, Department, Promotion)
+
+
+def _querysets(sources, request, kwargs):
+    """
+    Une source est soit un modèle (toute la table est suivie), soit une fonction
+    (request, **kwargs) -> queryset pour les vues dont le contenu dépend de l'utilisateur.
+    """
+    for source in sources:
+        if isinstance(source, type) and issubclass(source, Model):
+            yield source._default_manager.all()
+        else:
+            yield source(request, **kwargs)
+
+
+def _assembler_empreinte(request, querysets, agregats):
+    # L'utilisateur fait partie de l'empreinte car la page affiche son nom et ses liens, l'année de
+    # travail et la faculté du compte car elles changent le contenu des listes facultaires (voir perimetre.py).
+    # Le secret CSRF aussi : chaque page contient {% csrf_token %}, et une page reprise du cache du navigateur
+    # (304) après une reconnexion, qui change le secret, ferait échouer tous ses envois de modale en 403.
+    # Le secret (fixe jusqu'à sa rotation) et non le jeton masqué renvoyé par get_token(), qui change à chaque appel.
+    get_token(request)
+    parties = [
+        getattr(settings, 'VERSION_APPLICATION', ''), str(request.user.pk),
+        ANNEE_DE_TRAVAIL.get() or '', str(FACULTE_DE_TRAVAIL.get() or ''), request.META.get('CSRF_COOKIE', ''),
+    ]
+    derniere_modification = None
+    for queryset, agregat in zip(querysets, agregats):
+        derniere = agregat['derniere']
+        parties.append(f"{queryset.model._meta.label_lower}:{agregat['total']}:{derniere.timestamp() if derniere else ''}")
+        if derniere and (derniere_modification is None or derniere > derniere_modification):
+            derniere_modification = derniere
+
+    etag = hashlib.sha1("|".join(parties).encode()).hexdigest()
+    request._empreinte = (etag, derniere_modification)
+    return request._empreinte
+
+
+def calculer_empreinte(request, sources, kwargs):
+    """
+    Calcule (une seule fois par requête) l'empreinte de fraîcheur d'une vue :
+    pour chaque source, une requête d'agrégat Max(date_modification) + Count(pk).
+    Retourne le couple (etag, derniere_modification).
+    """
+    if getattr(request, '_empreinte', None) is not None:
+        return request._empreinte
+    querysets = list(_querysets(sources, request, kwargs))
+    agregats = [queryset.aggregate(derniere=Max('date_modification'), total=Count('pk')) for queryset in querysets]
+    return _assembler_empreinte(request, querysets, agregats)
+
+
+async def acalculer_empreinte(request, sources, kwargs):
+    """Version asynchrone de calculer_empreinte : les agrégats des sources sont lancés ensemble."""
+    if getattr(request, '_empreinte', None) is not None:
+        return request._empreinte
+    querysets = list(_querysets(sources, request, kwargs))
+    agregats = await asyncio.gather(*(
+        queryset.aaggregate(derniere=Max('date_modification'), total=Count('pk')) for queryset in querysets
+    ))
+    return _assembler_empreinte(request, querysets, agregats)
+
+
+def empreinte_conditionnelle(*sources):
+    """
+    Décorateur de vue : répond 304 (If-None-Match / If-Modified-Since) sans exécuter
+    la requête de liste ni rendre le template si aucune source n'a changé.
+
+    Les pages qui ont des messages flash en attente sont toujours rendues, sinon
+    le message ne serait jamais affiché.
+    """
+    def etag_func(request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return None
+        return calculer_empreinte(request, sources, kwargs)[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return None
+        return calculer_empreinte(request, sources, kwargs)[1]
+
+    def decorator(vue):
+        vue_conditionnelle = condition(etag_func=etag_func, last_modified_func=last_modified_func)(vue)
+
+        if iscoroutinefunction(vue):
+            @wraps(vue)
+            async def wrapper_async(request, *args, **kwargs):
+                # Utilisateur chargé sans requête synchrone : les sources et les templates lisent ensuite request.user
+                request.user = await request.auser()
+                # condition() appelle etag_func de façon synchrone : l'empreinte est calculée avant, puis relue
+                if not len(messages.get_messages(request)):
+                    await acalculer_empreinte(request, sources, kwargs)
+                response = await vue_conditionnelle(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+
+            return wrapper_async
+
+        @wraps(vue)
+        def wrapper(request, *args, **kwargs):
+            response = vue_conditionnelle(request, *args, **kwargs)
+            # Page personnelle : pas de cache partagé, et le navigateur revalide à chaque affichage
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,155 @@
+# gestion_stages_univ/internships/diffusion.py
+#
+# Diffusion en direct des changements de stage vers les listes ouvertes (server-sent events).
+# Les écritures (post_save d'Internship, workflow.transition_many() et mettre_a_jour()) signalent les
+# stages modifiés ; après la validation de la transaction, les lignes sont relues en UNE requête,
+# réduites aux colonnes affichées, et publiées une seule fois sur le diffuseur. Chaque connexion SSE
+# ouverte (vues_async.flux_stages_*) est un abonné du diffuseur : aucun navigateur n'interroge la base.
+#
+# Le diffuseur par défaut (DiffuseurLocal) vit dans le processus : il suffit avec un seul worker ASGI.
+# Avec plusieurs workers, settings.DIFFUSEUR_EVENEMENTS désigne une classe de même interface
+# (publier / abonner / desabonner / actif) branchée sur un canal partagé (ex: Redis pub/sub).
+
+import asyncio
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Internship
+
+
+TAILLE_HISTORIQUE = 1000       # événements conservés pour la reprise (en-tête Last-Event-ID)
+TAILLE_FILE_ABONNE = 500       # événements en attente par connexion avant déconnexion forcée
+MAX_STAGES_PAR_PUBLICATION = 500  # au-delà (traitement en masse), un seul événement « recharger »
+
+# Colonnes publiées : clé courte de l'événement -> champ lu par values()
+COLONNES = {
+    'pk': 'pk',
+    'v': 'version',
+    'statut': 'statut',
+    'note': 'note',
+    'encadreur_id': 'encadreur_id',
+    'encadreur': 'encadreur__nom_complet',
+    'entreprise': 'entreprise_selectionnee__nom',
+    'faculte_id': 'etudiant__promotion__departement__faculte_id',  # filtrage des comptes limités à une faculté
+}
+LIBELLES_STATUT = dict(Internship.STATUT_CHOICES)
+
+
+class Abonnement:
+    """File d'événements d'une connexion SSE, remplie depuis n'importe quel thread."""
+
+    def __init__(self, boucle):
+        self.boucle = boucle
+        self.file = asyncio.Queue(maxsize=TAILLE_FILE_ABONNE)
+        self.deborde = False
+
+    def _deposer(self, evenement):
+        if self.deborde:
+            return
+        try:
+            self.file.put_nowait(evenement)
+        except asyncio.QueueFull:
+            # Client trop lent : il sera invité à recharger la page plutôt que de retenir la mémoire
+            self.deborde = True
+
+    def deposer(self, evenement):
+        self.boucle.call_soon_threadsafe(self._deposer, evenement)
+
+
+class DiffuseurLocal:
+    """
+    Diffuseur dans le processus. Chaque événement reçoit un numéro croissant (identifiant SSE) et
+    est gardé dans un historique borné, pour rejouer ce qu'un client a manqué pendant sa reconnexion.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._abonnes = set()
+        self._historique = deque(maxlen=TAILLE_HISTORIQUE)
+        self._dernier_id = 0
+
+    def actif(self):
+        """Vrai si quelqu'un écoute : sinon, les écritures ne relisent pas les lignes à publier."""
+        return bool(self._abonnes)
+
+    def publier(self, evenements):
+        with self._verrou:
+            numerotes = []
+            for evenement in evenements:
+                self._dernier_id += 1
+                numerotes.append({'id': self._dernier_id, **evenement})
+            self._historique.extend(numerotes)
+            abonnes = list(self._abonnes)
+        for abonnement in abonnes:
+            for evenement in numerotes:
+                abonnement.deposer(evenement)
+
+    def abonner(self, dernier_id=None):
+        """
+        Nouvel abonnement (à appeler depuis la boucle asyncio de la connexion). Retourne
+        (abonnement, événements à rejouer) ; les événements à rejouer valent None si l'historique
+        ne remonte plus jusqu'à `dernier_id` : le client doit alors recharger sa liste.
+        """
+        abonnement = Abonnement(asyncio.get_running_loop())
+        with self._verrou:
+            self._abonnes.add(abonnement)
+            if dernier_id is None or dernier_id == self._dernier_id:
+                return abonnement, []
+            # Numéro inconnu (processus redémarré) ou trop ancien pour l'historique
+            if dernier_id > self._dernier_id or self._historique[0]['id'] > dernier_id + 1:
+                return abonnement, None
+            return abonnement, [e for e in self._historique if e['id'] > dernier_id]
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            self._abonnes.discard(abonnement)
+
+
+@lru_cache(maxsize=None)
+def diffuseur():
+    return import_string(getattr(settings, 'DIFFUSEUR_EVENEMENTS', 'internships.diffusion.DiffuseurLocal'))()
+
+
+def lignes_stages(pks, anciens_encadreurs=None):
+    """
+    Événements « ligne » des stages `pks` : colonnes affichées par les listes, une seule requête.
+    anciens_encadreurs : {pk: encadreur_id avant l'écriture} ; un stage qui a changé d'encadreur porte
+    aussi `ancien_encadreur_id`, pour que la liste de l'ancien encadreur retire la ligne.
+    """
+    anciens_encadreurs = anciens_encadreurs or {}
+    lignes = Internship.objects.filter(pk__in=pks).values_list(*COLONNES.values())
+    evenements = []
+    for ligne in lignes:
+        evenement = dict(zip(COLONNES, ligne))
+        evenement['type'] = 'ligne'
+        evenement['statut_libelle'] = str(LIBELLES_STATUT.get(evenement['statut'], evenement['statut']))
+        ancien = anciens_encadreurs.get(evenement['pk'])
+        if ancien is not None and ancien != evenement['encadreur_id']:
+            evenement['ancien_encadreur_id'] = ancien
+        evenements.append(evenement)
+    return evenements
+
+
+def _publier_stages(pks, anciens_encadreurs):
+    if not diffuseur().actif():
+        return
+    if len(pks) > MAX_STAGES_PAR_PUBLICATION:
+        diffuseur().publier([{'type': 'recharger'}])
+    else:
+        diffuseur().publier(lignes_stages(pks, anciens_encadreurs))
+
+
+def signaler_stages(pks, anciens_encadreurs=None):
+    """
+    Annonce que les stages `pks` ont changé ({pk: encadreur_id} d'avant l'écriture dans `anciens_encadreurs`,
+    si elle a pu changer l'encadreur). La publication a lieu après la validation de la transaction en cours
+    (rien si elle est annulée), et seulement si une connexion écoute.
+    """
+    pks = list(pks)
+    if pks and diffuseur().actif():
+        transaction.on_commit(lambda: _publier_stages(pks, anciens_encadreurs))
@@ -0,0 +1,272 @@
+# gestion_stages_univ/internships/documents.py
+#
+# Documents individuels par étudiant (attestation de stage, lettre d'affectation de l'encadreur,
+# relevé de note), générés en lot : les templates sont compilés une fois par processus, les stages
+# sont répartis par lots dans un pool de processus, et chaque fichier est écrit de façon atomique
+# pour qu'une génération interrompue puisse reprendre là où elle s'est arrêtée.
+# La date de modification d'un fichier est celle des données dont il a été rendu (stage, étudiant,
+# promotion, entreprise, encadreur...) : un document plus ancien que ses données est régénéré.
+
+import base64
+import io
+import os
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.db.models.functions import Coalesce, Greatest
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.text import slugify
+
+from .models import Internship, StageArchive
+from .processus import pool_de_processus
+from .rapports import html_vers_pdf
+from .signature import signataire, signature_active, signer_pdf
+
+
+# Type de document -> titre, template et statuts du stage pour lesquels il peut être émis
+TYPES_DOCUMENTS = {
+    'attestation': {
+        'titre': "Attestation de stage",
+        'gabarit': 'internships/documents/attestation_stage.html',
+        'statuts': ('PROPOSITION_VALIDEE', 'ENCADREUR_AFFECTE', 'EN_COURS', 'TERMINE'),
+    },
+    'lettre_affectation': {
+        'titre': "Lettre d'affectation de l'encadreur",
+        'gabarit': 'internships/documents/lettre_affectation.html',
+        'statuts': ('ENCADREUR_AFFECTE', 'EN_COURS', 'TERMINE'),
+    },
+    'releve_note': {
+        'titre': "Relevé de note de stage",
+        'gabarit': 'internships/documents/releve_note.html',
+        'statuts': ('TERMINE',),
+    },
+}
+
+# Nombre de stages confiés à un processus à la fois
+TAILLE_LOT_DOCUMENTS = 200
+
+# Relations affichées par les documents, en plus du stage lui-même (voir date_donnees)
+RELATIONS_AFFICHEES = (
+    'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
+    'etudiant__promotion__departement__faculte', 'entreprise_selectionnee', 'encadreur',
+)
+
+# Sel du code de vérification : changer la SECRET_KEY invalide les codes déjà imprimés
+_SEL_VERIFICATION = 'internships.documents.verification'
+
+# Templates compilés, propres à chaque processus
+_gabarits = {}
+
+
+def _type_document(type_document):
+    try:
+        return TYPES_DOCUMENTS[type_document]
+    except KeyError:
+        raise ValueError(
+            f"Type de document inconnu : '{type_document}' (choix : {', '.join(TYPES_DOCUMENTS)})."
+        ) from None
+
+
+def gabarit_document(type_document):
+    """Template du document, compilé au premier appel puis réutilisé par le processus."""
+    if type_document not in _gabarits:
+        _gabarits[type_document] = get_template(_type_document(type_document)['gabarit'])
+    return _gabarits[type_document]
+
+
+def stages_eligibles(type_document):
+    """Stages pour lesquels le document peut être émis, avec les relations affichées."""
+    stages = Internship.objects.select_related(*RELATIONS_AFFICHEES).filter(
+        statut__in=_type_document(type_document)['statuts']
+    )
+    if type_document == 'releve_note':
+        stages = stages.filter(note__isnull=False)
+    return stages.order_by('pk')
+
+
+def documents_disponibles(stage):
+    """[(type, titre)] des documents que le stage permet d'émettre (même règle que stages_eligibles)."""
+    return [
+        (type_document, type_doc['titre']) for type_document, type_doc in TYPES_DOCUMENTS.items()
+        if stage.statut in type_doc['statuts'] and (type_document != 'releve_note' or stage.note is not None)
+    ]
+
+
+def fiche_verification(type_document, pk):
+    """
+    Informations affichées par la page publique de vérification du document `type_document` du stage `pk`,
+    ou None s'il n'a pas pu être émis. Un stage d'une année archivée (archives.py) n'est plus dans la table
+    courante : il est cherché dans StageArchive, où les noms ont été copiés à l'archivage.
+    """
+    stage = stages_eligibles(type_document).filter(pk=pk).first()
+    if stage is not None:
+        promotion = stage.etudiant.promotion
+        return {
+            'nom_complet': stage.etudiant.nom_complet,
+            'matricule': stage.etudiant.matricule,
+            'promotion': f"{promotion.nom} {promotion.annee_academique}" if promotion else None,
+            'entreprise': stage.entreprise_selectionnee.nom if stage.entreprise_selectionnee else None,
+            'encadreur': stage.encadreur.nom_complet if stage.encadreur else None,
+            'note': stage.note,
+            'statut': stage.get_statut_display(),
+            'archive': False,
+        }
+    archives = StageArchive.objects.filter(stage_id=pk, statut__in=_type_document(type_document)['statuts'])
+    if type_document == 'releve_note':
+        archives = archives.filter(note__isnull=False)
+    archive = archives.order_by('-annee_academique').first()
+    if archive is None:
+        return None
+    return {
+        'nom_complet': archive.nom_complet,
+        'matricule': archive.matricule,
+        'promotion': f"{archive.promotion_nom or ''} {archive.annee_academique}".strip(),
+        'entreprise': archive.entreprise_nom,
+        'encadreur': archive.encadreur_nom,
+        'note': archive.note,
+        'statut': archive.get_statut_display(),
+        'archive': True,
+    }
+
+
+def code_verification(type_document, pk):
+    """Code court imprimé sur le document ; infalsifiable sans la SECRET_KEY."""
+    return salted_hmac(_SEL_VERIFICATION, f"{type_document}:{pk}").hexdigest()[:16]
+
+
+def verifier_code(type_document, pk, code):
+    return constant_time_compare(code_verification(type_document, pk), code)
+
+
+def url_verification(type_document, pk):
+    chemin = reverse('verifier_document', args=[type_document, pk, code_verification(type_document, pk)])
+    return getattr(settings, 'URL_PUBLIQUE', '').rstrip('/') + chemin
+
+
+def qr_code(url):
+    """Code QR de `url` en image PNG, sous forme d'URI data: directement utilisable dans <img>."""
+    import qrcode
+
+    image = qrcode.make(url, box_size=4, border=2)
+    tampon = io.BytesIO()
+    image.save(tampon, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(tampon.getvalue()).decode('ascii')
+
+
+def rendre_document(type_document, stage, date_document=None, dest=None):
+    """Rend le document PDF d'un stage dans `dest` (un BytesIO par défaut), retourné positionné au début."""
+    dest = io.BytesIO() if dest is None else dest
+    url = url_verification(type_document, stage.pk)
+    html = gabarit_document(type_document).render({
+        'titre': TYPES_DOCUMENTS[type_document]['titre'],
+        'stage': stage,
+        'date_document': date_document or timezone.now(),
+        'url_verification': url,
+        'code_verification': code_verification(type_document, stage.pk),
+        'qr_code': qr_code(url),
+    })
+    html_vers_pdf(html, dest)
+    dest.seek(0)
+    return dest
+
+
+def nom_fichier_document(type_document, pk, matricule):
+    return f"{type_document}_{slugify(matricule) or pk}.pdf"
+
+
+def date_donnees():
+    """
+    Expression : dernière modification du stage et des relations affichées par le document. Une relation
+    absente (pas encore d'encadreur) compte pour la date du stage : GREATEST vaut NULL sous SQLite sinon.
+    """
+    return Greatest('date_modification', *(
+        Coalesce(f'{relation}__date_modification', 'date_modification') for relation in RELATIONS_AFFICHEES
+    ))
+
+
+def _horodatage_ns(date):
+    # Au microseconde près, comme en base
+    return round(date.timestamp() * 1_000_000) * 1000
+
+
+def _preparer_worker(types_documents, signer):
+    # Compilation des templates (et chargement de la clé de signature) une seule fois, avant le premier lot
+    for type_document in types_documents:
+        gabarit_document(type_document)
+    if signer:
+        signataire()
+
+
+def generer_lot(type_document, pks, dossier, date_document, signer=False):
+    """
+    Génère les documents des stages `pks` dans `dossier` ; exécuté dans un processus du pool.
+    Chaque PDF est d'abord écrit dans un fichier .partiel puis renommé : un fichier présent
+    dans le dossier est donc toujours complet. Avec signer=True, seul le PDF signé est écrit.
+    Le fichier prend pour date de modification celle des données lues (voir documents_a_generer).
+    Retourne (nombre généré, [(pk, erreur)]).
+    """
+    generes, erreurs = 0, []
+    for stage in stages_eligibles(type_document).filter(pk__in=pks).annotate(date_donnees=date_donnees()):
+        chemin = os.path.join(dossier, nom_fichier_document(type_document, stage.pk, stage.etudiant.matricule))
+        partiel = chemin + '.partiel'
+        try:
+            with open(partiel, 'wb') as dest:
+                if signer:
+                    signer_pdf(rendre_document(type_document, stage, date_document), dest)
+                else:
+                    rendre_document(type_document, stage, date_document, dest)
+            horodatage = _horodatage_ns(stage.date_donnees)
+            os.utime(partiel, ns=(horodatage, horodatage))
+            os.replace(partiel, chemin)
+            generes += 1
+        except Exception as e:
+            if os.path.exists(partiel):
+                os.remove(partiel)
+            erreurs.append((stage.pk, str(e)))
+    return generes, erreurs
+
+
+def documents_a_generer(type_document, dossier, forcer=False):
+    """
+    pk des stages dont le document manque dans `dossier` ou est plus ancien que ses données (note changée,
+    étudiant renommé...) ; tous si forcer=True. Relancer la génération après une interruption ne refait
+    que ce qui n'est pas terminé.
+    """
+    existants = {}
+    if not forcer and os.path.isdir(dossier):
+        existants = {entree.name: entree.stat().st_mtime_ns for entree in os.scandir(dossier)}
+    stages = stages_eligibles(type_document).annotate(date_donnees=date_donnees())
+    return [
+        pk for pk, matricule, date in stages.values_list('pk', 'etudiant__matricule', 'date_donnees')
+        if existants.get(nom_fichier_document(type_document, pk, matricule), -1) < _horodatage_ns(date)
+    ]
+
+
+def generer_documents(type_document, dossier, pks=None, workers=None, taille_lot=TAILLE_LOT_DOCUMENTS, signer=None):
+    """
+    Génère les documents des stages `pks` (par défaut ceux qui manquent dans `dossier`),
+    signés si signer=True (par défaut : si une clé de signature est configurée).
+    Générateur : produit (nombre généré, [(pk, erreur)]) à la fin de chaque lot, pour suivre la progression.
+    """
+    _type_document(type_document)
+    os.makedirs(dossier, exist_ok=True)
+    pks = documents_a_generer(type_document, dossier) if pks is None else list(pks)
+    workers = workers or getattr(settings, 'RAPPORTS_WORKERS', None) or os.cpu_count() or 1
+    date_document = timezone.now()
+    signer = signature_active() if signer is None else signer
+    if signer:
+        signataire()  # Erreur de configuration signalée tout de suite, pas dans chaque lot
+    lots = [pks[i:i + taille_lot] for i in range(0, len(pks), taille_lot)]
+
+    if workers <= 1 or len(lots) <= 1:
+        for lot in lots:
+            yield generer_lot(type_document, lot, dossier, date_document, signer)
+        return
+
+    with pool_de_processus(workers, 'internships.documents._preparer_worker', [type_document], signer) as pool:
+        futures = [pool.submit(generer_lot, type_document, lot, dossier, date_document, signer) for lot in lots]
+        for future in as_completed(futures):
+            yield future.result()
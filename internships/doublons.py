@@ -0,0 +1,223 @@
+# gestion_stages_univ/internships/doublons.py
+#
+# Doublons d'entreprises. Les étudiants choisissent leurs entreprises dans une liste libre : une même
+# entreprise finit enregistrée sous plusieurs libellés, et ses stages sont répartis entre eux dans les
+# statistiques par entreprise.
+#
+# - Chaque entreprise est lue une fois (values_list) et normalisée (normalisation.py) : nom, e-mail, téléphone.
+# - Blocage : elle est rangée sous quelques clés (nom normalisé, début de chaque mot significatif, e-mail,
+#   domaine, téléphone) et seules les entreprises d'un même bloc sont comparées, au lieu de toutes les paires.
+#   Les blocs exacts (même nom normalisé, e-mail ou téléphone) sont chaînés, en un nombre de paires linéaire ;
+#   un bloc approché plus grand que TAILLE_BLOC_MAX (mot courant : « congo », « banque ») est ignoré.
+# - Score d'une paire : similarité des noms normalisés (caractères par difflib, mots communs) et bonus si
+#   un contact est commun ; des numéros différents dans les noms excluent la paire. Les paires au-dessus du seuil sont réunies en groupes ; l'entreprise conservée
+#   d'un groupe est la plus référencée par les étudiants et les stages.
+# - fusionner() repointe en masse les propositions des étudiants, les stages et les archives vers l'entreprise
+#   conservée, complète ses champs vides puis supprime les doublons, dans une seule transaction.
+
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations, pairwise
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import diffusion
+from .changements import MODIFICATION, enregistrer_changements
+from .models import Company, Internship, StageArchive, Student
+from .normalisation import domaine_email, mots_du_nom, normaliser_email, normaliser_telephone
+
+
+SEUIL_SUGGESTION = 0.85
+BONUS_CONTACT = 0.15
+TAILLE_BLOC_MAX = 50
+LONGUEUR_PREFIXE = 4
+# Blocs dont tous les membres sont identiques sur la clé : chaînés (a-b, b-c...) plutôt que comparés deux à deux
+BLOCS_EXACTS = ('n', 'e', 't')
+
+# Clés étrangères vers Company repointées par la fusion
+REFERENCES = (
+    (Student, 'entreprise_proposee_1'),
+    (Student, 'entreprise_proposee_2'),
+    (Internship, 'entreprise_selectionnee'),
+)
+CHAMPS_COMPLETES = ('adresse', 'personne_contact', 'email_contact', 'telephone_contact')
+
+
+class FusionImpossible(Exception):
+    pass
+
+
+def _fiche(pk, nom, email, telephone):
+    mots = mots_du_nom(nom)
+    return {
+        'pk': pk,
+        'nom': ' '.join(mots),
+        'mots': set(mots),
+        'email': normaliser_email(email),
+        'domaine': domaine_email(email),
+        'telephone': normaliser_telephone(telephone),
+    }
+
+
+def fiches(queryset=None):
+    """Entreprises normalisées, lues en une requête sans instance de modèle."""
+    queryset = Company.objects.all() if queryset is None else queryset
+    lignes = queryset.order_by('pk').values_list('pk', 'nom', 'email_contact', 'telephone_contact')
+    return [_fiche(*ligne) for ligne in lignes.iterator(chunk_size=2000)]
+
+
+def cles_de_bloc(fiche):
+    cles = {('n', ' '.join(sorted(fiche['mots'])))}
+    cles.update(('m', mot[:LONGUEUR_PREFIXE]) for mot in fiche['mots'] if len(mot) >= LONGUEUR_PREFIXE)
+    if fiche['email']:
+        cles.add(('e', fiche['email']))
+    if fiche['domaine']:
+        cles.add(('d', fiche['domaine']))
+    if fiche['telephone']:
+        cles.add(('t', fiche['telephone']))
+    return cles
+
+
+def paires_candidates(liste):
+    """Paires (rang, rang) de `liste` partageant un bloc, et nombre de blocs approchés ignorés (trop grands)."""
+    blocs = defaultdict(list)
+    for rang, fiche in enumerate(liste):
+        for cle in cles_de_bloc(fiche):
+            blocs[cle].append(rang)
+    paires, ignores = set(), 0
+    for (type_bloc, _), membres in blocs.items():
+        if len(membres) < 2:
+            continue
+        if type_bloc in BLOCS_EXACTS:
+            paires.update(pairwise(membres))
+        elif len(membres) <= TAILLE_BLOC_MAX:
+            paires.update(combinations(membres, 2))
+        else:
+            ignores += 1
+    return paires, ignores
+
+
+def contact_commun(a, b):
+    return any(a[champ] and a[champ] == b[champ] for champ in ('email', 'telephone', 'domaine'))
+
+
+def score(a, b, seuil=0.0):
+    """Similarité de deux fiches entre 0 et 1 (0 dès qu'elle ne peut plus atteindre `seuil`)."""
+    if a['mots'] == b['mots']:
+        return 1.0
+    # Numéros différents (« Agence 12 », « Agence 13 ») : entreprises distinctes, même à un caractère près
+    if {mot for mot in a['mots'] if mot.isdigit()} != {mot for mot in b['mots'] if mot.isdigit()}:
+        return 0.0
+    bonus = BONUS_CONTACT if contact_commun(a, b) else 0.0
+    mots = len(a['mots'] & b['mots']) / len(a['mots'] | b['mots'])
+    comparaison = SequenceMatcher(None, a['nom'], b['nom'])
+    # Bornes supérieures bon marché du ratio avant le calcul complet
+    if max(mots, comparaison.real_quick_ratio()) + bonus < seuil or max(mots, comparaison.quick_ratio()) + bonus < seuil:
+        return 0.0
+    return min(1.0, max(mots, comparaison.ratio()) + bonus)
+
+
+def references(pks):
+    """{pk d'entreprise: nombre de propositions et de stages qui la désignent}."""
+    compte = Counter()
+    for modele, champ in REFERENCES:
+        lignes = modele.objects.filter(**{f'{champ}__in': pks}).values_list(champ).annotate(n=Count('pk'))
+        for pk, nombre in lignes:
+            compte[pk] += nombre
+    return compte
+
+
+def _racine(parents, rang):
+    while parents[rang] != rang:
+        parents[rang] = parents[parents[rang]]
+        rang = parents[rang]
+    return rang
+
+
+def suggestions(seuil=SEUIL_SUGGESTION, queryset=None):
+    """
+    Groupes de doublons probables : [{'conservee': Company, 'doublons': [Company], 'score': score le plus
+    faible des paires du groupe, 'membres': [(Company, nombre de références)]}], les plus sûrs d'abord.
+    """
+    liste = fiches(queryset)
+    paires, _ = paires_candidates(liste)
+    parents = list(range(len(liste)))
+    scores = {}
+    for i, j in paires:
+        valeur = score(liste[i], liste[j], seuil)
+        if valeur >= seuil:
+            scores[i, j] = valeur
+            parents[_racine(parents, i)] = _racine(parents, j)
+
+    groupes = defaultdict(set)
+    for i, j in scores:
+        groupes[_racine(parents, i)].update((i, j))
+    score_groupe = defaultdict(lambda: 1.0)
+    for (i, j), valeur in scores.items():
+        racine = _racine(parents, i)
+        score_groupe[racine] = min(score_groupe[racine], valeur)
+
+    pks = [liste[rang]['pk'] for membres in groupes.values() for rang in membres]
+    compte = references(pks)
+    entreprises = Company.objects.in_bulk(pks)
+    resultat = []
+    for racine, membres in groupes.items():
+        # Conservée : la plus référencée, puis la plus ancienne
+        ordre = sorted((liste[rang]['pk'] for rang in membres), key=lambda pk: (-compte[pk], pk))
+        resultat.append({
+            'conservee': entreprises[ordre[0]],
+            'doublons': [entreprises[pk] for pk in ordre[1:]],
+            'score': round(score_groupe[racine], 3),
+            'membres': [(entreprises[pk], compte[pk]) for pk in ordre],
+        })
+    resultat.sort(key=lambda groupe: (-groupe['score'], groupe['conservee'].nom.casefold()))
+    return resultat
+
+
+def fusionner(conservee_pk, doublon_pks):
+    """
+    Fusionne les entreprises `doublon_pks` dans `conservee_pk` : propositions, stages et archives repointés en
+    masse, champs vides de l'entreprise conservée complétés, doublons supprimés. Retourne les volumes traités.
+    """
+    doublons = sorted({int(pk) for pk in doublon_pks} - {int(conservee_pk)})
+    if not doublons:
+        raise FusionImpossible("Aucune entreprise à fusionner.")
+    with transaction.atomic():
+        entreprises = Company.objects.select_for_update().in_bulk([conservee_pk, *doublons])
+        if len(entreprises) != len(doublons) + 1:
+            raise FusionImpossible("Entreprise introuvable (déjà fusionnée ou supprimée ?).")
+        conservee = entreprises[int(conservee_pk)]
+        maintenant = timezone.now()
+
+        etudiants, stages = set(), []
+        for modele, champ in REFERENCES:
+            pks = list(modele.objects.filter(**{f'{champ}__in': doublons}).values_list('pk', flat=True))
+            if not pks:
+                continue
+            valeurs = {champ: conservee, 'date_modification': maintenant}
+            if modele is Internship:
+                # Version incrémentée : une modale ouverte sur l'ancienne entreprise est refusée (verrouillage optimiste)
+                valeurs['version'] = F('version') + 1
+                stages.extend(pks)
+            else:
+                etudiants.update(pks)
+            modele.objects.filter(pk__in=pks).update(**valeurs)
+        # Deux propositions d'un étudiant devenues la même entreprise : la seconde est retirée
+        Student.objects.filter(pk__in=etudiants, entreprise_proposee_2=F('entreprise_proposee_1')).update(entreprise_proposee_2=None)
+        # Archives : les statistiques des années closes regroupent aussi l'entreprise
+        StageArchive.objects.filter(entreprise_id__in=doublons).update(entreprise_id=conservee.pk)
+
+        for champ in CHAMPS_COMPLETES:
+            if not getattr(conservee, champ):
+                setattr(conservee, champ, next((getattr(entreprises[pk], champ) for pk in doublons if getattr(entreprises[pk], champ)), ''))
+        conservee.save()
+
+        enregistrer_changements(Student, sorted(etudiants), MODIFICATION)
+        enregistrer_changements(Internship, stages, MODIFICATION)
+        diffusion.signaler_stages(stages)
+        # Plus aucune référence : suppression simple, avec ses signaux (flux des changements)
+        for pk in doublons:
+            entreprises[pk].delete()
+    return {'etudiants': len(etudiants), 'stages': len(stages), 'supprimees': len(doublons)}
@@ -2,12 +2,15 @@
 
 from django import forms
 from .models import Teacher, Student, Company, Internship, Promotion, Department, Faculty, User
-from django.forms.widgets import PasswordInput, NumberInput
+from django.forms.widgets import HiddenInput, PasswordInput, NumberInput
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.urls import reverse_lazy # Importer reverse_lazy si utilisé ailleurs dans les formulaires
+from . import workflow # Machine à états du statut des stages
+from .idempotence import CHAMP_CLE, nouvelle_cle
+from .perimetre import restreindre_choix # Choix limités à la faculté du compte facultaire
+from .normalisation import cle_nom # Clé de recherche des entreprises (voir doublons.py)
 
 # --- Formulaire pour Enseignant ---
 class TeacherForm(forms.ModelForm):
@@ -28,6 +31,7 @@ class TeacherForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.instance = kwargs.get('instance')
         super().__init__(*args, **kwargs)
+        restreindre_choix(self)
         # Le champ matricule ne doit pas être modifiable après création car il devient le username
         if self.instance:
              self.fields['matricule'].disabled = False
@@ -107,6 +111,17 @@ class CompanyForm(forms.ModelForm):
         model = Company
         fields = ['nom', 'adresse', 'personne_contact', 'email_contact', 'telephone_contact']
 
+    def clean_nom(self):
+        # Même nom une fois normalisé (accents, ponctuation, forme juridique) : recherche par l'index de
+        # cle_normalisee, pour ne pas recréer une entreprise déjà connue (voir doublons.py)
+        nom = self.cleaned_data.get('nom')
+        if 'nom' not in self.changed_data:
+            return nom
+        existante = Company.objects.filter(cle_normalisee=cle_nom(nom)).exclude(pk=self.instance.pk).first()
+        if existante is not None:
+            raise ValidationError(f"L'entreprise « {existante.nom} » existe déjà sous ce nom.")
+        return nom
+
     def save(self, commit=True):
         return super().save(commit=commit)
 
@@ -129,6 +144,7 @@ class StudentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.instance = kwargs.get('instance')
         super().__init__(*args, **kwargs)
+        restreindre_choix(self)
         # Les champs matricule et id_inscription_annee ne doivent pas être modifiables après création
         if self.instance:
              # self.fields['matricule'].disabled = True # Le matricule n'est pas dans les fields
@@ -215,6 +231,8 @@ class StudentProposalForm(forms.ModelForm):
         required=False,
         empty_label="-- Sélectionnez une entreprise --"
     )
+    # Clé d'idempotence (voir idempotence.py) : un double envoi du même formulaire n'est traité qu'une fois
+    cle_idempotence = forms.CharField(widget=HiddenInput, required=False)
 
     class Meta:
         model = Student
@@ -222,6 +240,7 @@ class StudentProposalForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields[CHAMP_CLE].initial = nouvelle_cle()
 
     def clean(self):
          cleaned_data = super().clean()
@@ -231,7 +250,7 @@ class StudentProposalForm(forms.ModelForm):
               raise ValidationError("La première et la deuxième proposition ne peuvent pas être la même entreprise.")
          return cleaned_data
 
-    def save(self, commit=True):
+    def save(self, commit=True, acteur=None):
         # Pour ce formulaire, on modifie une instance Student existante, pas de création de User/Student
         student_instance = super().save(commit=False); # Obtient l'instance Student à modifier
 
@@ -243,24 +262,35 @@ class StudentProposalForm(forms.ModelForm):
 
         if commit:
             with transaction.atomic():
-                 student_instance.save() # Sauvegarde les propositions sur l'instance Student existante
+                 # Seuls les champs du formulaire sont écrits (pas toute la ligne Student)
+                 student_instance.save(update_fields=['entreprise_proposee_1', 'entreprise_proposee_2', 'date_modification'])
 
-                 # Trouver ou créer l'instance Internship liée à cet étudiant
-                 internship_instance, created = Internship.objects.get_or_create(etudiant=student_instance)
+                 # Stage de l'étudiant, verrouillé jusqu'à la fin de la transaction : deux envois simultanés
+                 # sont traités l'un après l'autre pour cet étudiant seulement
+                 internship_instance = self._stage_verrouille(student_instance)
 
-                 # Mettre à jour le statut du stage si des propositions sont soumises
-                 if internship_instance.statut in ['EN_ATTENTE_PROPOSITION', 'PROPOSITION_SOUMISE']:
-                      if entreprise_1: # S'il y a au moins une proposition
-                          internship_instance.statut = 'PROPOSITION_SOUMISE'
-                          internship_instance.date_proposition_soumise = timezone.now()
-                      else: # Si l'étudiant retire toutes ses propositions
-                          internship_instance.statut = 'EN_ATTENTE_PROPOSITION'
-                          internship_instance.date_proposition_soumise = None
-
-                      internship_instance.save() # Sauvegarde les modifications sur l'instance Internship
+                 # Mettre à jour le statut du stage si des propositions sont soumises (ou retirées)
+                 evenement = 'soumettre' if entreprise_1 else 'retirer_proposition'
+                 if workflow.peut(internship_instance, evenement):
+                      workflow.transition(internship_instance, evenement, acteur=acteur)
 
         return student_instance # Retourne l'instance Student modifiée
 
+    @staticmethod
+    def _stage_verrouille(student):
+        # Équivalent de get_or_create avec select_for_update : si un envoi concurrent crée le stage
+        # entre la lecture et l'INSERT, la contrainte un-pour-un lève IntegrityError et on relit celui-ci
+        stages = Internship.objects.select_for_update()
+        try:
+            return stages.get(etudiant=student)
+        except Internship.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic(): # Point de sauvegarde : l'échec de l'INSERT n'annule pas le reste
+                return Internship.objects.create(etudiant=student)
+        except IntegrityError:
+            return stages.get(etudiant=student)
+
 # --- Formulaire pour la Validation et l'Affectation (Facultaire) ---
 class InternshipValidationForm(forms.ModelForm):
      entreprise_selectionnee = forms.ModelChoiceField(
@@ -275,6 +305,9 @@ class InternshipValidationForm(forms.ModelForm):
           empty_label="-- Sélectionner un encadreur --",
           required=True
      )
+     # Version du stage affichée dans la modale (verrouillage optimiste, voir Internship.version) ;
+     # obligatoire : un envoi sans version contournerait le contrôle
+     version = forms.IntegerField(widget=HiddenInput)
 
      class Meta:
           model = Internship
@@ -283,7 +316,9 @@ class InternshipValidationForm(forms.ModelForm):
      def __init__(self, *args, **kwargs):
           internship_instance = kwargs.get('instance')
           super().__init__(*args, **kwargs)
+          restreindre_choix(self)
           if internship_instance:
+              self.fields['version'].initial = internship_instance.version
               # Filtrer le queryset des entreprises sélectionnables pour n'inclure que celles proposées par l'étudiant
               proposed_companies_ids = [
                   internship_instance.etudiant.entreprise_proposee_1_id,
@@ -297,43 +332,38 @@ class InternshipValidationForm(forms.ModelForm):
           cleaned_data = super().clean()
           internship_instance = self.instance
           # Validation pour s'assurer que le statut du stage est approprié pour la validation/affectation
-          if internship_instance and internship_instance.statut not in ['PROPOSITION_SOUMISE', 'PROPOSITION_VALIDEE', 'ENCADREUR_AFFECTE']:
+          if internship_instance and not workflow.peut(internship_instance, 'affecter_encadreur'):
                raise ValidationError("Ce stage n'est pas dans un état permettant la validation/affectation.")
           return cleaned_data
 
-     def save(self, commit=True):
+     def save(self, commit=True, acteur=None):
           # Surcharger la méthode save pour mettre à jour le statut et les dates
+          # acteur : utilisateur à l'origine du changement, inscrit au journal des transitions
           internship = super().save(commit=False) # Met à jour entreprise_selectionnee et encadreur sur l'instance en mémoire
 
-          # Mettre à jour le statut et les dates en fonction des changements
+          # Statut et dates sont mis à jour par la machine à états (voir workflow.TRANSITIONS)
           if internship.entreprise_selectionnee and internship.encadreur:
-               # Si une entreprise ET un encadreur sont sélectionnés
-               if internship.statut == 'PROPOSITION_SOUMISE': # Si on passe de soumise à affectée
-                    internship.statut = 'ENCADREUR_AFFECTE'
-                    if not internship.date_validation: # Si la date de validation n'est pas encore définie
-                         internship.date_validation = timezone.now() # Date de validation = date affectation
-                    internship.date_encadreur_affecte = timezone.now()
-               elif internship.statut == 'PROPOSITION_VALIDEE': # Si on passe de validée (sans encadreur) à affectée
-                     internship.statut = 'ENCADREUR_AFFECTE'
-                     internship.date_encadreur_affecte = timezone.now()
-               # Si le statut est déjà ENCADREUR_AFFECTE ou EN_COURS, on ne change que la date d'affectation si l'encadreur a été modifié
-               elif internship.statut in ['ENCADREUR_AFFECTE', 'EN_COURS']:
-                    # Optionnel: vérifier si l'encadreur a réellement changé avant de mettre à jour la date
-                    # if 'encadreur' in self.changed_data:
-                    internship.date_encadreur_affecte = timezone.now()
-
-          elif internship.entreprise_selectionnee and not internship.encadreur:
-               # Si une entreprise est sélectionnée mais pas d'encadreur
-               if internship.statut == 'PROPOSITION_SOUMISE': # Si on passe de soumise à validée
-                    internship.statut = 'PROPOSITION_VALIDEE'
-                    internship.date_validation = timezone.now()
-                    # On ne change pas date_encadreur_affecte
-
-          # Si l'entreprise sélectionnée ou l'encadreur sont retirés (cas moins fréquent via ce formulaire)
-          # Vous pourriez ajouter une logique pour gérer le retour à un statut antérieur si nécessaire.
-
-          if commit:
-               internship.save() # Sauvegarder l'instance Internship
+               evenement = 'affecter_encadreur' # Soumise/validée -> encadreur affecté, ou changement d'encadreur
+          elif internship.entreprise_selectionnee and internship.statut == 'PROPOSITION_SOUMISE':
+               evenement = 'valider' # Entreprise validée, encadreur affecté plus tard
+          else:
+               evenement = None
+
+          # Si le stage a été modifié depuis l'affichage de la modale, workflow lève ModificationConcurrente
+          version_attendue = self.cleaned_data['version']
+          if evenement is None:
+               if commit:
+                    # Seuls les deux champs du formulaire sont écrits, pas toute la ligne
+                    workflow.mettre_a_jour(
+                         internship, version_attendue,
+                         entreprise_selectionnee=internship.entreprise_selectionnee, encadreur=internship.encadreur,
+                    )
+          else:
+               # Une seule requête UPDATE conditionnelle, avec le journal et la notification dans la même transaction
+               workflow.transition(
+                    internship, evenement, acteur=acteur, enregistrer=commit, version_attendue=version_attendue,
+                    entreprise_selectionnee=internship.entreprise_selectionnee, encadreur=internship.encadreur,
+               )
 
           return internship
 
@@ -344,30 +374,100 @@ class InternshipGradingForm(forms.ModelForm):
         widget=NumberInput(attrs={'min': 0, 'max': 100}),
         required=True
     )
+    # Version du stage affichée dans la modale (verrouillage optimiste, voir Internship.version) ;
+    # obligatoire : un envoi sans version contournerait le contrôle
+    version = forms.IntegerField(widget=HiddenInput)
 
     class Meta:
         model = Internship
         fields = ['note']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk and not workflow.peut(self.instance, 'noter'):
+            raise ValidationError("Ce stage n'est pas dans un état permettant la notation.")
+        return cleaned_data
+
     def clean_note(self):
         note = self.cleaned_data.get('note')
         if note is not None and (note < 0 or note > 100):
             raise ValidationError("La note doit être comprise entre 0 et 100.")
         return note
 
-    def save(self, commit=True):
+    def save(self, commit=True, acteur=None):
         # Surcharger la méthode save pour mettre à jour le statut et la date de notation
         internship = super().save(commit=False) # Met à jour le champ note
 
-        # Mettre à jour le statut à 'TERMINE' si une note est attribuée et que le statut n'est pas déjà terminé
-        if internship.note is not None and internship.statut != 'TERMINE':
-             internship.statut = 'TERMINE' # Le stage est considéré comme terminé après notation
+        # Statut 'TERMINE' et date de notation : voir workflow.TRANSITIONS['noter']
+        workflow.transition(
+            internship, 'noter', acteur=acteur, enregistrer=commit,
+            version_attendue=self.cleaned_data['version'], note=internship.note,
+        )
 
-        # Mettre à jour la date de notation si une note est attribuée ou modifiée
-        if internship.note is not None:
-             internship.date_notation = timezone.now()
+        return internship
 
-        if commit:
-            internship.save() # Sauvegarder l'instance Internship
 
-        return internship
+# --- Formulaire d'événement du workflow (API JSON) ---
+class InternshipTransitionForm(forms.Form):
+    # Champs écrits avec le statut, selon l'événement (les autres événements n'écrivent que statut et dates)
+    CHAMPS_PAR_EVENEMENT = {
+        'valider': ('entreprise_selectionnee',),
+        'affecter_encadreur': ('entreprise_selectionnee', 'encadreur'),
+        'noter': ('note',),
+    }
+    CHAMPS_REQUIS = {
+        'valider': ('entreprise_selectionnee',),
+        'affecter_encadreur': ('encadreur',),
+        'noter': ('note',),
+    }
+
+    evenement = forms.ChoiceField(choices=[(e, e) for e in workflow.TRANSITIONS])
+    # Version lue par le client (verrouillage optimiste, voir Internship.version), obligatoire
+    version = forms.IntegerField()
+    entreprise_selectionnee = forms.ModelChoiceField(queryset=Company.objects.none(), required=False)
+    encadreur = forms.ModelChoiceField(queryset=Teacher.objects.all(), required=False)
+    note = forms.IntegerField(min_value=0, max_value=100, required=False)
+
+    def __init__(self, *args, stage, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage = stage
+        restreindre_choix(self)
+        # Comme dans InternshipValidationForm : seulement une des entreprises proposées par l'étudiant
+        self.fields['entreprise_selectionnee'].queryset = Company.objects.filter(
+            id__in=[pk for pk in (stage.etudiant.entreprise_proposee_1_id, stage.etudiant.entreprise_proposee_2_id) if pk]
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        evenement = cleaned_data.get('evenement')
+        if evenement is None:
+            return cleaned_data
+        permis = self.CHAMPS_PAR_EVENEMENT.get(evenement, ())
+        for champ in ('entreprise_selectionnee', 'encadreur', 'note'):
+            valeur = cleaned_data.get(champ)
+            if valeur is None and champ in self.CHAMPS_REQUIS.get(evenement, ()):
+                if champ not in self.errors:
+                    self.add_error(champ, f"Requis pour l'événement « {evenement} ».")
+            elif valeur is not None and champ not in permis:
+                self.add_error(champ, f"Non modifiable par l'événement « {evenement} ».")
+        if (evenement == 'affecter_encadreur' and cleaned_data.get('entreprise_selectionnee') is None
+                and self.stage.entreprise_selectionnee_id is None and 'entreprise_selectionnee' not in self.errors):
+            self.add_error('entreprise_selectionnee', "L'entreprise du stage n'est pas encore validée.")
+        return cleaned_data
+
+    def save(self, acteur=None):
+        evenement = self.cleaned_data['evenement']
+        valeurs = {
+            champ: self.cleaned_data[champ]
+            for champ in self.CHAMPS_PAR_EVENEMENT.get(evenement, ()) if self.cleaned_data.get(champ) is not None
+        }
+        # Une seule requête UPDATE conditionnelle (statut de départ et version), journal et notification compris
+        workflow.transition(
+            self.stage, evenement, acteur=acteur, version_attendue=self.cleaned_data['version'], **valeurs,
+        )
+        return self.stage
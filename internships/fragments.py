@@ -0,0 +1,101 @@
+# gestion_stages_univ/internships/fragments.py
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .models import Faculty, Teacher, Student, Company, Internship
+
+
+# Relations affichées dans chaque ligne : leur date_modification fait partie de la version
+# de la ligne, pour qu'une modification de l'entreprise ou de l'encadreur la régénère.
+DEPENDANCES_LIGNES = {
+    Student: (),
+    Teacher: (),
+    Company: (),
+    Internship: (
+        'etudiant',
+        'etudiant.entreprise_proposee_1',
+        'etudiant.entreprise_proposee_2',
+        'entreprise_selectionnee',
+        'encadreur',
+    ),
+}
+
+
+def cache_fragments():
+    return caches[getattr(settings, 'FRAGMENTS_CACHE_ALIAS', 'default')]
+
+
+def empreinte_references():
+    """
+    Empreinte des modèles de référence affichés dans les lignes (facultés, départements, promotions) :
+    dernière modification et effectifs, lus en une requête d'agrégat sur ces petites tables. Elle fait
+    partie de la clé des lignes : un renommage ou une suppression les régénère dans tous les processus,
+    même avec un cache propre à chaque processus (LocMemCache).
+    """
+    valeurs = Faculty.objects.aggregate(
+        maj_facultes=Max('date_modification'),
+        maj_departements=Max('departements__date_modification'),
+        maj_promotions=Max('departements__promotions__date_modification'),
+        nb_facultes=Count('pk', distinct=True),
+        nb_departements=Count('departements', distinct=True),
+        nb_promotions=Count('departements__promotions', distinct=True),
+    )
+    brut = "|".join(str(valeurs[cle]) for cle in sorted(valeurs))
+    return hashlib.md5(brut.encode()).hexdigest()[:12]
+
+
+def _suivre(objet, chemin):
+    for attribut in chemin.split('.'):
+        if objet is None:
+            return None
+        objet = getattr(objet, attribut)
+    return objet
+
+
+def version_ligne(objet):
+    """Version d'une ligne = horodatages de l'objet et des objets liés qu'elle affiche."""
+    horodatages = [objet.date_modification]
+    for chemin in DEPENDANCES_LIGNES.get(type(objet), ()):
+        lie = _suivre(objet, chemin)
+        horodatages.append(lie.date_modification if lie is not None else None)
+    brut = "|".join(h.isoformat() if h else '-' for h in horodatages)
+    return hashlib.md5(brut.encode()).hexdigest()
+
+
+def rendre_lignes(objets, gabarit, nom_variable):
+    """
+    Rend chaque objet avec le gabarit de ligne `gabarit`, en réutilisant le HTML en cache.
+    Une seule lecture groupée (get_many) et une seule écriture groupée (set_many) :
+    seules les lignes absentes ou dont la version a changé sont rendues.
+    """
+    objets = list(objets)
+    if not objets:
+        return ''
+
+    cache = cache_fragments()
+    prefixe = f"ligne:{empreinte_references()}:{gabarit}"
+    cles = [f"{prefixe}:{objet.pk}:{version_ligne(objet)}" for objet in objets]
+    en_cache = cache.get_many(cles)
+
+    template = None  # Compilé (ou récupéré du chargeur en cache) seulement s'il manque des lignes
+    nouvelles = {}
+    morceaux = []
+    for cle, objet in zip(cles, objets):
+        html = en_cache.get(cle)
+        if html is None:
+            if template is None:
+                template = get_template(gabarit)
+            html = template.render({nom_variable: objet})
+            nouvelles[cle] = html
+        morceaux.append(html)
+
+    if nouvelles:
+        cache.set_many(nouvelles, timeout=getattr(settings, 'FRAGMENTS_CACHE_DUREE', 60 * 60 * 24))
+
+    return mark_safe(''.join(morceaux))
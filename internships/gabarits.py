@@ -0,0 +1,47 @@
+# gestion_stages_univ/internships/gabarits.py
+
+import logging
+import time
+from pathlib import Path
+
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+# Racine des templates de l'application (tableaux de bord, partiels, rapports, registration)
+RACINE_GABARITS = Path(__file__).resolve().parent / 'templates'
+
+
+def lister_gabarits(racine=RACINE_GABARITS):
+    """Noms de chargement ('internships/partials/...html') de tous les templates de l'application."""
+    return sorted(
+        chemin.relative_to(racine).as_posix()
+        for chemin in racine.rglob('*.html')
+    )
+
+
+def compiler_gabarits(noms=None):
+    """
+    Compile chaque template via get_template (ce qui remplit le chargeur en cache s'il est actif).
+    Retourne (nombre compilé, durée en ms, liste des erreurs [(nom, exception)]).
+    """
+    noms = lister_gabarits() if noms is None else noms
+    erreurs = []
+    debut = time.perf_counter()
+    for nom in noms:
+        try:
+            get_template(nom)
+        except TemplateSyntaxError as e:
+            erreurs.append((nom, e))
+    duree_ms = (time.perf_counter() - debut) * 1000
+    return len(noms) - len(erreurs), duree_ms, erreurs
+
+
+def precharger_gabarits():
+    """Appelé au démarrage d'un worker (wsgi.py / asgi.py) : compile tout et journalise la durée."""
+    nombre, duree_ms, erreurs = compiler_gabarits()
+    logger.info("Préchargement des templates : %d compilés en %.1f ms.", nombre, duree_ms)
+    for nom, erreur in erreurs:
+        logger.error("Template '%s' invalide : %s", nom, erreur)
+    return nombre, duree_ms, erreurs
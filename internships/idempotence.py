@@ -0,0 +1,62 @@
+# gestion_stages_univ/internships/idempotence.py
+#
+# Clés d'idempotence des requêtes POST. Le formulaire reçoit une clé aléatoire à l'affichage
+# (champ caché cle_idempotence), un client HTTP peut aussi l'envoyer dans l'en-tête Idempotency-Key.
+# La vue réserve la clé dans la transaction de l'écriture : un double clic ou une nouvelle tentative
+# après une coupure réseau porte la même clé et est reconnu comme déjà traité, au lieu d'être rejoué.
+# Si l'écriture échoue, la transaction est annulée avec la réservation, et la clé reste utilisable.
+
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import CleIdempotence
+
+
+CHAMP_CLE = 'cle_idempotence'
+ENTETE_CLE = 'Idempotency-Key'
+_FORMAT_CLE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class RequeteDejaTraitee(Exception):
+    """Une requête portant la même clé d'idempotence a déjà été enregistrée."""
+
+
+def nouvelle_cle():
+    return uuid.uuid4().hex
+
+
+def cle_de_la_requete(request):
+    """Clé d'idempotence de la requête (en-tête, sinon champ du formulaire), ou None si absente ou mal formée."""
+    cle = request.headers.get(ENTETE_CLE) or request.POST.get(CHAMP_CLE)
+    return cle if cle and _FORMAT_CLE.match(cle) else None
+
+
+def reserver_cle(request):
+    """
+    Enregistre la clé d'idempotence de la requête ; à appeler dans la transaction de l'écriture protégée.
+    Lève RequeteDejaTraitee si la clé a déjà été utilisée par cet utilisateur. Sous PostgreSQL, un envoi
+    simultané avec la même clé attend la fin de la première transaction sur l'index unique, puis échoue
+    si elle a été validée. Sans clé, ne fait rien (retourne None).
+    """
+    cle = cle_de_la_requete(request)
+    if cle is None or not request.user.is_authenticated:
+        return None
+    try:
+        # Point de sauvegarde : l'échec de l'INSERT ne doit pas invalider la transaction englobante
+        with transaction.atomic():
+            return CleIdempotence.objects.create(utilisateur=request.user, cle=cle, chemin=request.path[:255])
+    except IntegrityError:
+        raise RequeteDejaTraitee(cle) from None
+
+
+def purger_cles(avant=None):
+    """Supprime les clés plus anciennes que `avant` (défaut : settings.RETENTION_CLES_IDEMPOTENCE_HEURES)."""
+    if avant is None:
+        avant = timezone.now() - timedelta(hours=getattr(settings, 'RETENTION_CLES_IDEMPOTENCE_HEURES', 24))
+    # Aucune table ne référence les clés : une seule requête DELETE
+    return CleIdempotence.objects.filter(date_creation__lt=avant).delete()[0]
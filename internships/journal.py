@@ -0,0 +1,88 @@
+# gestion_stages_univ/internships/journal.py
+#
+# Journal des transitions de statut (modèle TransitionStage) : écriture groupée et rétention.
+#
+# Volumétrie : les lignes sont petites (identifiants, deux codes sur 2 octets, date) et n'ont pas
+# de contrainte de clé étrangère, l'insertion ne verrouille donc rien d'autre. La rétention supprime
+# les lignes anciennes par tranches de clés primaires (les id croissent avec la date), après les avoir
+# éventuellement archivées en CSV compressé, un fichier par mois. Sous PostgreSQL, la table peut en plus
+# être partitionnée par mois sur la colonne date sans changer ce code.
+
+import csv
+import gzip
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CODES_STATUT, TransitionStage
+
+
+TAILLE_LOT_JOURNAL = 1000
+TAILLE_LOT_PURGE = 10000
+
+
+def ligne_transition(stage_id, ancien_statut, nouveau_statut, acteur_id=None, date=None):
+    """Ligne (non enregistrée) du journal ; ancien_statut vaut None à la création du stage."""
+    return TransitionStage(
+        stage_id=stage_id,
+        statut_avant=CODES_STATUT[ancien_statut] if ancien_statut else None,
+        statut_apres=CODES_STATUT[nouveau_statut],
+        acteur_id=acteur_id,
+        date=date or timezone.now(),
+    )
+
+
+def journaliser_transitions(lignes):
+    """Enregistre des lignes du journal en un minimum de requêtes INSERT."""
+    return TransitionStage.objects.bulk_create(lignes, batch_size=TAILLE_LOT_JOURNAL)
+
+
+def journaliser_transition(stage, ancien_statut, acteur=None):
+    """Journalise le changement de statut de `stage` (rien si le statut n'a pas changé)."""
+    if stage.statut == ancien_statut:
+        return None
+    acteur_id = acteur.pk if acteur is not None and acteur.is_authenticated else None
+    return journaliser_transitions([ligne_transition(stage.pk, ancien_statut, stage.statut, acteur_id)])[0]
+
+
+def _archiver(lignes, dossier):
+    """Ajoute les lignes au fichier CSV compressé de leur mois (transitions_AAAA-MM.csv.gz)."""
+    par_mois = {}
+    for ligne in lignes:
+        par_mois.setdefault(ligne[5].strftime('%Y-%m'), []).append(ligne)
+    for mois, lignes_du_mois in par_mois.items():
+        chemin = os.path.join(dossier, f"transitions_{mois}.csv.gz")
+        nouveau = not os.path.exists(chemin)
+        # Mode ajout : chaque tranche forme un membre gzip, le fichier reste lisible d'un bloc
+        with gzip.open(chemin, 'at', newline='', encoding='utf-8') as f:
+            ecrivain = csv.writer(f)
+            if nouveau:
+                ecrivain.writerow(['id', 'stage_id', 'statut_avant', 'statut_apres', 'acteur_id', 'date'])
+            ecrivain.writerows((*ligne[:5], ligne[5].isoformat()) for ligne in lignes_du_mois)
+
+
+def purger_transitions(avant=None, dossier_archive=None, taille_lot=TAILLE_LOT_PURGE):
+    """
+    Supprime les transitions antérieures à `avant` (défaut : settings.RETENTION_TRANSITIONS_JOURS),
+    par tranches de `taille_lot` lignes, chacune dans sa propre courte requête DELETE.
+    Avec `dossier_archive`, chaque tranche est d'abord ajoutée aux archives mensuelles.
+    Retourne le nombre de lignes supprimées.
+    """
+    if avant is None:
+        avant = timezone.now() - timedelta(days=getattr(settings, 'RETENTION_TRANSITIONS_JOURS', 5 * 365))
+    if dossier_archive:
+        os.makedirs(dossier_archive, exist_ok=True)
+
+    anciennes = TransitionStage.objects.filter(date__lt=avant).order_by('pk')
+    total = 0
+    while True:
+        lignes = list(anciennes.values_list(
+            'pk', 'stage_id', 'statut_avant', 'statut_apres', 'acteur_id', 'date',
+        )[:taille_lot])
+        if not lignes:
+            return total
+        if dossier_archive:
+            _archiver(lignes, dossier_archive)
+        total += TransitionStage.objects.filter(pk__in=[ligne[0] for ligne in lignes]).purger()
@@ -0,0 +1,52 @@
+# gestion_stages_univ/internships/management/commands/archiver_annee.py
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from internships.archives import ArchivageImpossible, annees_archivees, archiver_annee, stages_ouverts
+from internships.models import Promotion, StageArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les étudiants et les stages d'une année académique close vers les archives (voir archives.py). "
+        "Sans argument, liste les années avec leurs effectifs courants et archivés. "
+        "Une exécution interrompue se reprend en relançant la même commande."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('annee', nargs='?', help="Année académique à archiver (ex: 2023-2024).")
+        parser.add_argument('--forcer', action='store_true', help="Archiver même si des stages ne sont ni terminés ni annulés.")
+        parser.add_argument('--conserver-comptes', action='store_true', help="Ne pas désactiver les comptes des étudiants archivés.")
+
+    def handle(self, *args, **options):
+        annee = options['annee']
+        if annee is None:
+            return self._lister()
+        if not re.fullmatch(r'\d{4}-\d{4}', annee):
+            raise CommandError("Année académique attendue au format AAAA-AAAA (ex: 2023-2024).")
+        if options['forcer']:
+            ouverts = stages_ouverts(annee).count()
+            if ouverts:
+                self.stdout.write(self.style.WARNING(f"{ouverts} stage(s) encore ouverts seront archivés dans leur statut actuel."))
+        try:
+            total = archiver_annee(
+                annee, forcer=options['forcer'], desactiver_comptes=not options['conserver_comptes'],
+                progression=lambda nombre: self.stdout.write(f"  {nombre} étudiant(s) archivé(s)..."),
+            )
+        except ArchivageImpossible as erreur:
+            raise CommandError(str(erreur))
+        self.stdout.write(self.style.SUCCESS(f"{annee} : {total} étudiant(s) et leurs stages déplacés vers les archives."))
+
+    def _lister(self):
+        courants = dict(
+            Promotion.objects.values_list('annee_academique').annotate(n=Count('etudiants')).values_list('annee_academique', 'n')
+        )
+        archives = dict(StageArchive.objects.values_list('annee_academique').annotate(n=Count('id')).values_list('annee_academique', 'n'))
+        archivees = annees_archivees()
+        self.stdout.write(f"  {'année':<12}{'courants':>10}{'archivés':>10}")
+        for annee in sorted({*courants, *archives, *archivees}, reverse=True):
+            marque = "  (archivée)" if annee in archivees else ""
+            self.stdout.write(f"  {annee:<12}{courants.get(annee, 0):>10}{archives.get(annee, 0):>10}{marque}")
@@ -0,0 +1,77 @@
+# gestion_stages_univ/internships/management/commands/comparer_moteurs_pdf.py
+
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from internships.models import Faculty, Department, Promotion, Teacher, Student, Company, Internship
+from internships.rapports import MOTEURS_PDF, rapport_affectations_pdf
+
+
+def stages_synthetiques(nombre):
+    """
+    Génère `nombre` stages en mémoire (non enregistrés) avec leurs objets liés,
+    pour mesurer les moteurs sans dépendre du contenu de la base.
+    """
+    faculte = Faculty(nom="Faculté des Sciences", code="ST")
+    departements = [Department(faculte=faculte, nom=f"Département {i}", code=f"D{i}") for i in range(5)]
+    promotions = [
+        Promotion(departement=departements[i % 5], nom=f"L{i % 3 + 1}", annee_academique="2024-2025")
+        for i in range(15)
+    ]
+    entreprises = [Company(nom=f"Entreprise partenaire n°{i}") for i in range(200)]
+    encadreurs = [Teacher(matricule=f"ENS{i:04d}", nom_complet=f"Encadreur Numéro {i}") for i in range(100)]
+    for i in range(nombre):
+        etudiant = Student(
+            matricule=f"2024-{i:06d}-ST-L3", nom_complet=f"Étudiant Synthétique {i}",
+            promotion=promotions[i % 15], id_inscription_annee=i,
+        )
+        yield Internship(
+            etudiant=etudiant, statut='ENCADREUR_AFFECTE',
+            entreprise_selectionnee=entreprises[i % 200], encadreur=encadreurs[i % 100],
+        )
+
+
+class Command(BaseCommand):
+    help = "Compare le temps et la mémoire des moteurs PDF (xhtml2pdf / reportlab) sur le rapport des affectations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=10000, help="Nombre de stages synthétiques.")
+        parser.add_argument('--moteurs', nargs='+', choices=MOTEURS_PDF, default=list(MOTEURS_PDF))
+        parser.add_argument(
+            '--memoire', action='store_true',
+            help="Mesurer aussi le pic mémoire (tracemalloc, ralentit nettement la génération).",
+        )
+
+    def _generer(self, moteur, lignes):
+        # xhtml2pdf a besoin d'une séquence (le template appelle |length), reportlab accepte un itérateur
+        stages = stages_synthetiques(lignes)
+        if moteur == 'xhtml2pdf':
+            stages = list(stages)
+        dest = io.BytesIO()
+        debut = time.perf_counter()
+        rapport_affectations_pdf(stages=stages, date_rapport=timezone.now(), moteur=moteur, dest=dest)
+        return time.perf_counter() - debut, len(dest.getvalue())
+
+    def handle(self, *args, **options):
+        lignes = options['lignes']
+        resultats = {}
+        for moteur in options['moteurs']:
+            self.stdout.write(f"{moteur} : génération de {lignes} lignes...")
+            duree, taille = self._generer(moteur, lignes)
+            pic = None
+            if options['memoire']:
+                tracemalloc.start()
+                self._generer(moteur, lignes)
+                pic = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            resultats[moteur] = duree
+            memoire = f", pic mémoire {pic / 1024 / 1024:.1f} Mo" if pic is not None else ""
+            self.stdout.write(f"  {duree:.2f} s, {lignes / duree:.0f} lignes/s, PDF {taille / 1024:.0f} Ko{memoire}")
+
+        if len(resultats) == 2:
+            facteur = resultats['xhtml2pdf'] / resultats['reportlab']
+            self.stdout.write(self.style.SUCCESS(f"reportlab est {facteur:.1f}x plus rapide que xhtml2pdf sur {lignes} lignes."))
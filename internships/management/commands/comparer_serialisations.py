@@ -0,0 +1,164 @@
+# gestion_stages_univ/internships/management/commands/comparer_serialisations.py
+
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+from functools import reduce
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import JsonResponse
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from internships import serialisation
+from internships.api import RESSOURCES
+from internships.charge import HACHEURS_RAPIDES, HOTE, ClientASGI, creer_jeu_de_donnees
+from internships.models import Internship, User
+
+
+IDENTIFIANTS = ('comparaison', 'comparaison-mot-de-passe')
+
+
+def _valeur(objet, chemin):
+    return reduce(getattr, chemin.split('__'), objet)
+
+
+def corps_instances(ressource, queryset):
+    """Chemin par défaut : instances de modèle, dictionnaire par attribut, JsonResponse (DjangoJSONEncoder)."""
+    relations = sorted({chemin.rsplit('__', 1)[0] for chemin in ressource.champs.values() if '__' in chemin})
+    lignes = [
+        {nom: _valeur(objet, chemin) for nom, chemin in ressource.champs.items()}
+        for objet in queryset.select_related(*relations)
+    ]
+    return JsonResponse({'resultats': lignes}).content
+
+
+def corps_values_list(ressource, queryset, moteur):
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, list(ressource.champs))
+    return serialisation.encodeur('json', moteur)({'resultats': [ligne for _, ligne in plan.lignes(queryset)]})
+
+
+def corps_flux(ressource, queryset, format, moteur=None):
+    """Réponse écrite par morceaux : consommée sans être assemblée, comme par le serveur."""
+    plan = serialisation.PlanColonnes(ressource.modele, ressource.champs, list(ressource.champs))
+    return sum(len(morceau) for morceau in serialisation.morceaux(plan.iterer(queryset), format, moteur=moteur))
+
+
+def _authentification():
+    return 'Basic ' + base64.b64encode(':'.join(IDENTIFIANTS).encode()).decode()
+
+
+def corps_export_wsgi(nom):
+    """Export de l'API servi par le gestionnaire WSGI : le générateur de morceaux est consommé tel quel."""
+    reponse = Client(HTTP_AUTHORIZATION=_authentification()).get(reverse('api_export', args=[nom]))
+    if reponse.status_code != 200:
+        raise CommandError(f"Export WSGI : statut {reponse.status_code} ({reponse.content[:200]!r}).")
+    return sum(len(morceau) for morceau in reponse.streaming_content)
+
+
+def corps_export_asgi(nom):
+    """Export de l'API servi par le gestionnaire ASGI (itérateur asynchrone), corps compté sans être gardé."""
+    client = ClientASGI(get_asgi_application(), hote=HOTE)
+    reponse = asyncio.run(client.requete(
+        'GET', reverse('api_export', args=[nom]), entetes={'Authorization': _authentification()}, garder_corps=False,
+    ))
+    if reponse.statut != 200:
+        raise CommandError(f"Export ASGI : statut {reponse.statut}.")
+    return reponse.taille
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la sérialisation d'une ressource de l'API sur une base de test synthétique : instances de modèle "
+        "et JsonResponse (chemin par défaut) contre values_list() et serialisation.py (json, orjson, msgpack, "
+        "réponse complète ou écrite par morceaux), puis l'export de l'API servi par les gestionnaires WSGI et ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etudiants', type=int, default=50000, help="Taille de la promotion synthétique.")
+        parser.add_argument('--ressource', choices=['stages', 'etudiants'], default='stages')
+        parser.add_argument('--repetitions', type=int, default=3, help="Meilleur temps sur n exécutions.")
+        parser.add_argument(
+            '--memoire', action='store_true',
+            help="Mesurer aussi le pic mémoire (tracemalloc, ralentit nettement les mesures).",
+        )
+
+    def _chemins(self):
+        ressource = self.ressource
+        chemins = {
+            'instances + JsonResponse': lambda qs: corps_instances(ressource, qs),
+            'values_list + json': lambda qs: corps_values_list(ressource, qs, 'json'),
+            'values_list + json, flux': lambda qs: corps_flux(ressource, qs, 'json', 'json'),
+        }
+        if serialisation._module('orjson') is not None:
+            chemins['values_list + orjson'] = lambda qs: corps_values_list(ressource, qs, 'orjson')
+            chemins['values_list + orjson, flux'] = lambda qs: corps_flux(ressource, qs, 'json', 'orjson')
+        if 'msgpack' in serialisation.formats_disponibles():
+            chemins['values_list + msgpack, flux'] = lambda qs: corps_flux(ressource, qs, 'msgpack')
+        chemins['export WSGI'] = lambda qs: corps_export_wsgi(self.nom_ressource)
+        chemins['export ASGI'] = lambda qs: corps_export_asgi(self.nom_ressource)
+        return chemins
+
+    def handle(self, *args, **options):
+        if options['etudiants'] < 1 or options['repetitions'] < 1:
+            raise CommandError("--etudiants et --repetitions doivent être positifs.")
+        self.nom_ressource = options['ressource']
+        self.ressource = RESSOURCES[self.nom_ressource]
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), f"serialisations_{os.getpid()}.sqlite3")
+        nom_origine = connection.settings_dict['NAME']
+        with override_settings(PASSWORD_HASHERS=HACHEURS_RAPIDES, ALLOWED_HOSTS=[HOTE, 'testserver']):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write(f"Base de test : {connection.vendor}, {options['etudiants']} étudiants synthétiques...")
+                creer_jeu_de_donnees(options['etudiants'])
+                nom, mot_de_passe = IDENTIFIANTS
+                User.objects.create_user(nom, password=mot_de_passe, est_facultaire=True)
+                # Dates renseignées sur la moitié des stages : colonnes à convertir, comme en fin d'année
+                stages = Internship.objects.order_by('pk').values_list('pk', flat=True)
+                Internship.objects.filter(pk__lte=stages[options['etudiants'] // 2]).update(
+                    statut='PROPOSITION_SOUMISE', date_proposition_soumise=timezone.now(), date_debut=timezone.localdate(),
+                )
+                resultats = self._mesurer(options)
+            finally:
+                connection.creation.destroy_test_db(nom_origine, verbosity=0)
+
+        reference = resultats['instances + JsonResponse']
+        meilleur = min(resultats, key=resultats.get)
+        self.stdout.write(self.style.SUCCESS(
+            f"{meilleur} est {reference / resultats[meilleur]:.1f}x plus rapide que le chemin par défaut."
+        ))
+
+    def _mesurer(self, options):
+        queryset = self.ressource.modele.objects.order_by('pk')
+        lignes = queryset.count()
+        resultats = {}
+        for nom, produire in self._chemins().items():
+            durees = []
+            for _ in range(options['repetitions']):
+                debut = time.perf_counter()
+                corps = produire(queryset)
+                durees.append(time.perf_counter() - debut)
+            duree = min(durees)
+            taille = corps if isinstance(corps, int) else len(corps)
+            del corps
+            pic = None
+            if options['memoire']:
+                tracemalloc.start()
+                produire(queryset)
+                pic = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            resultats[nom] = duree
+            memoire = f", pic mémoire {pic / 1024 / 1024:.1f} Mo" if pic is not None else ""
+            self.stdout.write(
+                f"  {nom:<30}{duree:>7.2f} s  {lignes / duree:>9.0f} lignes/s  {taille / 1024 / 1024:>6.1f} Mo{memoire}"
+            )
+        return resultats
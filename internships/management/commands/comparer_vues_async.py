@@ -0,0 +1,208 @@
+# gestion_stages_univ/internships/management/commands/comparer_vues_async.py
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from internships.charge import HACHEURS_RAPIDES, HOTE, ClientASGI, _percentile, creer_jeu_de_donnees
+from internships.models import Department, Internship, Student, Teacher, User
+
+
+# Pages comparées, par rôle de l'utilisateur connecté
+PAGES = {
+    'facultaire': [
+        '/facultaire/tableau-de-bord/', '/facultaire/stages/', '/facultaire/etudiants/',
+        '/facultaire/entreprises/', '/facultaire/enseignants/',
+    ],
+    'enseignant': ['/enseignant/tableau-de-bord/', '/enseignant/stages-encadres/'],
+    'etudiant': ['/etudiant/tableau-de-bord/'],
+}
+
+
+def _requete_wsgi(application, chemin, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': chemin, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': HOTE, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOTE, 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    statut = []
+
+    def start_response(status, headers, exc_info=None):
+        statut.append(int(status.split()[0]))
+
+    reponse = application(environ, start_response)
+    try:
+        b''.join(reponse)
+    finally:
+        if hasattr(reponse, 'close'):
+            reponse.close()
+    return statut[0]
+
+
+def mesurer_wsgi(chemin, cookie, requetes, concurrence):
+    """Vues synchrones derrière le handler WSGI, servies par un pool de threads (comme gunicorn gthread)."""
+    from university_internships.wsgi import application
+
+    def une(_):
+        debut = time.perf_counter()
+        statut = _requete_wsgi(application, chemin, cookie)
+        return time.perf_counter() - debut, statut
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as pool:
+        resultats = list(pool.map(une, range(requetes)))
+    return time.perf_counter() - debut, resultats
+
+
+def mesurer_asgi(chemin, cookie, requetes, concurrence):
+    """Vues asynchrones derrière le handler ASGI, dans une boucle asyncio (comme un worker uvicorn)."""
+    from university_internships.asgi import application
+
+    nom, _, valeur = cookie.partition('=')
+
+    async def tout():
+        semaphore = asyncio.Semaphore(concurrence)
+
+        async def une():
+            async with semaphore:
+                client = ClientASGI(application, hote=HOTE)
+                client.cookies[nom] = valeur
+                debut = time.perf_counter()
+                reponse = await client.requete('GET', chemin)
+                return time.perf_counter() - debut, reponse.statut
+
+        return await asyncio.gather(*(une() for _ in range(requetes)))
+
+    debut = time.perf_counter()
+    resultats = asyncio.run(tout())
+    return time.perf_counter() - debut, resultats
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les tableaux de bord et les listes : vues synchrones sous WSGI contre vues asynchrones "
+        "sous ASGI (internships/vues_async.py), sur une base de test synthétique. Chaque mode tourne "
+        "dans son propre processus, comme en déploiement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etudiants', type=int, default=1000, help="Taille du jeu de données synthétique.")
+        parser.add_argument('--requetes', type=int, default=200, help="Requêtes par page et par mode.")
+        parser.add_argument('--concurrence', type=int, default=20, help="Requêtes simultanées.")
+        parser.add_argument('--json', metavar='FICHIER', default=None, help="Écrire aussi les résultats en JSON.")
+        # Exécution d'un mode dans un sous-processus (usage interne)
+        parser.add_argument('--executer', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+        parser.add_argument('--base', help=argparse.SUPPRESS)
+        parser.add_argument('--cookies', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['executer']:
+            return self._executer_mode(options)
+        if options['requetes'] < 1 or options['concurrence'] < 1:
+            raise CommandError("--requetes et --concurrence doivent être positifs.")
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), f"vues_async_{os.getpid()}.sqlite3")
+        nom_origine = connection.settings_dict['NAME']
+        with override_settings(PASSWORD_HASHERS=HACHEURS_RAPIDES):
+            nom_base = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write(f"Base de test : {connection.vendor}, {options['etudiants']} étudiants synthétiques...")
+                cookies = self._preparer_donnees(options['etudiants'])
+                connection.close()
+                resultats = {mode: self._lancer_mode(mode, nom_base, cookies, options) for mode in ('wsgi', 'asgi')}
+            finally:
+                connection.creation.destroy_test_db(nom_origine, verbosity=0)
+
+        self._afficher(resultats)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, ensure_ascii=False, indent=2)
+
+    def _preparer_donnees(self, nb_etudiants):
+        noms = creer_jeu_de_donnees(nb_etudiants)
+        departement = Department.objects.first()
+        enseignants = []
+        for i in range(20):
+            utilisateur = User.objects.create(username=f"ens_charge{i}", est_enseignant=True)
+            enseignants.append(Teacher.objects.create(
+                user=utilisateur, matricule=f"ENS{i:04d}", nom_complet=f"Enseignant {i}", departement=departement,
+            ))
+        # Une moitié des stages avec encadreur, pour remplir les pages des enseignants
+        stages = list(Internship.objects.order_by('pk').values_list('pk', flat=True))
+        for i, enseignant in enumerate(enseignants):
+            Internship.objects.filter(pk__in=stages[i:len(stages) // 2:len(enseignants)]).update(
+                encadreur=enseignant, statut='ENCADREUR_AFFECTE',
+            )
+        facultaire = User.objects.create(username='fac_charge', est_facultaire=True)
+        etudiant = Student.objects.get(user__username=noms[0]).user
+
+        cookies = {}
+        for role, utilisateur in (('facultaire', facultaire), ('enseignant', enseignants[0].user), ('etudiant', etudiant)):
+            client = Client()
+            client.force_login(utilisateur)
+            cookies[role] = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        return cookies
+
+    def _lancer_mode(self, mode, nom_base, cookies, options):
+        self.stdout.write(f"Mode {mode.upper()}...")
+        env = dict(os.environ, VUES_ASYNCHRONES='True' if mode == 'asgi' else 'False')
+        resultat = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'comparer_vues_async',
+             '--executer', mode, '--base', str(nom_base), '--cookies', json.dumps(cookies),
+             '--requetes', str(options['requetes']), '--concurrence', str(options['concurrence'])],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if resultat.returncode != 0:
+            raise CommandError(f"Le mode {mode} a échoué :\n{resultat.stderr[-3000:]}")
+        return json.loads(resultat.stdout.strip().splitlines()[-1])
+
+    def _executer_mode(self, options):
+        settings.DATABASES['default']['NAME'] = options['base']
+        if HOTE not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, HOTE]
+        mesurer = mesurer_asgi if options['executer'] == 'asgi' else mesurer_wsgi
+        cookies = json.loads(options['cookies'])
+        pages = {}
+        for role, chemins in PAGES.items():
+            for chemin in chemins:
+                mesurer(chemin, cookies[role], min(options['concurrence'], options['requetes']), options['concurrence'])  # Chauffe
+                duree, resultats = mesurer(chemin, cookies[role], options['requetes'], options['concurrence'])
+                durees = [d for d, _ in resultats]
+                pages[chemin] = {
+                    'req_s': len(resultats) / duree,
+                    'p50_ms': _percentile(durees, 50) * 1000,
+                    'p95_ms': _percentile(durees, 95) * 1000,
+                    'erreurs': sum(1 for _, statut in resultats if statut != 200),
+                }
+        self.stdout.write(json.dumps(pages))
+
+    def _afficher(self, resultats):
+        wsgi, asgi = resultats['wsgi'], resultats['asgi']
+        self.stdout.write(
+            f"  {'page':<32}{'WSGI req/s':>11}{'p95 ms':>8}{'ASGI req/s':>12}{'p95 ms':>8}{'ASGI/WSGI':>11}"
+        )
+        for chemin in wsgi:
+            w, a = wsgi[chemin], asgi[chemin]
+            self.stdout.write(
+                f"  {chemin:<32}{w['req_s']:>11.1f}{w['p95_ms']:>8.0f}{a['req_s']:>12.1f}{a['p95_ms']:>8.0f}"
+                f"{a['req_s'] / w['req_s']:>10.2f}x"
+            )
+            if w['erreurs'] or a['erreurs']:
+                self.stdout.write(self.style.WARNING(f"    réponses non 200 : WSGI {w['erreurs']}, ASGI {a['erreurs']}"))
+
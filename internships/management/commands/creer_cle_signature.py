@@ -0,0 +1,63 @@
+# gestion_stages_univ/internships/management/commands/creer_cle_signature.py
+
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée une clé privée et un certificat auto-signé (PEM) pour signer les PDF en local "
+        "(développement, recette). En production, utiliser le certificat délivré à la Faculté."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dossier', help="Dossier où écrire signature_cle.pem et signature_certificat.pem.")
+        parser.add_argument('--nom', default="Secrétariat de la Faculté", help="Nom (CN) du certificat.")
+        parser.add_argument('--jours', type=int, default=365 * 3, help="Durée de validité du certificat.")
+        parser.add_argument('--mot-de-passe', default=None, help="Chiffrer la clé privée avec ce mot de passe.")
+
+    def handle(self, *args, **options):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+        os.makedirs(options['dossier'], exist_ok=True)
+        chemin_cle = os.path.join(options['dossier'], 'signature_cle.pem')
+        chemin_certificat = os.path.join(options['dossier'], 'signature_certificat.pem')
+        if os.path.exists(chemin_cle):
+            raise CommandError(f"{chemin_cle} existe déjà : refus de l'écraser.")
+
+        cle = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        nom = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, options['nom'])])
+        maintenant = datetime.datetime.now(datetime.timezone.utc)
+        certificat = (
+            x509.CertificateBuilder()
+            .subject_name(nom).issuer_name(nom)
+            .public_key(cle.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(maintenant - datetime.timedelta(minutes=5))
+            .not_valid_after(maintenant + datetime.timedelta(days=options['jours']))
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(x509.KeyUsage(
+                digital_signature=True, content_commitment=True, key_encipherment=False, data_encipherment=False,
+                key_agreement=False, key_cert_sign=True, crl_sign=False, encipher_only=False, decipher_only=False,
+            ), critical=True)
+            .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]), critical=False)
+            .sign(cle, hashes.SHA256())
+        )
+
+        if options['mot_de_passe']:
+            chiffrement = serialization.BestAvailableEncryption(options['mot_de_passe'].encode())
+        else:
+            chiffrement = serialization.NoEncryption()
+        with open(chemin_cle, 'wb') as f:
+            f.write(cle.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, chiffrement))
+        os.chmod(chemin_cle, 0o600)
+        with open(chemin_certificat, 'wb') as f:
+            f.write(certificat.public_bytes(serialization.Encoding.PEM))
+
+        self.stdout.write(self.style.SUCCESS(f"Clé : {chemin_cle}\nCertificat : {chemin_certificat}"))
+        self.stdout.write("Définir SIGNATURE_CLE et SIGNATURE_CERTIFICAT (variables d'environnement) avec ces chemins.")
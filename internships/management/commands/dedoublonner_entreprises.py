@@ -0,0 +1,55 @@
+# gestion_stages_univ/internships/management/commands/dedoublonner_entreprises.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from internships import doublons
+
+
+class Command(BaseCommand):
+    help = (
+        "Liste les groupes d'entreprises probablement en double (voir doublons.py), avec le nombre de paires "
+        "comparées grâce au blocage. Avec --fusionner, fusionne chaque groupe dans son entreprise la plus référencée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seuil', type=float, default=doublons.SEUIL_SUGGESTION, help="Similarité minimale (0.5 à 1).")
+        parser.add_argument('--fusionner', action='store_true', help="Fusionner les groupes trouvés au lieu de seulement les lister.")
+
+    def handle(self, *args, **options):
+        seuil = options['seuil']
+        if not 0.5 <= seuil <= 1:
+            raise CommandError("Le seuil doit être compris entre 0.5 et 1.")
+
+        debut = time.perf_counter()
+        liste = doublons.fiches()
+        paires, ignores = doublons.paires_candidates(liste)
+        toutes = len(liste) * (len(liste) - 1) // 2
+        self.stdout.write(
+            f"{len(liste)} entreprise(s) : {len(paires)} paire(s) comparée(s) sur {toutes} possibles, "
+            f"{ignores} bloc(s) trop grand(s) ignoré(s)."
+        )
+        groupes = doublons.suggestions(seuil)
+        self.stdout.write(f"{len(groupes)} groupe(s) de doublons au seuil {seuil:.2f} ({time.perf_counter() - debut:.2f} s) :")
+        for groupe in groupes:
+            self.stdout.write(f"  [{groupe['score']:.2f}]")
+            for entreprise, nombre in groupe['membres']:
+                marque = '*' if entreprise == groupe['conservee'] else ' '
+                self.stdout.write(f"    {marque} #{entreprise.pk} {entreprise.nom} ({nombre} référence(s))")
+
+        if not options['fusionner']:
+            return
+        supprimees = etudiants = stages = 0
+        for groupe in groupes:
+            try:
+                resultat = doublons.fusionner(groupe['conservee'].pk, [e.pk for e in groupe['doublons']])
+            except doublons.FusionImpossible as erreur:
+                self.stdout.write(self.style.WARNING(f"  #{groupe['conservee'].pk} : {erreur}"))
+                continue
+            supprimees += resultat['supprimees']
+            etudiants += resultat['etudiants']
+            stages += resultat['stages']
+        self.stdout.write(self.style.SUCCESS(
+            f"{supprimees} entreprise(s) fusionnée(s) : {etudiants} étudiant(s) et {stages} stage(s) repointés."
+        ))
@@ -0,0 +1,31 @@
+# gestion_stages_univ/internships/management/commands/envoyer_notifications.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from internships.notifications import MAX_TENTATIVES_NOTIFICATION, TAILLE_LOT_NOTIFICATIONS, envoyer_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les emails en attente dans la boîte d'envoi (modèle Notification), par lots, "
+        "sur une seule connexion SMTP. Sans --boucle, vide la boîte une fois puis s'arrête (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_NOTIFICATIONS)
+        parser.add_argument('--max-tentatives', type=int, default=MAX_TENTATIVES_NOTIFICATION)
+        parser.add_argument('--boucle', action='store_true', help="Tourner en continu (processus d'envoi permanent).")
+        parser.add_argument('--intervalle', type=float, default=10.0, help="Secondes entre deux passages en mode --boucle.")
+
+    def handle(self, *args, **options):
+        while True:
+            envoyees, echecs = envoyer_notifications(
+                taille_lot=options['taille_lot'], max_tentatives=options['max_tentatives'],
+            )
+            if envoyees or echecs or not options['boucle']:
+                self.stdout.write(f"{envoyees} notification(s) envoyée(s), {echecs} échec(s).")
+            if not options['boucle']:
+                break
+            time.sleep(options['intervalle'])
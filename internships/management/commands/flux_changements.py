@@ -0,0 +1,66 @@
+# gestion_stages_univ/internships/management/commands/flux_changements.py
+
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from internships.changements import (
+    CODES_RESSOURCE, TAILLE_LOT_CHANGEMENTS, CurseurPerime, changements_depuis, curseur_actuel, purger_changements,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte les changements (étudiants, enseignants, entreprises, stages) survenus après --depuis, "
+        "une ligne JSON par changement, par lots bornés ; le nouveau curseur est écrit sur la sortie d'erreur. "
+        "--tete donne le curseur actuel (à noter avant un export complet), --purger applique la rétention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depuis', type=int, default=0, help="Curseur du dernier changement déjà traité.")
+        parser.add_argument('--ressources', default='', help=f"Ressources à exporter ({', '.join(CODES_RESSOURCE)}), séparées par des virgules.")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_CHANGEMENTS)
+        parser.add_argument('--max', type=int, default=None, help="Nombre maximal de changements exportés.")
+        parser.add_argument('--compacter', action='store_true', help="Un seul changement par objet et par lot.")
+        parser.add_argument('--sortie', metavar='FICHIER', default=None, help="Fichier JSON lines (défaut : sortie standard).")
+        parser.add_argument('--tete', action='store_true', help="Afficher le curseur actuel et s'arrêter.")
+        parser.add_argument('--purger', action='store_true', help="Supprimer les changements plus anciens que settings.RETENTION_CHANGEMENTS_JOURS.")
+
+    def handle(self, *args, **options):
+        if options['tete']:
+            self.stdout.write(str(curseur_actuel()))
+            return
+        if options['purger']:
+            avant = timezone.now() - timedelta(days=settings.RETENTION_CHANGEMENTS_JOURS)
+            total = purger_changements(avant)
+            self.stdout.write(self.style.SUCCESS(f"{total} changement(s) antérieur(s) au {avant:%d/%m/%Y} supprimé(s)."))
+            return
+
+        ressources = [nom for nom in options['ressources'].split(',') if nom]
+        inconnues = [nom for nom in ressources if nom not in CODES_RESSOURCE]
+        if inconnues:
+            raise CommandError(f"Ressource(s) inconnue(s) : {', '.join(inconnues)}.")
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être positive.")
+
+        sortie = open(options['sortie'], 'w', encoding='utf-8') if options['sortie'] else self.stdout
+        curseur, total = options['depuis'], 0
+        try:
+            while options['max'] is None or total < options['max']:
+                taille = options['taille_lot'] if options['max'] is None else min(options['taille_lot'], options['max'] - total)
+                lignes, curseur, encore = changements_depuis(curseur, taille, ressources, compacter=options['compacter'])
+                for ligne in lignes:
+                    sortie.write(json.dumps(ligne, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+                total += len(lignes)
+                if not encore:
+                    break
+        except CurseurPerime as erreur:
+            raise CommandError(f"{erreur} Refaire une synchronisation complète à partir du curseur {curseur_actuel()}.")
+        finally:
+            if options['sortie']:
+                sortie.close()
+        self.stderr.write(f"{total} changement(s) exporté(s). Curseur : {curseur}")
@@ -0,0 +1,68 @@
+# gestion_stages_univ/internships/management/commands/generer_documents.py
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from internships.documents import TYPES_DOCUMENTS, documents_a_generer, generer_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère en lot les documents individuels (attestation, lettre d'affectation, relevé de note). "
+        "Les documents déjà présents dans le dossier de sortie et à jour sont conservés : relancer la commande "
+        "après une interruption reprend la génération là où elle s'était arrêtée, et après un changement "
+        "(note, nom, encadreur...) ne refait que les documents concernés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'types', nargs='*', help=f"Types à générer parmi {', '.join(TYPES_DOCUMENTS)} (défaut : tous).",
+        )
+        parser.add_argument('--dossier', default=None, help="Dossier de sortie (défaut : settings.DOCUMENTS_DOSSIER).")
+        parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de CPU).")
+        parser.add_argument('--taille-lot', type=int, default=200, help="Nombre de stages par lot confié à un processus.")
+        parser.add_argument('--forcer', action='store_true', help="Régénérer aussi les documents déjà à jour.")
+        parser.add_argument(
+            '--signature', choices=('auto', 'oui', 'non'), default='auto',
+            help="Signer les documents avec pyHanko (auto : si une clé de signature est configurée).",
+        )
+
+    def handle(self, *args, **options):
+        racine = options['dossier'] or settings.DOCUMENTS_DOSSIER
+        types = options['types'] or list(TYPES_DOCUMENTS)
+        inconnus = [t for t in types if t not in TYPES_DOCUMENTS]
+        if inconnus:
+            raise CommandError(f"Type(s) de document inconnu(s) : {', '.join(inconnus)}.")
+        signer = {'auto': None, 'oui': True, 'non': False}[options['signature']]
+        nb_erreurs = 0
+
+        for type_document in types:
+            dossier = os.path.join(racine, type_document)
+            pks = documents_a_generer(type_document, dossier, forcer=options['forcer'])
+            if not pks:
+                self.stdout.write(f"{type_document} : rien à générer.")
+                continue
+
+            self.stdout.write(f"{type_document} : {len(pks)} document(s) à générer dans {dossier}")
+            debut = time.perf_counter()
+            total = 0
+            lots = generer_documents(
+                type_document, dossier, pks=pks, workers=options['workers'], taille_lot=options['taille_lot'],
+                signer=signer,
+            )
+            for generes, erreurs in lots:
+                total += generes
+                for pk, erreur in erreurs:
+                    self.stderr.write(f"  stage {pk} : {erreur}")
+                nb_erreurs += len(erreurs)
+                self.stdout.write(f"  {total}/{len(pks)}")
+            duree = time.perf_counter() - debut
+            self.stdout.write(self.style.SUCCESS(
+                f"{type_document} : {total} document(s) en {duree:.1f} s ({total / duree if duree else 0:.1f}/s)"
+            ))
+
+        if nb_erreurs:
+            raise CommandError(f"{nb_erreurs} document(s) en erreur ; relancer la commande pour les reprendre.")
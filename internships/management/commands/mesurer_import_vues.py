@@ -0,0 +1,88 @@
+# gestion_stages_univ/internships/management/commands/mesurer_import_vues.py
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Modules lourds qui ne doivent JAMAIS être chargés par l'import des vues (imports différés)
+MODULES_INTERDITS = ('xhtml2pdf', 'reportlab', 'PIL', 'lxml', 'html5lib', 'pypdf', 'pyhanko', 'qrcode', 'numpy')
+
+# Importe les vues sous -X importtime ; la liste des modules interdits chargés est écrite sur stdout
+SCRIPT_IMPORT = (
+    "import json, sys, django; django.setup(); import {module}; "
+    "print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}} & set({interdits!r}))))"
+)
+
+LIGNE_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût d'import de internships.views avec `python -X importtime` "
+        "et échoue s'il dépasse le budget ou si un module lourd (PDF, NumPy...) est importé."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='internships.views', help="Module à mesurer.")
+        parser.add_argument('--repetitions', type=int, default=5, help="Nombre de processus lancés (la médiane est retenue).")
+        parser.add_argument(
+            '--budget-ms', type=float, default=getattr(settings, 'BUDGET_IMPORT_VUES_MS', 100.0),
+            help="Temps d'import cumulé maximal du module, en millisecondes.",
+        )
+        parser.add_argument('--top', type=int, default=10, help="Nombre de sous-modules les plus coûteux à afficher.")
+
+    def _mesurer(self, module):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'university_internships.settings'))
+        script = SCRIPT_IMPORT.format(module=module, interdits=MODULES_INTERDITS)
+        resultat = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if resultat.returncode != 0:
+            raise CommandError(f"L'import de {module} a échoué :\n{resultat.stderr[-2000:]}")
+
+        # Les sous-modules importés par `module` précèdent sa propre ligne et sont plus indentés
+        lignes = [m.groups() for m in map(LIGNE_IMPORTTIME.match, resultat.stderr.splitlines()) if m]
+        index = next((i for i, l in enumerate(lignes) if l[3] == module), None)
+        if index is None:
+            raise CommandError(f"{module} était déjà importé par django.setup() : mesure impossible.")
+        cumul_us = int(lignes[index][1])
+        profondeur = len(lignes[index][2])
+        sous_modules = []
+        for self_us, cumul, indent, nom in reversed(lignes[:index]):
+            if len(indent) <= profondeur:
+                break
+            sous_modules.append((int(cumul), nom))
+
+        interdits = json.loads(resultat.stdout.strip().splitlines()[-1])
+        return cumul_us / 1000, sous_modules, interdits
+
+    def handle(self, *args, **options):
+        module = options['module']
+        mesures = []
+        sous_modules, interdits = [], []
+        for _ in range(options['repetitions']):
+            duree_ms, sous_modules, interdits = self._mesurer(module)
+            mesures.append(duree_ms)
+        mediane = statistics.median(mesures)
+
+        self.stdout.write(f"Import de {module} : médiane {mediane:.1f} ms (min {min(mesures):.1f}, max {max(mesures):.1f}, {len(mesures)} mesures)")
+        self.stdout.write("Sous-modules les plus coûteux :")
+        for cumul_us, nom in sorted(sous_modules, reverse=True)[:options['top']]:
+            self.stdout.write(f"  {cumul_us / 1000:8.1f} ms  {nom.strip()}")
+
+        erreurs = []
+        if interdits:
+            erreurs.append(f"modules lourds importés au chargement : {', '.join(interdits)}")
+        if mediane > options['budget_ms']:
+            erreurs.append(f"{mediane:.1f} ms dépasse le budget de {options['budget_ms']:.1f} ms")
+        if erreurs:
+            raise CommandError("Régression du temps d'import : " + " ; ".join(erreurs))
+        self.stdout.write(self.style.SUCCESS(f"OK : dans le budget de {options['budget_ms']:.1f} ms."))
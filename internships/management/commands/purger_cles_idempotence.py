@@ -0,0 +1,24 @@
+# gestion_stages_univ/internships/management/commands/purger_cles_idempotence.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from internships.idempotence import purger_cles
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les clés d'idempotence plus anciennes que --heures "
+        "(défaut : settings.RETENTION_CLES_IDEMPOTENCE_HEURES). À planifier quotidiennement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heures', type=int, default=None, help="Âge maximal des clés conservées, en heures.")
+
+    def handle(self, *args, **options):
+        heures = options['heures'] if options['heures'] is not None else settings.RETENTION_CLES_IDEMPOTENCE_HEURES
+        total = purger_cles(avant=timezone.now() - timedelta(hours=heures))
+        self.stdout.write(self.style.SUCCESS(f"{total} clé(s) d'idempotence supprimée(s)."))
@@ -0,0 +1,27 @@
+# gestion_stages_univ/internships/management/commands/purger_transitions.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from internships.journal import TAILLE_LOT_PURGE, purger_transitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Rétention du journal des transitions : supprime par tranches les lignes plus anciennes que "
+        "--jours (défaut : settings.RETENTION_TRANSITIONS_JOURS), après archivage CSV mensuel optionnel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=None, help="Âge maximal des lignes conservées, en jours.")
+        parser.add_argument('--archiver', metavar='DOSSIER', default=None, help="Archiver les lignes supprimées (CSV gzip par mois).")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_PURGE)
+
+    def handle(self, *args, **options):
+        jours = options['jours'] if options['jours'] is not None else settings.RETENTION_TRANSITIONS_JOURS
+        avant = timezone.now() - timedelta(days=jours)
+        total = purger_transitions(avant=avant, dossier_archive=options['archiver'], taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f"{total} transition(s) antérieure(s) au {avant:%d/%m/%Y} supprimée(s)."))
@@ -0,0 +1,53 @@
+# gestion_stages_univ/internships/management/commands/rapport_affectations.py
+
+import shutil
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from internships.models import Faculty
+from internships.perimetre import dans_le_perimetre
+from internships.rapports import ErreurRapportPDF, moteur_rapport
+from internships.rapports_lots import DECOUPAGES, FORMATS, rapport_affectations_par_partie
+from internships.signature import ErreurSignature
+
+
+class Command(BaseCommand):
+    help = (
+        "Produit hors requête le rapport des affectations découpé par promotion ou par département (voir "
+        "rapports_lots.py), avec un processus par partie (défaut : settings.RAPPORTS_WORKERS, sinon nombre "
+        "de CPU). La vue web plafonne ce nombre à settings.RAPPORTS_WORKERS_REQUETE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Fichier à écrire (archive ZIP ou PDF selon --format).")
+        parser.add_argument('--par', choices=tuple(DECOUPAGES), default='promotion', help="Découpage du rapport.")
+        parser.add_argument('--format', choices=FORMATS, default='zip', help="Une archive de PDF ou un PDF fusionné.")
+        parser.add_argument('--moteur', default=None, help="Moteur PDF (défaut : settings.MOTEURS_RAPPORTS_PDF).")
+        parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : RAPPORTS_WORKERS).")
+        parser.add_argument('--annee', default=None, help="Limiter à une année académique (ex: 2024-2025).")
+        parser.add_argument('--faculte', default=None, help="Limiter à une faculté (code, ex: ST).")
+
+    def handle(self, *args, **options):
+        faculte = None
+        if options['faculte']:
+            faculte = Faculty.objects.filter(code=options['faculte']).values_list('id', flat=True).first()
+            if faculte is None:
+                raise CommandError(f"Faculté inconnue : '{options['faculte']}'.")
+
+        debut = time.perf_counter()
+        try:
+            moteur = moteur_rapport('affectations', options['moteur'])
+            with dans_le_perimetre(options['annee'], faculte):
+                fichier, nb_parties = rapport_affectations_par_partie(
+                    par=options['par'], format=options['format'], moteur=moteur, workers=options['workers'],
+                )
+        except (ValueError, ErreurRapportPDF, ErreurSignature) as erreur:
+            raise CommandError(str(erreur))
+
+        with fichier, open(options['sortie'], 'wb') as dest:
+            shutil.copyfileobj(fichier, dest)
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_parties} partie(s) écrites dans {options['sortie']} en {duree:.1f} s."
+        ))
@@ -0,0 +1,60 @@
+# gestion_stages_univ/internships/management/commands/signer_documents.py
+
+import os
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from internships.signature import TAILLE_LOT_SIGNATURES, fichiers_a_signer, signataire, signer_fichiers
+
+
+class Command(BaseCommand):
+    help = (
+        "Signe avec pyHanko tous les PDF d'un dossier (rapports, documents générés). Les fichiers signés "
+        "sont écrits dans un dossier séparé ; ceux déjà présents et pas plus anciens que leur source sont "
+        "conservés, ce qui permet de reprendre une signature interrompue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dossier', help="Dossier contenant les PDF à signer.")
+        parser.add_argument('--sortie', default=None, help="Dossier des PDF signés (défaut : <dossier>_signes).")
+        parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de CPU).")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_SIGNATURES, help="Nombre de fichiers par lot.")
+        parser.add_argument('--forcer', action='store_true', help="Signer de nouveau les fichiers déjà signés.")
+
+    def handle(self, *args, **options):
+        dossier = os.path.normpath(options['dossier'])
+        if not os.path.isdir(dossier):
+            raise CommandError(f"Dossier introuvable : {dossier}")
+        sortie = options['sortie'] or f"{dossier}_signes"
+        if os.path.abspath(sortie) == os.path.abspath(dossier):
+            raise CommandError("Le dossier de sortie doit être différent du dossier source.")
+        os.makedirs(sortie, exist_ok=True)
+
+        try:
+            signataire()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        paires = fichiers_a_signer(dossier, sortie, forcer=options['forcer'])
+        if not paires:
+            self.stdout.write("Rien à signer.")
+            return
+
+        self.stdout.write(f"{len(paires)} fichier(s) à signer dans {sortie}")
+        debut = time.perf_counter()
+        total, nb_erreurs = 0, 0
+        for signes, erreurs in signer_fichiers(paires, workers=options['workers'], taille_lot=options['taille_lot']):
+            total += signes
+            for source, erreur in erreurs:
+                self.stderr.write(f"  {source} : {erreur}")
+            nb_erreurs += len(erreurs)
+            self.stdout.write(f"  {total}/{len(paires)}")
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} fichier(s) signé(s) en {duree:.1f} s ({total * 60 / duree if duree else 0:.0f}/min)"
+        ))
+
+        if nb_erreurs:
+            raise CommandError(f"{nb_erreurs} fichier(s) en erreur ; relancer la commande pour les reprendre.")
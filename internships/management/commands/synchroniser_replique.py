@@ -0,0 +1,32 @@
+# gestion_stages_univ/internships/management/commands/synchroniser_replique.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from internships.repliques import ALIAS_REPLIQUE, replique_configuree
+
+
+class Command(BaseCommand):
+    help = (
+        "Recopie la base principale SQLite dans la réplique SQLite (DB_REPLIQUE, voir repliques.py), pour "
+        "essayer les lectures sur réplique en local. Sous PostgreSQL, la réplication du serveur s'en charge."
+    )
+
+    def handle(self, *args, **options):
+        if not replique_configuree():
+            raise CommandError("Aucune réplique configurée : définir DB_REPLIQUE (chemin du second fichier SQLite).")
+        principale, replique = connections[DEFAULT_DB_ALIAS], connections[ALIAS_REPLIQUE]
+        if principale.vendor != 'sqlite' or replique.vendor != 'sqlite':
+            raise CommandError("Copie possible seulement entre deux bases SQLite ; sinon, utiliser la réplication du serveur.")
+
+        debut = time.perf_counter()
+        principale.ensure_connection()
+        replique.ensure_connection()
+        # API de sauvegarde de SQLite : copie cohérente, même pendant des écritures sur la base principale
+        principale.connection.backup(replique.connection)
+        replique.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Réplique {replique.settings_dict['NAME']} synchronisée en {time.perf_counter() - debut:.2f} s."
+        ))
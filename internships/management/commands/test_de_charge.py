@@ -0,0 +1,116 @@
+# gestion_stages_univ/internships/management/commands/test_de_charge.py
+
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from internships.charge import (
+    HACHEURS_RAPIDES, MOT_DE_PASSE, SurveillanceVerrousPostgres, creer_jeu_de_donnees,
+    lancer_test_de_charge, rapport, verifier_coherence,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge du dépôt des propositions : des étudiants synthétiques se connectent et soumettent "
+        "leurs propositions en même temps, via l'application ASGI appelée dans le processus. "
+        "Utilise une base de test créée pour l'occasion (SQLite par défaut, PostgreSQL avec DB_MOTEUR=postgresql)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etudiants', type=int, default=2000, help="Nombre d'étudiants synthétiques.")
+        parser.add_argument('--entreprises', type=int, default=50)
+        parser.add_argument('--concurrence', type=int, default=200, help="Parcours simultanés au plus, par processus.")
+        parser.add_argument('--processus', type=int, default=1, help="Processus (workers ASGI) partageant la base.")
+        parser.add_argument(
+            '--double-envoi', type=float, default=0.1,
+            help="Proportion d'étudiants qui envoient le formulaire deux fois en même temps (0 à 1).",
+        )
+        parser.add_argument('--hachage-reel', action='store_true', help="Hacher les mots de passe avec PBKDF2 (coût réel des connexions).")
+        parser.add_argument('--graine', type=int, default=1, help="Graine du générateur aléatoire (scénario reproductible).")
+        parser.add_argument('--json', metavar='FICHIER', default=None, help="Écrire aussi le rapport complet en JSON.")
+        parser.add_argument('--garder-base', action='store_true', help="Ne pas supprimer la base de test à la fin.")
+
+    def handle(self, *args, **options):
+        if options['etudiants'] < 1 or options['concurrence'] < 1 or options['processus'] < 1:
+            raise CommandError("--etudiants, --concurrence et --processus doivent être positifs.")
+        if options['entreprises'] < 2:
+            raise CommandError("Il faut au moins 2 entreprises (deux propositions par étudiant).")
+
+        # Base de test dédiée : sous SQLite, un fichier (pas la base en mémoire) pour mesurer les vrais verrous
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), f"charge_{os.getpid()}.sqlite3")
+        nom_origine = connection.settings_dict['NAME']
+        hacheurs = settings.PASSWORD_HASHERS if options['hachage_reel'] else HACHEURS_RAPIDES
+
+        with override_settings(PASSWORD_HASHERS=hacheurs):
+            nom_base = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write(f"Base de test : {connection.vendor} ({nom_base})")
+                self.stdout.write(f"Création de {options['etudiants']} étudiants synthétiques...")
+                noms = creer_jeu_de_donnees(options['etudiants'], options['entreprises'])
+
+                surveillance = None
+                if connection.vendor == 'postgresql':
+                    surveillance = SurveillanceVerrousPostgres()
+                    surveillance.start()
+                self.stdout.write(
+                    f"Dépôt simultané : {options['processus']} processus, {options['concurrence']} parcours simultanés par processus..."
+                )
+                mesures, duree = lancer_test_de_charge(
+                    noms, processus=options['processus'], concurrence=options['concurrence'],
+                    mot_de_passe=MOT_DE_PASSE, proba_double_envoi=options['double_envoi'], graine=options['graine'],
+                )
+                resultat = rapport(mesures, duree)
+                if surveillance is not None:
+                    resultat['postgresql'] = surveillance.arreter()
+                resultat['coherence'] = verifier_coherence()
+                self._afficher(resultat, len(noms))
+                if options['json']:
+                    with open(options['json'], 'w', encoding='utf-8') as f:
+                        json.dump(resultat, f, ensure_ascii=False, indent=2)
+            finally:
+                if options['garder_base']:
+                    self.stdout.write(f"Base de test conservée : {nom_base}")
+                    connection.settings_dict['NAME'] = nom_origine
+                else:
+                    connection.creation.destroy_test_db(nom_origine, verbosity=0)
+
+    def _afficher(self, r, nb_etudiants):
+        self.stdout.write(
+            f"{r['requetes']} requêtes en {r['duree_s']:.1f} s : {r['debit_req_s']:.0f} req/s, "
+            f"taux d'erreur {r['taux_erreur']:.2%}, {r['parcours_complets']}/{nb_etudiants} parcours complets"
+        )
+        self.stdout.write(f"  {'étape':<16}{'requêtes':>9}{'erreurs':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for etape, e in r['etapes'].items():
+            self.stdout.write(
+                f"  {etape:<16}{e['requetes']:>9}{e['erreurs']:>9}{e['p50_ms']:>9.0f}{e['p95_ms']:>9.0f}{e['p99_ms']:>9.0f}{e['max_ms']:>9.0f}"
+            )
+        for erreur, n in r['erreurs'].items():
+            self.stdout.write(self.style.WARNING(f"  erreur {erreur} : {n}"))
+        for exception, n in r['exceptions'].items():
+            self.stdout.write(self.style.WARNING(f"  exception {exception} : {n}"))
+
+        ecritures = r['ecritures_sql']
+        lentes = next(v for k, v in ecritures.items() if k.startswith('plus_de_'))
+        self.stdout.write(
+            f"Écritures SQL : {ecritures['nombre']}, p95 {ecritures['p95_ms']:.1f} ms, max {ecritures['max_ms']:.0f} ms, "
+            f"{lentes} lente(s) (attente de verrou probable), {ecritures['verrous_sqlite']} erreur(s) « database is locked »"
+        )
+        if 'postgresql' in r:
+            pg = r['postgresql']
+            self.stdout.write(
+                f"PostgreSQL : jusqu'à {pg['attente_verrou_max']} session(s) en attente de verrou "
+                f"(moyenne {pg['attente_verrou_moyenne']:.2f}), {pg['deadlocks']} deadlock(s)"
+            )
+        c = r['coherence']
+        style = self.style.SUCCESS if c['transitions_soumission_en_double'] == 0 else self.style.ERROR
+        self.stdout.write(style(
+            f"Cohérence : {c['stages_soumis']} stage(s) soumis, {c['transitions_soumission_en_double']} stage(s) "
+            f"avec plusieurs transitions, {c['cles_idempotence']} clé(s) d'idempotence"
+        ))
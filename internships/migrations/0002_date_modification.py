@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('internships', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddField(
+            model_name='internship',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('est_enseignant', False), ('est_etudiant', False), ('est_facultaire', True)), models.Q(('est_enseignant', True), ('est_etudiant', False), ('est_facultaire', False)), models.Q(('est_enseignant', False), ('est_etudiant', True), ('est_facultaire', False)), models.Q(('est_enseignant', False), ('est_etudiant', False), ('est_facultaire', False)), _connector='OR'), name='internships_user_has_one_role'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 14:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0002_date_modification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evenement', models.CharField(choices=[('EN_ATTENTE_PROPOSITION', 'En attente de proposition'), ('PROPOSITION_SOUMISE', 'Proposition Soumise'), ('PROPOSITION_VALIDEE', 'Proposition Validée'), ('ENCADREUR_AFFECTE', 'Encadreur Affecté'), ('EN_COURS', 'En Cours'), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], max_length=30, verbose_name='événement')),
+                ('destinataire', models.EmailField(max_length=254, verbose_name='destinataire')),
+                ('sujet', models.CharField(max_length=255, verbose_name='sujet')),
+                ('corps', models.TextField(verbose_name='corps')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_ENVOI', "En cours d'envoi"), ('ENVOYEE', 'Envoyée'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20, verbose_name='statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='tentatives')),
+                ('derniere_erreur', models.TextField(blank=True, verbose_name='dernière erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='date création')),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now, verbose_name='prochain essai')),
+                ('date_reservation', models.DateTimeField(blank=True, null=True, verbose_name='date réservation')),
+                ('date_envoi', models.DateTimeField(blank=True, null=True, verbose_name='date envoi')),
+                ('stage', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='internships.internship', verbose_name='stage')),
+            ],
+            options={
+                'verbose_name': 'notification',
+                'verbose_name_plural': 'notifications',
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['statut', 'prochain_essai'], name='notification_a_envoyer_idx')],
+            },
+        ),
+    ]
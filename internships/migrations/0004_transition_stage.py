@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 14:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0003_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransitionStage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('statut_avant', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'En attente de proposition'), (2, 'Proposition Soumise'), (3, 'Proposition Validée'), (4, 'Encadreur Affecté'), (5, 'En Cours'), (6, 'Terminé'), (7, 'Annulé')], null=True, verbose_name='statut avant')),
+                ('statut_apres', models.PositiveSmallIntegerField(choices=[(1, 'En attente de proposition'), (2, 'Proposition Soumise'), (3, 'Proposition Validée'), (4, 'Encadreur Affecté'), (5, 'En Cours'), (6, 'Terminé'), (7, 'Annulé')], verbose_name='statut après')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date')),
+                ('acteur', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='acteur')),
+                ('stage', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transitions', to='internships.internship', verbose_name='stage')),
+            ],
+            options={
+                'verbose_name': 'transition de stage',
+                'verbose_name_plural': 'transitions de stage',
+                'ordering': ['id'],
+                'default_permissions': ('add', 'view'),
+                'indexes': [models.Index(fields=['stage', 'date'], name='transition_stage_date_idx'), models.Index(fields=['date'], name='transition_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0004_transition_stage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internship',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='version'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 14:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0005_version_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, verbose_name='clé')),
+                ('chemin', models.CharField(max_length=255, verbose_name='chemin')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='date création')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cles_idempotence', to=settings.AUTH_USER_MODEL, verbose_name='utilisateur')),
+            ],
+            options={
+                'verbose_name': "clé d'idempotence",
+                'verbose_name_plural': "clés d'idempotence",
+                'constraints': [models.UniqueConstraint(fields=('utilisateur', 'cle'), name='cle_idempotence_unique')],
+            },
+        ),
+    ]
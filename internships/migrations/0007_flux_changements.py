@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 14:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0006_cle_idempotence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Changement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ressource', models.PositiveSmallIntegerField(choices=[(1, 'etudiants'), (2, 'enseignants'), (3, 'entreprises'), (4, 'stages')], verbose_name='ressource')),
+                ('objet_id', models.BigIntegerField(verbose_name='objet')),
+                ('operation', models.PositiveSmallIntegerField(choices=[(1, 'création'), (2, 'modification'), (3, 'suppression')], verbose_name='opération')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date')),
+            ],
+            options={
+                'verbose_name': 'changement',
+                'verbose_name_plural': 'changements',
+                'ordering': ['id'],
+                'default_permissions': ('view',),
+                'indexes': [models.Index(fields=['ressource', 'id'], name='changement_ressource_idx'), models.Index(fields=['date'], name='changement_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-19 14:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0007_flux_changements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnneeArchivee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee_academique', models.CharField(max_length=9, unique=True, verbose_name='année académique')),
+                ('nb_stages', models.PositiveIntegerField(default=0, verbose_name='nombre de stages')),
+                ('date_archivage', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date archivage')),
+            ],
+            options={
+                'verbose_name': 'année archivée',
+                'verbose_name_plural': 'années archivées',
+                'ordering': ['-annee_academique'],
+                'default_permissions': ('view',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='changement',
+            name='operation',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'création'), (2, 'modification'), (3, 'suppression'), (4, 'archivage')], verbose_name='opération'),
+        ),
+        migrations.CreateModel(
+            name='StageArchive',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('annee_academique', models.CharField(max_length=9, verbose_name='année académique')),
+                ('promotion_id', models.IntegerField(blank=True, null=True, verbose_name='promotion')),
+                ('promotion_nom', models.CharField(blank=True, max_length=50, null=True, verbose_name='nom promotion')),
+                ('departement_id', models.IntegerField(blank=True, null=True, verbose_name='département')),
+                ('etudiant_id', models.IntegerField(verbose_name='étudiant')),
+                ('stage_id', models.IntegerField(blank=True, null=True, verbose_name='stage')),
+                ('matricule', models.CharField(max_length=50, verbose_name='matricule')),
+                ('nom_complet', models.CharField(max_length=200, verbose_name='nom complet')),
+                ('id_inscription_annee', models.IntegerField(verbose_name='ID Inscription Année')),
+                ('statut', models.CharField(blank=True, choices=[('EN_ATTENTE_PROPOSITION', 'En attente de proposition'), ('PROPOSITION_SOUMISE', 'Proposition Soumise'), ('PROPOSITION_VALIDEE', 'Proposition Validée'), ('ENCADREUR_AFFECTE', 'Encadreur Affecté'), ('EN_COURS', 'En Cours'), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], max_length=30, null=True, verbose_name='statut')),
+                ('note', models.IntegerField(blank=True, null=True, verbose_name='note')),
+                ('entreprise_id', models.IntegerField(blank=True, null=True, verbose_name='entreprise')),
+                ('entreprise_nom', models.CharField(blank=True, max_length=200, null=True, verbose_name='nom entreprise')),
+                ('encadreur_id', models.IntegerField(blank=True, null=True, verbose_name='encadreur')),
+                ('encadreur_nom', models.CharField(blank=True, max_length=200, null=True, verbose_name='nom encadreur')),
+                ('date_proposition_soumise', models.DateTimeField(blank=True, null=True, verbose_name='date proposition soumise')),
+                ('date_validation', models.DateTimeField(blank=True, null=True, verbose_name='date validation')),
+                ('date_encadreur_affecte', models.DateTimeField(blank=True, null=True, verbose_name='date encadreur affecté')),
+                ('date_debut', models.DateField(blank=True, null=True, verbose_name='date début stage')),
+                ('date_fin', models.DateField(blank=True, null=True, verbose_name='date fin stage')),
+                ('date_notation', models.DateTimeField(blank=True, null=True, verbose_name='date notation')),
+                ('date_archivage', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date archivage')),
+            ],
+            options={
+                'verbose_name': 'stage archivé',
+                'verbose_name_plural': 'stages archivés',
+                'ordering': ['id'],
+                'default_permissions': ('view',),
+                'indexes': [models.Index(fields=['annee_academique', 'promotion_id'], name='stage_archive_promotion_idx'), models.Index(fields=['matricule'], name='stage_archive_matricule_idx')],
+                'constraints': [models.UniqueConstraint(fields=('annee_academique', 'etudiant_id'), name='stage_archive_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0008_archives'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['annee_academique'], name='promotion_annee_idx'),
+        ),
+    ]
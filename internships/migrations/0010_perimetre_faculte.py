@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 14:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0009_index_annee_promotion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='promotion',
+            name='promotion_annee_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='faculte',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='personnel', to='internships.faculty', verbose_name='faculté'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['annee_academique', 'departement'], name='promotion_annee_dep_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+from internships.normalisation import cle_nom
+
+
+def calculer_cles(apps, schema_editor):
+    # Entreprises existantes : la clé n'est sinon calculée qu'au prochain enregistrement
+    Company = apps.get_model('internships', 'Company')
+    entreprises = []
+    for entreprise in Company.objects.only('pk', 'nom').iterator(chunk_size=2000):
+        entreprise.cle_normalisee = cle_nom(entreprise.nom)
+        entreprises.append(entreprise)
+    Company.objects.bulk_update(entreprises, ['cle_normalisee'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0010_perimetre_faculte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='cle_normalisee',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200, verbose_name='clé normalisée'),
+        ),
+        migrations.RunPython(calculer_cles, migrations.RunPython.noop),
+    ]
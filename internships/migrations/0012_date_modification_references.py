@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0011_cle_normalisee_entreprise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddField(
+            model_name='faculty',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='date modification'),
+        ),
+    ]
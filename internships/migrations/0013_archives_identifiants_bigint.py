@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internships', '0012_date_modification_references'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='departement_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='département'),
+        ),
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='encadreur_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='encadreur'),
+        ),
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='entreprise_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='entreprise'),
+        ),
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='etudiant_id',
+            field=models.BigIntegerField(verbose_name='étudiant'),
+        ),
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='promotion_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='promotion'),
+        ),
+        migrations.AlterField(
+            model_name='stagearchive',
+            name='stage_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='stage'),
+        ),
+        migrations.AddIndex(
+            model_name='stagearchive',
+            index=models.Index(fields=['stage_id'], name='stage_archive_stage_idx'),
+        ),
+    ]
@@ -1,9 +1,14 @@
 # gestion_stages_univ/internships/models.py
 
+import contextvars
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _ # Utile si vous envisagez la traduction
+
+from .normalisation import cle_nom
 # Optionnel: importer des champs de localisation si nécessaire
 # from django_Maps import fields as map_fields
 
@@ -17,6 +22,9 @@ class User(AbstractUser):
     est_facultaire = models.BooleanField(_("est facultaire"), default=False)
     est_enseignant = models.BooleanField(_("est enseignant"), default=False) # Indique si l'utilisateur est un enseignant et peut être un encadreur
     est_etudiant = models.BooleanField(_("est etudiant"), default=False)
+    # Compte facultaire rattaché à une faculté : il ne voit et ne modifie que les données de celle-ci
+    # (voir perimetre.py). Vide : accès à toute l'université.
+    faculte = models.ForeignKey('Faculty', on_delete=models.PROTECT, null=True, blank=True, related_name='personnel', verbose_name=_("faculté"))
 
     # Ajouter d'autres champs communs si nécessaire, par exemple un numéro de téléphone commun
     # telephone = models.CharField(max_length=20, blank=True, null=True)
@@ -59,12 +67,46 @@ class User(AbstractUser):
         return self.is_authenticated and self.est_etudiant
 
 
+# Périmètre de la requête en cours (voir perimetre.py), défini par le décorateur perimetre_facultaire
+# sur les vues facultaires et par l'API ; None ailleurs (aucune restriction) :
+# - année académique de travail (annees.py), choisie en session ;
+# - faculté du compte facultaire (User.faculte).
+ANNEE_DE_TRAVAIL = contextvars.ContextVar('annee_de_travail', default=None)
+FACULTE_DE_TRAVAIL = contextvars.ContextVar('faculte_de_travail', default=None)
+TOUTES_LES_ANNEES = 'toutes'
+
+
+class PerimetreManager(models.Manager):
+    """
+    Restreint les querysets au périmètre de la requête : `annee` est le chemin vers
+    Promotion.annee_academique, `faculte` le chemin vers l'id de la faculté (None : pas de restriction
+    sur cet axe). Hors périmètre défini, équivaut à `objects`.
+    """
+
+    def __init__(self, annee=None, faculte=None):
+        super().__init__()
+        self.chemin_annee = annee
+        self.chemin_faculte = faculte
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        annee = ANNEE_DE_TRAVAIL.get()
+        if self.chemin_annee and annee is not None and annee != TOUTES_LES_ANNEES:
+            queryset = queryset.filter(**{self.chemin_annee: annee})
+        faculte = FACULTE_DE_TRAVAIL.get()
+        if self.chemin_faculte and faculte is not None:
+            queryset = queryset.filter(**{self.chemin_faculte: faculte})
+        return queryset
+
+
 class Faculty(models.Model):
     """
     Représente une faculté au sein de l'université.
     """
     nom = models.CharField(_("nom"), max_length=100)
     code = models.CharField(_("code"), max_length=10, unique=True, help_text=_("Code court unique pour la faculté (ex: ST, EG)")) # Ex: "ST", "EG"
+    # Horodatage de la dernière modification (empreinte des lignes de listes en cache, voir fragments.py)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = _("faculté")
@@ -80,6 +122,11 @@ class Department(models.Model):
     faculte = models.ForeignKey(Faculty, on_delete=models.CASCADE, related_name='departements', verbose_name=_("faculté"))
     nom = models.CharField(_("nom"), max_length=100)
     code = models.CharField(_("code"), max_length=10, unique=True, help_text=_("Code court unique pour le département (ex: INFO, GEST)")) # Ex: "INFO", "GEST"
+    # Horodatage de la dernière modification (empreinte des lignes de listes en cache, voir fragments.py)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+
+    objects = models.Manager()
+    perimetre = PerimetreManager(faculte='faculte_id')
 
     class Meta:
          verbose_name = _("département")
@@ -95,12 +142,24 @@ class Promotion(models.Model):
     departement = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='promotions', verbose_name=_("département"))
     nom = models.CharField(_("nom"), max_length=50, help_text=_("Nom de la promotion (ex: L1, L2, L3, M1, M2)")) # Ex: "L1", "L2", "L3", "M1", "M2"
     annee_academique = models.CharField(_("année académique"), max_length=9, help_text=_("Année académique (ex: 2024-2025)")) # Ex: "2024-2025"
+    # Horodatage de la dernière modification (empreinte des lignes de listes en cache, voir fragments.py)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+
+    # `objects` reste le gestionnaire par défaut (admin, workflow, commandes) ; `perimetre` suit le
+    # périmètre de la requête (année de travail, faculté du compte)
+    objects = models.Manager()
+    perimetre = PerimetreManager(annee='annee_academique', faculte='departement__faculte_id')
 
     class Meta:
         verbose_name = _("promotion")
         verbose_name_plural = _("promotions")
         # S'assurer qu'un nom de promotion est unique par département et année académique
         unique_together = ('departement', 'nom', 'annee_academique')
+        indexes = [
+            # Périmètre : promotions d'une année, éventuellement limitées aux départements d'une faculté,
+            # d'où sont filtrés les étudiants et les stages (par leurs index promotion_id et etudiant_id)
+            models.Index(fields=['annee_academique', 'departement'], name='promotion_annee_dep_idx'),
+        ]
 
 
     def __str__(self):
@@ -116,6 +175,11 @@ class Teacher(models.Model):
     matricule = models.CharField(_("matricule"), max_length=50, unique=True)
     nom_complet = models.CharField(_("nom complet"), max_length=200)
     departement = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='enseignants', verbose_name=_("département"))
+    # Horodatage de la dernière modification (sert aux empreintes ETag / Last-Modified des listes)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+
+    objects = models.Manager()
+    perimetre = PerimetreManager(faculte='departement__faculte_id')
 
     class Meta:
         verbose_name = _("enseignant")
@@ -141,6 +205,12 @@ class Student(models.Model):
     entreprise_proposee_1 = models.ForeignKey('Company', on_delete=models.SET_NULL, null=True, blank=True, related_name='proposee_par_etudiants_1', verbose_name=_("1ère entreprise proposée"))
     entreprise_proposee_2 = models.ForeignKey('Company', on_delete=models.SET_NULL, null=True, blank=True, related_name='proposee_par_etudiants_2', verbose_name=_("2ème entreprise proposée"))
 
+    # Horodatage de la dernière modification (sert aux empreintes ETag / Last-Modified des listes)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+
+    objects = models.Manager()
+    perimetre = PerimetreManager(annee='promotion__annee_academique', faculte='promotion__departement__faculte_id')
+
 
     class Meta:
         verbose_name = _("étudiant")
@@ -161,6 +231,11 @@ class Company(models.Model):
     personne_contact = models.CharField(_("personne contact"), max_length=100, blank=True)
     email_contact = models.EmailField(_("email contact"), blank=True)
     telephone_contact = models.CharField(_("téléphone contact"), max_length=50, blank=True)
+    # Horodatage de la dernière modification (sert aux empreintes ETag / Last-Modified des listes)
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+    # Nom normalisé (normalisation.cle_nom), recalculé à chaque enregistrement : recherche indexée des
+    # entreprises déjà connues sous un autre libellé, et regroupement des doublons (voir doublons.py)
+    cle_normalisee = models.CharField(_("clé normalisée"), max_length=200, blank=True, editable=False, db_index=True)
 
     class Meta:
         verbose_name = _("entreprise")
@@ -169,6 +244,13 @@ class Company(models.Model):
     def __str__(self):
         return self.nom
 
+    def save(self, *args, **kwargs):
+        self.cle_normalisee = cle_nom(self.nom)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nom' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cle_normalisee'}
+        super().save(*args, **kwargs)
+
 class Internship(models.Model):
     """
     Représente l'affectation d'un étudiant à un stage spécifique dans une entreprise,
@@ -203,6 +285,17 @@ class Internship(models.Model):
     date_debut = models.DateField(_("date début stage"), null=True, blank=True)
     date_fin = models.DateField(_("date fin stage"), null=True, blank=True)
     date_notation = models.DateTimeField(_("date notation"), null=True, blank=True)
+    # Horodatage de la dernière modification (sert aux empreintes ETag / Last-Modified des listes)
+    # Attention : QuerySet.update() ne met pas à jour auto_now, il faut le passer explicitement.
+    date_modification = models.DateTimeField(_("date modification"), auto_now=True, db_index=True)
+    # Numéro de version, incrémenté à chaque écriture (verrouillage optimiste) : une modification
+    # préparée sur une version périmée est refusée au lieu d'écraser celle d'un autre utilisateur.
+    version = models.PositiveIntegerField(_("version"), default=1)
+
+    objects = models.Manager()
+    perimetre = PerimetreManager(
+        annee='etudiant__promotion__annee_academique', faculte='etudiant__promotion__departement__faculte_id',
+    )
 
 
     class Meta:
@@ -214,6 +307,14 @@ class Internship(models.Model):
     def __str__(self):
         return f"Stage de {self.etudiant.nom_complet}"
 
+    def save(self, *args, **kwargs):
+        # Toute écriture d'un stage existant rend périmés les formulaires ouverts sur l'ancienne version
+        if self.pk is not None and not kwargs.get('force_insert'):
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
     # Ajoutez des propriétés ou méthodes utiles ici
     @property
     def is_validated(self):
@@ -229,3 +330,265 @@ class Internship(models.Model):
     def is_graded(self):
         """Vrai si une note a été attribuée."""
         return self.note is not None
+
+
+# Code compact (1 octet) de chaque statut dans le journal des transitions.
+# Ces valeurs sont stockées : ne jamais renuméroter, seulement ajouter de nouveaux codes.
+CODES_STATUT = {
+    'EN_ATTENTE_PROPOSITION': 1,
+    'PROPOSITION_SOUMISE': 2,
+    'PROPOSITION_VALIDEE': 3,
+    'ENCADREUR_AFFECTE': 4,
+    'EN_COURS': 5,
+    'TERMINE': 6,
+    'ANNULE': 7,
+}
+STATUT_PAR_CODE = {code: statut for statut, code in CODES_STATUT.items()}
+
+
+class JournalEnAjoutSeulError(Exception):
+    """Levée lors d'une tentative de modification ou de suppression d'une ligne du journal."""
+
+
+class TransitionStageQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise JournalEnAjoutSeulError("Le journal des transitions est en ajout seul.")
+
+    def delete(self):
+        raise JournalEnAjoutSeulError("Le journal des transitions est en ajout seul : utiliser purger_transitions.")
+
+    def purger(self):
+        """Suppression réservée à la rétention (commande purger_transitions) : DELETE direct, sans signaux."""
+        return self._raw_delete(self.db)
+
+
+class TransitionStage(models.Model):
+    """
+    Journal en ajout seul des changements de statut des stages. Lignes compactes (statuts codés
+    sur un petit entier, clés sans contrainte) écrites par bulk_create ; l'historique survit
+    à la suppression du stage ou de l'utilisateur.
+    """
+    CODE_CHOICES = [(CODES_STATUT[statut], libelle) for statut, libelle in Internship.STATUT_CHOICES]
+
+    id = models.BigAutoField(primary_key=True)
+    # Sans contrainte de clé étrangère ni cascade : pas de verrou ni de vérification sur Internship à l'écriture
+    stage = models.ForeignKey(Internship, on_delete=models.DO_NOTHING, db_constraint=False, related_name='transitions', verbose_name=_("stage"))
+    statut_avant = models.PositiveSmallIntegerField(_("statut avant"), choices=CODE_CHOICES, null=True, blank=True) # None : création du stage
+    statut_apres = models.PositiveSmallIntegerField(_("statut après"), choices=CODE_CHOICES)
+    acteur = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+', verbose_name=_("acteur"))
+    date = models.DateTimeField(_("date"), default=timezone.now)
+
+    objects = TransitionStageQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("transition de stage")
+        verbose_name_plural = _("transitions de stage")
+        ordering = ['id']
+        default_permissions = ('add', 'view')
+        indexes = [
+            # Historique d'un stage
+            models.Index(fields=['stage', 'date'], name='transition_stage_date_idx'),
+            # Requêtes par jour / période et purge de rétention
+            models.Index(fields=['date'], name='transition_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage_id} : {self.ancien_statut or '-'} -> {self.nouveau_statut} ({self.date:%Y-%m-%d %H:%M})"
+
+    @property
+    def ancien_statut(self):
+        return STATUT_PAR_CODE.get(self.statut_avant)
+
+    @property
+    def nouveau_statut(self):
+        return STATUT_PAR_CODE.get(self.statut_apres)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise JournalEnAjoutSeulError("Une transition enregistrée ne peut pas être modifiée.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise JournalEnAjoutSeulError("Une transition enregistrée ne peut pas être supprimée.")
+
+class Notification(models.Model):
+    """
+    Boîte d'envoi des emails de notification. Une ligne est écrite dans la même transaction
+    que le changement de statut du stage ; l'envoi est fait plus tard, par lots, par la commande
+    `manage.py envoyer_notifications` (la requête HTTP n'attend jamais le serveur SMTP).
+    """
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', _('En attente')),
+        ('EN_ENVOI', _("En cours d'envoi")),  # Réservée par un processus d'envoi
+        ('ENVOYEE', _('Envoyée')),
+        ('ECHEC', _('Échec')),              # Abandonnée après le nombre maximal de tentatives
+    ]
+
+    stage = models.ForeignKey(Internship, on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications', verbose_name=_("stage"))
+    # Statut du stage qui a déclenché la notification
+    evenement = models.CharField(_("événement"), max_length=30, choices=Internship.STATUT_CHOICES)
+    destinataire = models.EmailField(_("destinataire"))
+    # Sujet et corps rendus à la création : l'email décrit l'état du stage au moment du changement
+    sujet = models.CharField(_("sujet"), max_length=255)
+    corps = models.TextField(_("corps"))
+
+    statut = models.CharField(_("statut"), max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    tentatives = models.PositiveSmallIntegerField(_("tentatives"), default=0)
+    derniere_erreur = models.TextField(_("dernière erreur"), blank=True)
+    date_creation = models.DateTimeField(_("date création"), auto_now_add=True)
+    # Pas d'envoi avant cette date (nouvelle tentative après un échec temporaire)
+    prochain_essai = models.DateTimeField(_("prochain essai"), default=timezone.now)
+    date_reservation = models.DateTimeField(_("date réservation"), null=True, blank=True)
+    date_envoi = models.DateTimeField(_("date envoi"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("notification")
+        verbose_name_plural = _("notifications")
+        ordering = ['pk']
+        indexes = [
+            # Sélection des notifications à envoyer par le processus d'envoi
+            models.Index(fields=['statut', 'prochain_essai'], name='notification_a_envoyer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_evenement_display()} -> {self.destinataire} ({self.get_statut_display()})"
+
+
+class CleIdempotence(models.Model):
+    """
+    Clé d'idempotence d'une requête POST déjà traitée (voir idempotence.py). Enregistrée dans la même
+    transaction que l'écriture qu'elle protège : un double envoi ou une nouvelle tentative avec la même
+    clé est reconnu par la contrainte d'unicité, sans verrouiller la table.
+    """
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cles_idempotence', verbose_name=_("utilisateur"))
+    cle = models.CharField(_("clé"), max_length=64)
+    chemin = models.CharField(_("chemin"), max_length=255)
+    date_creation = models.DateTimeField(_("date création"), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("clé d'idempotence")
+        verbose_name_plural = _("clés d'idempotence")
+        constraints = [
+            models.UniqueConstraint(fields=['utilisateur', 'cle'], name='cle_idempotence_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.cle} ({self.utilisateur_id}, {self.chemin})"
+
+
+class Changement(models.Model):
+    """
+    Flux des changements (voir changements.py) : une ligne par création, modification ou suppression
+    d'un étudiant, enseignant, entreprise ou stage, écrite dans la transaction du changement.
+    L'id croissant sert de curseur aux systèmes externes : « les changements après l'id X ».
+    """
+    RESSOURCE_CHOICES = [
+        (1, 'etudiants'),
+        (2, 'enseignants'),
+        (3, 'entreprises'),
+        (4, 'stages'),
+    ]
+    OPERATION_CHOICES = [
+        (1, _("création")),
+        (2, _("modification")),
+        (3, _("suppression")),
+        (4, _("archivage")),  # Déplacé vers les archives de son année académique (archives.py)
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    ressource = models.PositiveSmallIntegerField(_("ressource"), choices=RESSOURCE_CHOICES)
+    # Sans clé étrangère : la ligne survit à la suppression de l'objet
+    objet_id = models.BigIntegerField(_("objet"))
+    operation = models.PositiveSmallIntegerField(_("opération"), choices=OPERATION_CHOICES)
+    date = models.DateTimeField(_("date"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("changement")
+        verbose_name_plural = _("changements")
+        ordering = ['id']
+        default_permissions = ('view',)
+        indexes = [
+            # Lecture du flux restreinte à certaines ressources, à partir d'un curseur
+            models.Index(fields=['ressource', 'id'], name='changement_ressource_idx'),
+            # Purge de rétention
+            models.Index(fields=['date'], name='changement_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_ressource_display()} {self.objet_id} : {self.get_operation_display()}"
+
+
+class AnneeArchivee(models.Model):
+    """
+    Année académique close dont les étudiants et les stages ont été déplacés des tables courantes
+    vers StageArchive (voir archives.py).
+    """
+    annee_academique = models.CharField(_("année académique"), max_length=9, unique=True)
+    nb_stages = models.PositiveIntegerField(_("nombre de stages"), default=0)
+    date_archivage = models.DateTimeField(_("date archivage"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("année archivée")
+        verbose_name_plural = _("années archivées")
+        ordering = ['-annee_academique']
+        default_permissions = ('view',)
+
+    def __str__(self):
+        return f"{self.annee_academique} ({self.nb_stages} stages)"
+
+
+class StageArchive(models.Model):
+    """
+    Étudiant et stage d'une année académique archivée, en une ligne aplatie : les noms (promotion,
+    entreprise, encadreur) sont copiés à l'archivage, les identifiants d'origine sont gardés sans
+    clé étrangère (la ligne ne dépend plus des tables courantes et ne les verrouille pas).
+    Les colonnes d'une relation absente valent NULL, comme à la lecture des tables courantes.
+    """
+    id = models.BigAutoField(primary_key=True)
+    annee_academique = models.CharField(_("année académique"), max_length=9)
+    promotion_id = models.BigIntegerField(_("promotion"), null=True, blank=True)
+    promotion_nom = models.CharField(_("nom promotion"), max_length=50, null=True, blank=True)
+    departement_id = models.BigIntegerField(_("département"), null=True, blank=True)
+
+    # Identifiants d'origine : étudiant (= utilisateur) et stage, auxquels renvoie le journal des transitions
+    # (BigIntegerField, comme les clés primaires d'origine : DEFAULT_AUTO_FIELD)
+    etudiant_id = models.BigIntegerField(_("étudiant"))
+    stage_id = models.BigIntegerField(_("stage"), null=True, blank=True)
+    matricule = models.CharField(_("matricule"), max_length=50)
+    nom_complet = models.CharField(_("nom complet"), max_length=200)
+    id_inscription_annee = models.IntegerField(_("ID Inscription Année"))
+
+    statut = models.CharField(_("statut"), max_length=30, choices=Internship.STATUT_CHOICES, null=True, blank=True)
+    note = models.IntegerField(_("note"), null=True, blank=True)
+    entreprise_id = models.BigIntegerField(_("entreprise"), null=True, blank=True)
+    entreprise_nom = models.CharField(_("nom entreprise"), max_length=200, null=True, blank=True)
+    encadreur_id = models.BigIntegerField(_("encadreur"), null=True, blank=True)
+    encadreur_nom = models.CharField(_("nom encadreur"), max_length=200, null=True, blank=True)
+    date_proposition_soumise = models.DateTimeField(_("date proposition soumise"), null=True, blank=True)
+    date_validation = models.DateTimeField(_("date validation"), null=True, blank=True)
+    date_encadreur_affecte = models.DateTimeField(_("date encadreur affecté"), null=True, blank=True)
+    date_debut = models.DateField(_("date début stage"), null=True, blank=True)
+    date_fin = models.DateField(_("date fin stage"), null=True, blank=True)
+    date_notation = models.DateTimeField(_("date notation"), null=True, blank=True)
+
+    date_archivage = models.DateTimeField(_("date archivage"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("stage archivé")
+        verbose_name_plural = _("stages archivés")
+        ordering = ['id']
+        default_permissions = ('view',)
+        constraints = [
+            # Un étudiant n'est archivé qu'une fois par année (reprise sûre d'un archivage interrompu)
+            models.UniqueConstraint(fields=['annee_academique', 'etudiant_id'], name='stage_archive_unique'),
+        ]
+        indexes = [
+            # Listes d'une année par promotion
+            models.Index(fields=['annee_academique', 'promotion_id'], name='stage_archive_promotion_idx'),
+            models.Index(fields=['matricule'], name='stage_archive_matricule_idx'),
+            # Vérification publique des documents émis avant l'archivage (voir documents.fiche_verification)
+            models.Index(fields=['stage_id'], name='stage_archive_stage_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom_complet} ({self.annee_academique})"
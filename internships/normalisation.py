@@ -0,0 +1,82 @@
+# gestion_stages_univ/internships/normalisation.py
+#
+# Formes normalisées des noms, e-mails et téléphones des entreprises, pour repérer les doublons
+# (voir doublons.py) : « Ets. BRALIMA S.A. », « Bralima sa » et « BRALIMA » donnent la même clé.
+# Fonctions pures, sans accès à la base : utilisées par Company.save() et par les migrations.
+
+import re
+import unicodedata
+
+
+# Formes juridiques et mots génériques ignorés dans les noms (après suppression des accents)
+FORMES_JURIDIQUES = {
+    'sa', 'sarl', 'sarlu', 'sas', 'sasu', 'sprl', 'sprlu', 'snc', 'scs', 'asbl', 'ong', 'ets', 'etablissement',
+    'etablissements', 'societe', 'ste', 'cie', 'compagnie', 'groupe', 'group', 'ltd', 'limited', 'inc', 'llc',
+    'gmbh', 'corp', 'corporation', 'co',
+}
+MOTS_VIDES = {'de', 'du', 'des', 'la', 'le', 'les', 'l', 'd', 'et', 'en', 'a', 'au', 'aux', 'pour', 'the', 'and', 'of', 'for'}
+# Messageries publiques : un domaine commun n'y indique pas la même entreprise
+DOMAINES_GENERIQUES = {
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'yahoo.fr', 'ymail.com', 'hotmail.com', 'hotmail.fr', 'outlook.com',
+    'outlook.fr', 'live.com', 'live.fr', 'msn.com', 'icloud.com', 'aol.com', 'proton.me', 'protonmail.com',
+}
+CHIFFRES_TELEPHONE = 9  # numéro national sans indicatif (ex: +243 99 123 45 67 -> 991234567)
+CHIFFRES_TELEPHONE_MIN = 7
+
+_NON_ALPHANUMERIQUE = re.compile(r'[^a-z0-9]+')
+
+
+def sans_accents(texte):
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).casefold()
+
+
+def mots_du_nom(nom):
+    """
+    Mots significatifs du nom, dans l'ordre : sans accents ni ponctuation, sigles recollés
+    (« S.A. » -> « sa », « B.I.A.C » -> « biac »), formes juridiques et mots vides retirés.
+    """
+    mots = _NON_ALPHANUMERIQUE.sub(' ', sans_accents(nom).replace('&', ' et ')).split()
+    recolles, sigle = [], ''
+    for mot in mots:
+        if len(mot) == 1 and mot.isalpha():
+            sigle += mot
+            continue
+        if sigle:
+            recolles.append(sigle)
+            sigle = ''
+        recolles.append(mot)
+    if sigle:
+        recolles.append(sigle)
+    significatifs = [mot for mot in recolles if mot not in FORMES_JURIDIQUES and mot not in MOTS_VIDES]
+    # Nom fait uniquement de mots génériques (ex: « Société Générale ») : gardé tel quel
+    return significatifs or recolles
+
+
+def normaliser_nom(nom):
+    return ' '.join(mots_du_nom(nom))
+
+
+def cle_nom(nom):
+    """Clé de recherche d'une entreprise (Company.cle_normalisee) : mots significatifs triés, sans répétition."""
+    return ' '.join(sorted(set(mots_du_nom(nom))))
+
+
+def normaliser_email(email):
+    return (email or '').strip().casefold()
+
+
+def domaine_email(email):
+    """Domaine de l'adresse, sauf messagerie publique (None)."""
+    _, arobase, domaine = normaliser_email(email).rpartition('@')
+    if not arobase or not domaine or domaine in DOMAINES_GENERIQUES:
+        return None
+    return domaine
+
+
+def normaliser_telephone(telephone):
+    """Derniers chiffres du numéro (sans indicatif ni séparateurs), '' s'il est trop court pour comparer."""
+    chiffres = re.sub(r'\D', '', telephone or '')
+    if len(chiffres) < CHIFFRES_TELEPHONE_MIN:
+        return ''
+    return chiffres[-CHIFFRES_TELEPHONE:]
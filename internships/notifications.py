@@ -0,0 +1,184 @@
+# gestion_stages_univ/internships/notifications.py
+#
+# Notifications par email des changements de statut du stage, en deux temps :
+# 1. notifier_changement_statut() écrit une ligne Notification dans la transaction du changement
+#    (si la transaction est annulée, la notification l'est aussi) ;
+# 2. envoyer_notifications() les envoie par lots en réutilisant une seule connexion SMTP.
+
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Notification
+
+
+logger = logging.getLogger(__name__)
+
+# Statuts du stage qui déclenchent un email à l'étudiant : sujet et template du corps
+NOTIFICATIONS_STATUT = {
+    'PROPOSITION_VALIDEE': ("Votre proposition de stage a été validée", 'internships/emails/proposition_validee.txt'),
+    'ENCADREUR_AFFECTE': ("Un encadreur a été affecté à votre stage", 'internships/emails/encadreur_affecte.txt'),
+    'TERMINE': ("Votre stage a été noté", 'internships/emails/termine.txt'),
+}
+
+TAILLE_LOT_NOTIFICATIONS = 100
+MAX_TENTATIVES_NOTIFICATION = 5
+# Délai avant la nouvelle tentative n (1, 2, 4, 8... minutes)
+DELAI_BASE_NOUVEL_ESSAI = timedelta(minutes=1)
+# Une réservation plus ancienne vient d'un processus d'envoi interrompu : elle est reprise
+DUREE_RESERVATION = timedelta(minutes=10)
+
+
+def construire_notification(stage, ancien_statut):
+    """
+    Notification (non enregistrée) correspondant au nouveau statut du stage, ou None
+    si ce statut ne se notifie pas ou si l'étudiant n'a pas d'adresse email.
+    """
+    if stage.statut == ancien_statut or stage.statut not in NOTIFICATIONS_STATUT:
+        return None
+    destinataire = stage.etudiant.user.email
+    if not destinataire:
+        return None
+
+    sujet, gabarit = NOTIFICATIONS_STATUT[stage.statut]
+    corps = render_to_string(gabarit, {
+        'stage': stage,
+        'url_tableau_de_bord': getattr(settings, 'URL_PUBLIQUE', '').rstrip('/') + reverse('tableau_de_bord_etudiant'),
+    })
+    return Notification(
+        stage=stage, evenement=stage.statut, destinataire=destinataire, sujet=sujet, corps=corps.strip() + "\n",
+    )
+
+
+def notifier_changement_statut(stage, ancien_statut):
+    """
+    Ajoute à la boîte d'envoi l'email correspondant au nouveau statut du stage, s'il y en a un.
+    À appeler dans la transaction qui enregistre le changement de statut.
+    Retourne la Notification créée, ou None.
+    """
+    notification = construire_notification(stage, ancien_statut)
+    if notification is not None:
+        notification.save()
+    return notification
+
+
+def notifier_changements_statut(changements):
+    """Version groupée : [(stage, ancien statut)] -> un seul bulk_create. Retourne les notifications créées."""
+    notifications = [n for n in (construire_notification(stage, ancien) for stage, ancien in changements) if n]
+    return Notification.objects.bulk_create(notifications, batch_size=TAILLE_LOT_NOTIFICATIONS)
+
+
+def reserver_lot(taille_lot=TAILLE_LOT_NOTIFICATIONS):
+    """
+    Réserve (statut EN_ENVOI) un lot de notifications prêtes à partir et le retourne.
+    skip_locked : plusieurs processus d'envoi peuvent tourner sans se gêner (PostgreSQL) ;
+    sous SQLite, select_for_update est sans effet et l'écriture est de toute façon sérialisée.
+    """
+    maintenant = timezone.now()
+    a_envoyer = (
+        Q(statut='EN_ATTENTE', prochain_essai__lte=maintenant) |
+        Q(statut='EN_ENVOI', date_reservation__lt=maintenant - DUREE_RESERVATION)
+    )
+    with transaction.atomic():
+        lot = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(a_envoyer).order_by('pk')[:taille_lot]
+        )
+        if lot:
+            Notification.objects.filter(pk__in=[n.pk for n in lot]).update(
+                statut='EN_ENVOI', date_reservation=maintenant, tentatives=F('tentatives') + 1,
+            )
+    for notification in lot:
+        notification.tentatives += 1
+    return lot
+
+
+def _echec(notification, erreur, max_tentatives):
+    if notification.tentatives >= max_tentatives:
+        statut, prochain_essai = 'ECHEC', notification.prochain_essai
+    else:
+        statut = 'EN_ATTENTE'
+        prochain_essai = timezone.now() + DELAI_BASE_NOUVEL_ESSAI * 2 ** (notification.tentatives - 1)
+    Notification.objects.filter(pk=notification.pk).update(
+        statut=statut, prochain_essai=prochain_essai, derniere_erreur=str(erreur)[:2000], date_reservation=None,
+    )
+
+
+def _erreur_de_connexion(erreur):
+    # SMTPException hérite d'OSError : un destinataire refusé ne dit rien de l'état de la connexion
+    if isinstance(erreur, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(erreur, OSError) and not isinstance(erreur, smtplib.SMTPException)
+
+
+def _rouvrir(connexion):
+    """
+    Ferme puis rouvre tout de suite la connexion : une fois fermée, le backend SMTP ouvrirait et
+    refermerait une connexion pour chacun des messages suivants.
+    """
+    connexion.close()
+    try:
+        connexion.open()
+    except Exception as e:
+        logger.warning("Impossible de rouvrir la connexion d'envoi : %s", e)
+
+
+def envoyer_lot(lot, connexion, max_tentatives=MAX_TENTATIVES_NOTIFICATION):
+    """
+    Envoie un lot sur la connexion ouverte `connexion`. Les succès sont marqués en une seule
+    requête ; chaque échec est replanifié individuellement, et la connexion n'est rouverte qu'après
+    une erreur qui la concerne (déconnexion, réseau). Retourne (envoyées, échecs).
+    """
+    envoyees, echecs = [], 0
+    expediteur = settings.DEFAULT_FROM_EMAIL
+    for notification in lot:
+        message = EmailMessage(
+            notification.sujet, notification.corps, expediteur, [notification.destinataire], connection=connexion,
+        )
+        try:
+            message.send()
+        except Exception as e:
+            logger.warning("Échec d'envoi de la notification %s : %s", notification.pk, e)
+            _echec(notification, e, max_tentatives)
+            echecs += 1
+            if _erreur_de_connexion(e):
+                _rouvrir(connexion)
+        else:
+            envoyees.append(notification.pk)
+
+    if envoyees:
+        Notification.objects.filter(pk__in=envoyees).update(
+            statut='ENVOYEE', date_envoi=timezone.now(), date_reservation=None, derniere_erreur='',
+        )
+    return len(envoyees), echecs
+
+
+def envoyer_notifications(taille_lot=TAILLE_LOT_NOTIFICATIONS, max_tentatives=MAX_TENTATIVES_NOTIFICATION, max_lots=None):
+    """
+    Vide la boîte d'envoi lot par lot sur une seule connexion SMTP, ouverte seulement
+    s'il y a quelque chose à envoyer. Retourne (envoyées, échecs).
+    """
+    total_envoyees, total_echecs = 0, 0
+    lot = reserver_lot(taille_lot)
+    if not lot:
+        return 0, 0
+
+    with get_connection(fail_silently=False) as connexion:
+        nb_lots = 0
+        while lot:
+            envoyees, echecs = envoyer_lot(lot, connexion, max_tentatives)
+            total_envoyees += envoyees
+            total_echecs += echecs
+            nb_lots += 1
+            if max_lots is not None and nb_lots >= max_lots:
+                break
+            lot = reserver_lot(taille_lot)
+    return total_envoyees, total_echecs
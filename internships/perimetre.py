@@ -0,0 +1,85 @@
+# gestion_stages_univ/internships/perimetre.py
+#
+# Périmètre des comptes facultaires. Un compte rattaché à une faculté (User.faculte) ne voit et ne modifie
+# que les étudiants, enseignants, promotions, départements et stages de celle-ci ; un compte sans faculté
+# garde l'accès à toute l'université. Les entreprises partenaires restent communes.
+#
+# - Le décorateur perimetre_facultaire place l'année de travail (annees.py) et la faculté du compte dans
+#   les variables de contexte de models.py (propres à chaque requête, threads et tâches asyncio compris) ;
+# - les gestionnaires `perimetre` des modèles filtrent alors par ces deux axes, en passant par les petites
+#   tables des promotions et des départements (index promotion_annee_dep_idx) : le travail d'une requête
+#   dépend de la taille de la faculté, pas de celle de l'université ;
+# - les vues de détail et de modification cherchent l'objet dans `perimetre` (404 hors périmètre), et les
+#   choix des formulaires (département, promotion, encadreur) y sont restreints par restreindre_choix().
+# `objects` reste sans restriction (admin, commandes, workflow, archivage).
+
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.forms import ModelChoiceField
+
+from .annees import CLE_SESSION, _valider, annee_de_la_session
+from .models import ANNEE_DE_TRAVAIL, FACULTE_DE_TRAVAIL, Department, Promotion
+
+
+# Relations qui rattachent un enseignant ou un étudiant à une faculté
+RATTACHEMENTS = (Department, Promotion)
+
+
+def faculte_de_l_utilisateur(utilisateur):
+    """Id de la faculté à laquelle le compte est limité, ou None (toute l'université)."""
+    return getattr(utilisateur, 'faculte_id', None)
+
+
+def restreindre_choix(formulaire):
+    """
+    Limite les listes de choix du formulaire (département, promotion, encadreur) au périmètre, en gardant
+    leur tri. Un compte limité à une faculté doit en outre choisir le rattachement (RATTACHEMENTS) : sinon
+    l'objet enregistré sortirait de son périmètre (enseignant sans département, étudiant sans promotion).
+    """
+    limite = FACULTE_DE_TRAVAIL.get() is not None
+    for champ in formulaire.fields.values():
+        if not isinstance(champ, ModelChoiceField) or not hasattr(champ.queryset.model, 'perimetre'):
+            continue
+        champ.queryset = champ.queryset & champ.queryset.model.perimetre.all()
+        if limite and champ.queryset.model in RATTACHEMENTS and not champ.disabled:
+            champ.required = True
+    return formulaire
+
+
+def perimetre_courant():
+    """(année de travail, faculté) de la requête en cours, à transmettre à un autre processus."""
+    return ANNEE_DE_TRAVAIL.get(), FACULTE_DE_TRAVAIL.get()
+
+
+@contextmanager
+def dans_le_perimetre(annee, faculte):
+    """Les gestionnaires `perimetre` suivent `annee` et `faculte` dans le bloc."""
+    jeton_annee, jeton_faculte = ANNEE_DE_TRAVAIL.set(annee), FACULTE_DE_TRAVAIL.set(faculte)
+    try:
+        yield
+    finally:
+        FACULTE_DE_TRAVAIL.reset(jeton_faculte)
+        ANNEE_DE_TRAVAIL.reset(jeton_annee)
+
+
+def perimetre_facultaire(vue):
+    """
+    Décorateur des vues facultaires : les gestionnaires `perimetre` suivent l'année choisie en session et
+    la faculté du compte pendant la vue (et l'empreinte conditionnelle, si ce décorateur est placé au-dessus).
+    """
+    if iscoroutinefunction(vue):
+        @wraps(vue)
+        async def enveloppe_async(request, *args, **kwargs):
+            # La liste des années est relue en base : hors de la boucle
+            annee = await sync_to_async(_valider)(await request.session.aget(CLE_SESSION))
+            with dans_le_perimetre(annee, faculte_de_l_utilisateur(await request.auser())):
+                return await vue(request, *args, **kwargs)
+        return enveloppe_async
+
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        with dans_le_perimetre(annee_de_la_session(request), faculte_de_l_utilisateur(request.user)):
+            return vue(request, *args, **kwargs)
+    return enveloppe
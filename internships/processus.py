@@ -0,0 +1,41 @@
+# gestion_stages_univ/internships/processus.py
+#
+# Pools de processus des traitements en lot (rapport découpé, documents, signatures, test de charge).
+#
+# - Les processus démarrent par "spawn" par défaut (settings.RAPPORTS_CONTEXTE_PROCESSUS, ou "forkserver") :
+#   un interpréteur neuf, au lieu d'une copie par "fork" d'un serveur multi-threadé et des verrous tenus
+#   par ses autres threads ;
+# - un processus "spawn" importe le module de son initialiseur avant que Django soit configuré : celui-ci
+#   vit donc ici, dans un module qui n'importe pas les modèles. La préparation propre à chaque traitement
+#   (templates, clé de signature...) est désignée par son chemin et importée après django.setup().
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+def contexte_processus():
+    return multiprocessing.get_context(getattr(settings, 'RAPPORTS_CONTEXTE_PROCESSUS', None) or 'spawn')
+
+
+def initialiser_processus(preparation=None, *args):
+    import django
+    django.setup()
+    if preparation:
+        import_string(preparation)(*args)
+
+
+def pool_de_processus(workers, preparation=None, *args):
+    """
+    ProcessPoolExecutor de `workers` processus, qui appellent chacun preparation(*args) (chemin pointé,
+    ex: 'internships.signature.signataire') une fois Django configuré, avant leur première tâche.
+    """
+    # Les connexions ouvertes ne doivent pas être partagées avec les processus enfants
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=contexte_processus(),
+        initializer=initialiser_processus, initargs=(preparation, *args),
+    )
@@ -0,0 +1,84 @@
+# gestion_stages_univ/internships/rapports.py
+#
+# Génération des rapports PDF. La pile xhtml2pdf (reportlab, PIL, lxml, html5lib) est lourde
+# à importer : elle n'est chargée qu'au premier rapport généré, jamais à l'import des vues.
+
+import io
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Internship
+
+
+GABARIT_AFFECTATIONS = 'internships/reports/liste_etudiants_encadreurs.html'
+
+# Moteurs disponibles : 'xhtml2pdf' (template HTML converti) ou 'reportlab' (tableaux platypus natifs,
+# plus rapide et à mémoire constante sur les gros volumes)
+MOTEURS_PDF = ('xhtml2pdf', 'reportlab')
+MOTEUR_PAR_DEFAUT = 'xhtml2pdf'
+
+
+class ErreurRapportPDF(Exception):
+    """Levée quand le moteur PDF signale une erreur de conversion."""
+
+
+def moteur_rapport(nom_rapport, demande=None):
+    """
+    Moteur à utiliser pour un rapport : celui demandé (ex: ?moteur=reportlab), sinon celui
+    configuré pour ce rapport dans settings.MOTEURS_RAPPORTS_PDF, sinon le moteur par défaut.
+    """
+    if demande:
+        if demande not in MOTEURS_PDF:
+            raise ValueError(f"Moteur PDF inconnu : '{demande}' (choix : {', '.join(MOTEURS_PDF)}).")
+        return demande
+    return getattr(settings, 'MOTEURS_RAPPORTS_PDF', {}).get(nom_rapport, MOTEUR_PAR_DEFAUT)
+
+
+def stages_affectes():
+    """Stages avec encadreur affecté du périmètre de la requête (voir perimetre.py), dans l'ordre du rapport."""
+    return Internship.perimetre.select_related(
+        'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
+        'entreprise_selectionnee', 'encadreur'
+    ).filter(statut='ENCADREUR_AFFECTE').order_by(
+        'etudiant__promotion__annee_academique', 'etudiant__promotion__nom', 'etudiant__nom_complet'
+    )
+
+
+def html_vers_pdf(html, dest):
+    """Convertit du HTML en PDF dans le flux binaire `dest` avec xhtml2pdf (import différé)."""
+    from xhtml2pdf import pisa
+
+    pisa_status = pisa.CreatePDF(html, dest=dest, encoding='utf-8')
+    if pisa_status.err:
+        raise ErreurRapportPDF(str(pisa_status.err))
+    return dest
+
+
+def rapport_affectations_pdf(stages=None, date_rapport=None, moteur=None, dest=None):
+    """
+    Rapport 'Liste des étudiants et de leurs encadreurs' écrit dans `dest` (un BytesIO par défaut),
+    retourné positionné au début.
+    """
+    moteur = moteur or moteur_rapport('affectations')
+    date_rapport = date_rapport or timezone.now()
+    dest = io.BytesIO() if dest is None else dest
+
+    if moteur == 'reportlab':
+        from . import rapports_reportlab
+
+        # iterator() : les lignes sont lues par lots, sans garder tout le queryset en cache
+        stages = stages_affectes().iterator(chunk_size=2000) if stages is None else stages
+        rapports_reportlab.rapport_affectations(stages, date_rapport, dest)
+    else:
+        stages = stages_affectes() if stages is None else stages
+        html = get_template(GABARIT_AFFECTATIONS).render({'stages': stages, 'date_rapport': date_rapport})
+        html_vers_pdf(html, dest)
+
+    dest.seek(0)
+    return dest
+
+
+def nom_fichier_rapport(prefixe, extension='pdf'):
+    return f'{prefixe}_{timezone.now().strftime("%Y%m%d")}.{extension}'
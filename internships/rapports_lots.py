@@ -0,0 +1,150 @@
+# gestion_stages_univ/internships/rapports_lots.py
+#
+# Rapport des affectations découpé par promotion (ou par département) : chaque partie est
+# rendue dans un processus séparé, écrite dans un fichier temporaire, puis ajoutée à l'archive
+# ZIP (ou fusionnée avec pypdf) dès qu'elle est prête. Aucun PDF complet n'est gardé en mémoire.
+# Les stages sont ceux du périmètre de la requête (voir perimetre.py), lus sur la même base qu'elle
+# (réplique éventuelle, voir repliques.py) : les deux sont transmis à chaque processus.
+# Dans une requête HTTP, le nombre de processus est plafonné par RAPPORTS_WORKERS_REQUETE ; la commande
+# `manage.py rapport_affectations` produit le même rapport hors requête avec RAPPORTS_WORKERS.
+
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .perimetre import dans_le_perimetre, perimetre_courant
+from .processus import pool_de_processus
+from .repliques import LECTURE, lecture_sur
+from .rapports import moteur_rapport, rapport_affectations_pdf, stages_affectes
+from .signature import signature_active, signer_pdf
+
+
+# Découpages possibles : champ de regroupement sur Internship et libellés associés
+DECOUPAGES = {
+    'promotion': (
+        'etudiant__promotion_id',
+        ('etudiant__promotion__nom', 'etudiant__promotion__annee_academique', 'etudiant__promotion__departement__code'),
+    ),
+    'departement': (
+        'etudiant__promotion__departement_id',
+        ('etudiant__promotion__departement__code', 'etudiant__promotion__departement__nom'),
+    ),
+}
+FORMATS = ('zip', 'pdf')
+
+
+def parties_du_rapport(par='promotion'):
+    """
+    Liste ordonnée des parties [(id du groupe, nom de fichier)] ayant au moins un stage affecté.
+    L'id vaut None pour les stages dont l'étudiant n'a pas de promotion.
+    """
+    champ, champs_libelle = DECOUPAGES[par]
+    lignes = (
+        stages_affectes().order_by(*champs_libelle).values_list(champ, *champs_libelle).distinct()
+    )
+    parties = []
+    for cle, *libelle in lignes:
+        nom = slugify("_".join(str(v) for v in libelle if v)) or f"sans_{par}"
+        parties.append((cle, f"affectations_{nom}.pdf"))
+    return parties
+
+
+def rendre_partie(par, cle, moteur, date_rapport, chemin, signer=False, perimetre=(None, None), base=None):
+    """
+    Rend une partie du rapport dans le fichier `chemin` ; exécuté dans un processus du pool, dans le
+    `perimetre` (année, faculté) et sur la `base` de lecture de la requête : les variables de contexte
+    ne passent pas d'un processus à l'autre.
+    """
+    with dans_le_perimetre(*perimetre), lecture_sur(base):
+        return _rendre_partie(par, cle, moteur, date_rapport, chemin, signer)
+
+
+def _rendre_partie(par, cle, moteur, date_rapport, chemin, signer):
+    champ, _ = DECOUPAGES[par]
+    filtre = {champ: cle} if cle is not None else {f"{champ}__isnull": True}
+    stages = stages_affectes().filter(**filtre)
+    if moteur == 'reportlab':
+        stages = stages.iterator(chunk_size=2000)
+    if signer:
+        # Rendu en mémoire puis signature : seul le fichier signé est écrit
+        with open(chemin, 'wb') as dest:
+            signer_pdf(rapport_affectations_pdf(stages=stages, date_rapport=date_rapport, moteur=moteur), dest)
+        return cle, chemin
+    with open(chemin, 'wb') as dest:
+        rapport_affectations_pdf(stages=stages, date_rapport=date_rapport, moteur=moteur, dest=dest)
+    return cle, chemin
+
+
+def _rendre_parties(par, parties, moteur, date_rapport, dossier, workers, signer=False):
+    """Génère (cle, chemin) pour chaque partie, dans l'ordre où elles se terminent."""
+    perimetre, base = perimetre_courant(), LECTURE.get()
+    taches = [
+        (par, cle, moteur, date_rapport, os.path.join(dossier, nom), signer, perimetre, base) for cle, nom in parties
+    ]
+
+    if workers <= 1 or len(taches) <= 1:
+        for tache in taches:
+            yield rendre_partie(*tache)
+        return
+
+    with pool_de_processus(workers) as pool:
+        futures = [pool.submit(rendre_partie, *tache) for tache in taches]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def rapport_affectations_par_partie(par='promotion', format='zip', moteur=None, workers=None):
+    """
+    Construit le rapport découpé et retourne (fichier temporaire positionné au début, nombre de parties).
+    format='zip' : un PDF par partie dans une archive, ajouté dès qu'il est rendu.
+    format='pdf' : les parties fusionnées dans l'ordre avec pypdf en un seul document.
+    workers : nombre de processus (défaut : RAPPORTS_WORKERS, sinon nombre de CPU ; 1 : sans processus).
+    """
+    if par not in DECOUPAGES:
+        raise ValueError(f"Découpage inconnu : '{par}' (choix : {', '.join(DECOUPAGES)}).")
+    if format not in FORMATS:
+        raise ValueError(f"Format inconnu : '{format}' (choix : {', '.join(FORMATS)}).")
+    moteur = moteur or moteur_rapport('affectations')
+    workers = workers or getattr(settings, 'RAPPORTS_WORKERS', None) or os.cpu_count() or 1
+    date_rapport = timezone.now()
+
+    parties = parties_du_rapport(par)
+    sortie = tempfile.TemporaryFile()
+    dossier = tempfile.mkdtemp(prefix='rapport_affectations_')
+    try:
+        if format == 'zip':
+            # Les PDF sont déjà compressés : ZIP_STORED évite de les recompresser pour rien
+            with zipfile.ZipFile(sortie, 'w', compression=zipfile.ZIP_STORED) as archive:
+                # Chaque PDF de l'archive est signé individuellement
+                parties_rendues = _rendre_parties(par, parties, moteur, date_rapport, dossier, workers, signature_active())
+                for _cle, chemin in parties_rendues:
+                    archive.write(chemin, arcname=os.path.basename(chemin))
+                    os.remove(chemin)
+        else:
+            from pypdf import PdfWriter
+
+            # La fusion respecte l'ordre des parties, quel que soit l'ordre de fin des processus
+            chemins = dict(_rendre_parties(par, parties, moteur, date_rapport, dossier, workers))
+            fusion = PdfWriter()
+            for cle, _nom in parties:
+                fusion.append(chemins[cle])
+            if signature_active():
+                # Les signatures des parties ne survivent pas à la fusion : le document fusionné est signé
+                tampon = io.BytesIO()
+                fusion.write(tampon)
+                signer_pdf(tampon, sortie)
+            else:
+                fusion.write(sortie)
+            fusion.close()
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    sortie.seek(0)
+    return sortie, len(parties)
@@ -0,0 +1,114 @@
+# gestion_stages_univ/internships/rapports_reportlab.py
+#
+# Moteur PDF natif (reportlab platypus) : pas d'analyse HTML ni de mise en page CSS.
+# Les lignes sont lues au fil de l'eau (queryset.iterator()) et converties en petits tableaux
+# au fur et à mesure que reportlab consomme les flowables : la mémoire ne dépend pas du
+# nombre total de lignes. Ce module n'est importé que par rapports.py, à la génération.
+
+from django.utils import formats, timezone
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+# Nombre de lignes par tableau : environ une page, découpée par reportlab si nécessaire
+LIGNES_PAR_BLOC = 40
+
+ENTETES_AFFECTATIONS = ['Nom Étudiant', 'Matricule', 'Promotion', 'Département', 'Entreprise Affectée', 'Encadreur Affecté']
+LARGEURS_AFFECTATIONS = [5.5 * cm, 3.5 * cm, 3.5 * cm, 4 * cm, 5.5 * cm, 5 * cm]
+
+STYLE_TABLEAU = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 8),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 8),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+
+class FluxFlowables(list):
+    """
+    Liste de flowables alimentée paresseusement par un générateur.
+
+    BaseDocTemplate.build() consomme la liste par l'avant (flowables[0], del flowables[0])
+    et teste len(flowables) à chaque tour : on ne tire le bloc suivant du générateur
+    que lorsque la liste est vide, donc un seul bloc de lignes est en mémoire à la fois.
+    """
+
+    def __init__(self, generateur):
+        super().__init__()
+        self._generateur = generateur
+
+    def __len__(self):
+        if not super().__len__() and self._generateur is not None:
+            try:
+                self.append(next(self._generateur))
+            except StopIteration:
+                self._generateur = None
+        return super().__len__()
+
+
+def _texte(valeur, defaut='-'):
+    return str(valeur) if valeur not in (None, '') else defaut
+
+
+def ligne_affectation(stage):
+    etudiant = stage.etudiant
+    promotion = etudiant.promotion
+    return [
+        etudiant.nom_complet,
+        etudiant.matricule,
+        f"{promotion.nom} {promotion.annee_academique}" if promotion else '-',
+        _texte(promotion.departement.nom if promotion and promotion.departement else None),
+        _texte(stage.entreprise_selectionnee.nom if stage.entreprise_selectionnee else None, "Non affecté"),
+        _texte(stage.encadreur.nom_complet if stage.encadreur else None, "Non affecté"),
+    ]
+
+
+def _tableau(lignes):
+    tableau = Table([ENTETES_AFFECTATIONS] + lignes, colWidths=LARGEURS_AFFECTATIONS, repeatRows=1)
+    tableau.setStyle(STYLE_TABLEAU)
+    return tableau
+
+
+def _flowables_affectations(stages, date_rapport, styles):
+    yield Paragraph("Liste des Étudiants et de leurs Encadreurs de Stage", styles['titre'])
+    yield Paragraph(f"Date du rapport : {formats.date_format(timezone.localtime(date_rapport), 'd/m/Y H:i')}", styles['date'])
+    yield Spacer(1, 0.3 * cm)
+
+    total = 0
+    bloc = []
+    for stage in stages:
+        bloc.append(ligne_affectation(stage))
+        total += 1
+        if len(bloc) == LIGNES_PAR_BLOC:
+            yield _tableau(bloc)
+            bloc = []
+    if bloc:
+        yield _tableau(bloc)
+
+    yield Spacer(1, 0.5 * cm)
+    yield Paragraph(f"Total des stages avec encadreurs affectés : {total}", styles['normal'])
+
+
+def rapport_affectations(stages, date_rapport, dest):
+    """Écrit le rapport des affectations dans `dest` ; `stages` est itéré une seule fois."""
+    base = getSampleStyleSheet()
+    styles = {
+        'titre': ParagraphStyle('titre', parent=base['Title'], fontSize=14, alignment=TA_CENTER),
+        'date': ParagraphStyle('date', parent=base['Normal'], fontSize=9, alignment=TA_RIGHT),
+        'normal': base['Normal'],
+    }
+    document = SimpleDocTemplate(
+        dest, pagesize=landscape(A4),
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+        title="Rapport d'Affectation des Stages",
+    )
+    document.build(FluxFlowables(_flowables_affectations(stages, date_rapport, styles)))
+    return dest
@@ -0,0 +1,114 @@
+# gestion_stages_univ/internships/repliques.py
+#
+# Lectures sur une réplique de la base. Les listes, tableaux de bord, statistiques, rapports PDF et exports
+# de l'API ne font que lire : sur la réplique (alias ALIAS_REPLIQUE, configuré par DB_REPLIQUE dans
+# settings.py), ils ne concurrencent plus les propositions, validations et notations sur la base principale.
+#
+# - Le décorateur lecture_replique place l'alias dans LECTURE (variable de contexte, propre à chaque requête) ;
+#   RouteurRepliques envoie alors les lectures sur la réplique. Les écritures vont toujours sur la base
+#   principale, même pour une instance lue sur la réplique.
+# - Lire ses propres écritures : après une requête qui écrit (POST, PUT, PATCH, DELETE), le middleware
+#   ecritures_recentes pose un cookie de REPLIQUE_DELAI_COLLANT_SECONDES. Tant qu'il est présent, le
+#   navigateur lit sur la base principale, qui reflète déjà son écriture, le temps que la réplique rattrape.
+# - Sans réplique configurée, tout reste sur la base principale. En local, deux fichiers SQLite suffisent :
+#   DB_REPLIQUE=db_replique.sqlite3 puis `manage.py synchroniser_replique` pour recopier la base principale.
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+
+ALIAS_REPLIQUE = 'replique'
+COOKIE_ECRITURE = 'ecriture_recente'
+METHODES_SURES = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias des lectures de la requête en cours, None : base principale
+LECTURE = ContextVar('lecture', default=None)
+
+
+def replique_configuree():
+    return ALIAS_REPLIQUE in settings.DATABASES
+
+
+def base_de_lecture():
+    """Alias où lire dans la requête en cours (pour les querysets évalués après la vue, ex: réponses en flux)."""
+    return LECTURE.get() or DEFAULT_DB_ALIAS
+
+
+def _alias_pour(request):
+    if not replique_configuree() or request.method not in METHODES_SURES or COOKIE_ECRITURE in request.COOKIES:
+        return None
+    return ALIAS_REPLIQUE
+
+
+@contextmanager
+def lecture_sur(alias):
+    """Les lectures du bloc vont sur `alias` (None : base principale)."""
+    jeton = LECTURE.set(alias)
+    try:
+        yield
+    finally:
+        LECTURE.reset(jeton)
+
+
+def lecture_replique(vue):
+    """Décorateur des vues en lecture seule : leurs requêtes lisent sur la réplique (voir ci-dessus)."""
+    if iscoroutinefunction(vue):
+        @wraps(vue)
+        async def enveloppe_async(request, *args, **kwargs):
+            with lecture_sur(_alias_pour(request)):
+                return await vue(request, *args, **kwargs)
+        return enveloppe_async
+
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        with lecture_sur(_alias_pour(request)):
+            return vue(request, *args, **kwargs)
+    return enveloppe
+
+
+def _marquer_ecriture(request, reponse):
+    if replique_configuree() and request.method not in METHODES_SURES:
+        reponse.set_cookie(
+            COOKIE_ECRITURE, '1', max_age=settings.REPLIQUE_DELAI_COLLANT_SECONDES, httponly=True, samesite='Lax',
+        )
+    return reponse
+
+
+@sync_and_async_middleware
+def ecritures_recentes(get_response):
+    """Middleware : après une requête qui écrit, les lectures du navigateur restent un moment sur la base principale."""
+    if iscoroutinefunction(get_response):
+        async def middleware_async(request):
+            return _marquer_ecriture(request, await get_response(request))
+        return middleware_async
+
+    def middleware(request):
+        return _marquer_ecriture(request, get_response(request))
+    return middleware
+
+
+class RouteurRepliques:
+    """Routeur de settings.DATABASE_ROUTERS : lectures selon LECTURE, écritures et migrations sur la base principale."""
+
+    def db_for_read(self, model, **hints):
+        return LECTURE.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicite : sans routeur, une instance lue sur la réplique y serait aussi enregistrée
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données des deux côtés ; ailleurs, règle par défaut de Django (même base)
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS_REPLIQUE}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma par la réplication (ou synchroniser_replique), pas par migrate
+        return db != ALIAS_REPLIQUE
@@ -0,0 +1,171 @@
+# gestion_stages_univ/internships/serialisation.py
+#
+# Sérialisation des lignes de l'API (api.py) sans instance de modèle ni encodeur appelé valeur par valeur.
+# - PlanColonnes est calculé une fois par requête : colonnes lues par values_list(), position de chaque
+#   champ public dans le tuple et conversion des seules colonnes non natives (dates, décimaux). Une ligne
+#   n'est plus qu'un tuple réindexé, et ne contient que des types que json (module C), orjson et msgpack
+#   encodent sans repasser par Python.
+# - reponse_flux() écrit un tableau de n'importe quelle taille par morceaux, en lisant la base par lots
+#   (iterator()) : la mémoire du worker ne dépend pas du nombre de lignes (export d'une promotion entière).
+#   Sous ASGI, la réponse reçoit un itérateur asynchrone : avec un générateur ordinaire, Django chargerait
+#   tout le corps en mémoire (sync_to_async(list)) avant d'en envoyer le premier octet.
+# orjson et msgpack sont facultatifs (absents de requirements.txt) : utilisés seulement s'ils sont installés,
+# sinon JSON passe par la bibliothèque standard et le format msgpack n'est pas proposé.
+#
+# Les valeurs converties sont celles de DjangoJSONEncoder : le contenu est identique quel que soit le moteur.
+
+import importlib
+from functools import lru_cache, partial
+from itertools import islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+TAILLE_LOT_LECTURE = 2000   # lignes lues par aller-retour avec la base (iterator)
+TAILLE_MORCEAU = 500        # lignes encodées par morceau de réponse
+
+FORMATS = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+}
+
+# Types de champ dont la valeur Python n'est pas un type JSON natif
+TYPES_CONVERTIS = {'DateTimeField', 'DateField', 'TimeField', 'DurationField', 'DecimalField', 'UUIDField'}
+
+_ENCODEUR_DJANGO = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_convertir = _ENCODEUR_DJANGO.default
+
+
+@lru_cache(maxsize=None)
+def _module(nom):
+    """Module facultatif `nom`, ou None s'il n'est pas installé (import tenté une seule fois)."""
+    try:
+        return importlib.import_module(nom)
+    except ImportError:
+        return None
+
+
+def formats_disponibles():
+    return [nom for nom in FORMATS if nom == 'json' or _module(nom) is not None]
+
+
+@lru_cache(maxsize=None)
+def encodeur(format='json', moteur=None):
+    """
+    Fonction objet -> bytes pour `format`. Pour JSON, orjson s'il est installé, sinon la bibliothèque
+    standard ; `moteur` ('json' ou 'orjson') force un moteur (comparaisons). Les valeurs non natives
+    restantes (ex: dates du flux des changements) passent par DjangoJSONEncoder dans tous les cas.
+    """
+    if format == 'msgpack':
+        msgpack = _module('msgpack')
+        if msgpack is None:
+            raise ValueError("Format msgpack indisponible : le paquet msgpack n'est pas installé.")
+        return partial(msgpack.packb, default=_convertir, use_bin_type=True)
+    if format != 'json':
+        raise ValueError(f"Format inconnu : '{format}' (choix : {', '.join(FORMATS)}).")
+    orjson = _module('orjson') if moteur in (None, 'orjson') else None
+    if orjson is not None:
+        # Dates non natives : orjson les formaterait autrement (microsecondes, +00:00)
+        return partial(orjson.dumps, default=_convertir, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    if moteur == 'orjson':
+        raise ValueError("Moteur orjson indisponible : le paquet orjson n'est pas installé.")
+    return lambda objet: _ENCODEUR_DJANGO.encode(objet).encode('utf-8')
+
+
+def champ_modele(modele, chemin):
+    """Champ du modèle désigné par un chemin values_list() ('pk', 'promotion_id', 'etudiant__matricule')."""
+    if chemin == 'pk':
+        return modele._meta.pk
+    *relations, dernier = chemin.split('__')
+    for nom in relations:
+        modele = modele._meta.get_field(nom).related_model
+    return modele._meta.get_field(dernier)
+
+
+class PlanColonnes:
+    """Lecture de champs publics (nom -> chemin values_list) d'un modèle, préparée une fois par requête."""
+
+    def __init__(self, modele, champs, noms, cle='pk'):
+        chemins = [champs[nom] for nom in noms]
+        self.noms = list(noms)
+        # La clé (`cle`, pagination) est toujours lue en premier ; values_list() ne renvoie qu'une fois une
+        # colonne demandée deux fois, d'où la position de chaque chemin dans le tuple
+        self.colonnes = [cle, *(chemin for chemin in dict.fromkeys(chemins) if chemin != cle)]
+        positions = [self.colonnes.index(chemin) for chemin in chemins]
+        self._extraire = itemgetter(*positions) if len(positions) > 1 else (lambda brute, p=positions[0]: (brute[p],))
+        self._conversions = [
+            rang for rang, chemin in enumerate(chemins) if champ_modele(modele, chemin).get_internal_type() in TYPES_CONVERTIS
+        ]
+
+    def ligne(self, brute):
+        valeurs = self._extraire(brute)
+        if self._conversions:
+            valeurs = list(valeurs)
+            for rang in self._conversions:
+                if valeurs[rang] is not None:
+                    valeurs[rang] = _convertir(valeurs[rang])
+        return dict(zip(self.noms, valeurs))
+
+    def lignes(self, queryset):
+        """[(clé, ligne)] du queryset."""
+        return [(brute[0], self.ligne(brute)) for brute in queryset.values_list(*self.colonnes)]
+
+    def iterer(self, queryset, taille_lot=TAILLE_LOT_LECTURE):
+        """Lignes du queryset lues par lots, sans tout charger en mémoire."""
+        for brute in queryset.values_list(*self.colonnes).iterator(chunk_size=taille_lot):
+            yield self.ligne(brute)
+
+
+def reponse(contenu, format='json', status=200):
+    return HttpResponse(encodeur(format)(contenu), content_type=FORMATS[format], status=status)
+
+
+def _lots(iterable, taille):
+    iterateur = iter(iterable)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+def morceaux(lignes, format='json', taille_morceau=TAILLE_MORCEAU, moteur=None):
+    """
+    Corps d'une réponse en morceaux de `taille_morceau` lignes. JSON : un tableau, chaque lot étant encodé
+    en un seul appel puis privé de ses crochets. msgpack : une suite d'objets, un par ligne (msgpack.Unpacker).
+    """
+    encoder = encodeur(format, moteur)
+    if format == 'msgpack':
+        for lot in _lots(lignes, taille_morceau):
+            yield b''.join(encoder(ligne) for ligne in lot)
+        return
+    separateur = b''
+    yield b'['
+    for lot in _lots(lignes, taille_morceau):
+        yield separateur + encoder(lot)[1:-1]
+        separateur = b','
+    yield b']'
+
+
+async def morceaux_async(iterable):
+    """
+    Les morceaux de `iterable` pour un serveur ASGI. Chaque morceau (lecture d'un lot et encodage) est
+    produit dans le thread de la requête, qui garde la connexion et le curseur de iterator() d'un lot au suivant.
+    """
+    iterateur = iter(iterable)
+    suivant = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (morceau := await suivant(iterateur, None)) is not None:
+            yield morceau
+    finally:
+        # Client déconnecté en cours d'envoi : le curseur est fermé dans son thread
+        if hasattr(iterateur, 'close'):
+            await sync_to_async(iterateur.close, thread_sensitive=True)()
+
+
+def reponse_flux(lignes, format='json', taille_morceau=TAILLE_MORCEAU, asynchrone=False):
+    """Réponse écrite par morceaux ; asynchrone=True sous ASGI (voir morceaux_async)."""
+    corps = morceaux(lignes, format, taille_morceau)
+    if asynchrone:
+        corps = morceaux_async(corps)
+    return StreamingHttpResponse(corps, content_type=FORMATS[format])
@@ -0,0 +1,54 @@
+# gestion_stages_univ/internships/signals.py
+
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Department, Promotion, Internship, Student, Teacher, Company
+from .changements import CREATION, MODIFICATION, SUPPRESSION, enregistrer_changements, enregistrer_references_videes
+from . import diffusion
+
+
+# Listes en direct : les enregistrements individuels d'un stage (formulaires, admin) sont diffusés
+# aux connexions SSE ; les écritures du workflow par update() sont signalées par workflow.py.
+@receiver(pre_save, sender=Internship)
+def retenir_ancien_encadreur(sender, instance, raw=False, **kwargs):
+    # Relu seulement si une connexion écoute : l'ancien encadreur doit retirer la ligne de sa liste
+    if not raw and instance.pk is not None and diffusion.diffuseur().actif():
+        instance._ancien_encadreur_id = (
+            Internship.objects.filter(pk=instance.pk).values_list('encadreur_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Internship)
+def diffuser_stage(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ancien = instance.__dict__.pop('_ancien_encadreur_id', None)
+        diffusion.signaler_stages([instance.pk], {instance.pk: ancien} if ancien is not None else None)
+
+
+# Flux des changements (changements.py) : enregistrements et suppressions individuels, y compris en cascade
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Internship)
+def changement_enregistre(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        enregistrer_changements(sender, [instance.pk], CREATION if created else MODIFICATION)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Internship)
+def changement_supprime(sender, instance, **kwargs):
+    enregistrer_changements(sender, [instance.pk], SUPPRESSION)
+
+
+# Objets référencés en SET_NULL par un modèle suivi (voir changements.references_set_null) : leur suppression
+# vide la clé étrangère des lignes qui les référencent par un UPDATE, sans signal
+@receiver(pre_delete, sender=Company)
+@receiver(pre_delete, sender=Teacher)
+@receiver(pre_delete, sender=Promotion)
+@receiver(pre_delete, sender=Department)
+def changement_references_videes(sender, instance, **kwargs):
+    enregistrer_references_videes(sender, instance)
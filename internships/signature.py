@@ -0,0 +1,248 @@
+# gestion_stages_univ/internships/signature.py
+#
+# Signature électronique des PDF produits (rapports, documents individuels) avec pyHanko.
+# Le signataire (clé privée + certificat) et le contexte de validation sont chargés une seule
+# fois par processus puis réutilisés pour tous les documents. pyHanko n'est importé qu'au
+# premier document signé ou vérifié.
+
+import io
+import os
+from concurrent.futures import as_completed
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .processus import pool_de_processus
+
+
+# Nombre de fichiers confiés à un processus à la fois
+TAILLE_LOT_SIGNATURES = 50
+
+
+class ErreurSignature(Exception):
+    """Levée quand un document ne peut pas être signé ou vérifié."""
+
+
+def signature_active():
+    """Vrai si une clé de signature est configurée (PKCS#12, ou clé et certificat PEM)."""
+    return bool(getattr(settings, 'SIGNATURE_PKCS12', None) or getattr(settings, 'SIGNATURE_CLE', None))
+
+
+# Place réservée à la signature dans le PDF, en plus des certificats embarqués : la fixer évite à
+# pyHanko une signature « à blanc » par document pour en estimer la taille
+MARGE_SIGNATURE_OCTETS = 8192
+
+
+def _signataire_cle_en_cache(signer):
+    """
+    SimpleSigner recharge la clé privée (désérialisation DER + vérification RSA) à chaque
+    signature, ce qui coûte plus que la signature elle-même : on garde la clé chargée.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ec import ECDSA, EllipticCurvePrivateKey
+    from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+    from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+    from pyhanko.sign.general import get_pyca_cryptography_hash
+    from pyhanko.sign.signers import SimpleSigner
+
+    class SignataireCleEnCache(SimpleSigner):
+        cle_privee = serialization.load_der_private_key(signer.signing_key.dump(), password=None)
+
+        def sign_raw(self, data, digest_algorithm):
+            mecanisme = self.get_signature_mechanism_for_digest(digest_algorithm).signature_algo
+            algorithme = get_pyca_cryptography_hash(digest_algorithm)
+            if mecanisme == 'rsassa_pkcs1v15' and isinstance(self.cle_privee, RSAPrivateKey):
+                return self.cle_privee.sign(data, PKCS1v15(), algorithme)
+            if mecanisme == 'ecdsa' and isinstance(self.cle_privee, EllipticCurvePrivateKey):
+                return self.cle_privee.sign(data, ECDSA(algorithme))
+            # Autres mécanismes (PSS, EdDSA...) : implémentation d'origine
+            return super().sign_raw(data, digest_algorithm)
+
+    # Reconstruit à partir des seuls éléments publics du signataire chargé (clé, certificat, chaîne) : le
+    # mécanisme de signature reste celui déduit de la clé, comme au chargement (signataire() n'en impose pas)
+    return SignataireCleEnCache(
+        signing_cert=signer.signing_cert, signing_key=signer.signing_key, cert_registry=signer.cert_registry,
+    )
+
+
+@lru_cache(maxsize=None)
+def signataire():
+    """Signataire pyHanko construit à partir des fichiers configurés ; chargé une fois par processus."""
+    from pyhanko.sign import signers
+
+    mot_de_passe = getattr(settings, 'SIGNATURE_MOT_DE_PASSE', None)
+    mot_de_passe = mot_de_passe.encode() if mot_de_passe else None
+    chaine = getattr(settings, 'SIGNATURE_CHAINE', None) or None
+
+    if getattr(settings, 'SIGNATURE_PKCS12', None):
+        signer = signers.SimpleSigner.load_pkcs12(settings.SIGNATURE_PKCS12, ca_chain_files=chaine, passphrase=mot_de_passe)
+    elif getattr(settings, 'SIGNATURE_CLE', None):
+        signer = signers.SimpleSigner.load(
+            settings.SIGNATURE_CLE, settings.SIGNATURE_CERTIFICAT, ca_chain_files=chaine, key_passphrase=mot_de_passe,
+        )
+    else:
+        raise ImproperlyConfigured("Aucune clé de signature : définir SIGNATURE_PKCS12 ou SIGNATURE_CLE et SIGNATURE_CERTIFICAT.")
+
+    # SimpleSigner.load* journalise l'erreur et retourne None au lieu de lever une exception
+    if signer is None:
+        raise ImproperlyConfigured("Impossible de charger la clé de signature (fichier ou mot de passe incorrect).")
+    return _signataire_cle_en_cache(signer)
+
+
+@lru_cache(maxsize=None)
+def octets_reserves():
+    """Taille réservée au conteneur de signature (certificats embarqués + marge)."""
+    signer = signataire()
+    return sum(len(certificat.dump()) for certificat in signer.cert_registry) + MARGE_SIGNATURE_OCTETS
+
+
+@lru_cache(maxsize=None)
+def contexte_validation():
+    """
+    Contexte de validation des certificats, réutilisé d'une vérification à l'autre (il garde en cache
+    les chemins de certification déjà validés). Les certificats de confiance sont ceux de
+    SIGNATURE_CERTIFICATS_CONFIANCE, ou à défaut le certificat de signature lui-même (clé auto-signée).
+    Aucun accès réseau : la vérification est purement locale.
+    """
+    from pyhanko.keys import load_cert_from_pemder
+    from pyhanko_certvalidator import ValidationContext
+
+    fichiers = list(getattr(settings, 'SIGNATURE_CERTIFICATS_CONFIANCE', None) or [])
+    racines = [load_cert_from_pemder(fichier) for fichier in fichiers]
+    if not racines and signature_active():
+        racines = [signataire().signing_cert]
+    return ValidationContext(trust_roots=racines, allow_fetching=False)
+
+
+def signer_pdf(source, dest=None):
+    """
+    Signe le PDF lu dans le flux binaire `source` et l'écrit dans `dest` (un BytesIO par défaut),
+    retourné positionné au début. La signature est ajoutée en révision incrémentale.
+    """
+    from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+    from pyhanko.sign import signers
+
+    dest = io.BytesIO() if dest is None else dest
+    meta = signers.PdfSignatureMetadata(
+        field_name=getattr(settings, 'SIGNATURE_CHAMP', 'Signature'),
+        reason=getattr(settings, 'SIGNATURE_RAISON', None),
+        location=getattr(settings, 'SIGNATURE_LIEU', None),
+        md_algorithm='sha256',
+    )
+    try:
+        ecrivain = IncrementalPdfFileWriter(source, strict=False)
+        signers.sign_pdf(ecrivain, meta, signer=signataire(), output=dest, bytes_reserved=octets_reserves())
+    except ImproperlyConfigured:
+        raise
+    except Exception as e:
+        raise ErreurSignature(str(e)) from e
+    dest.seek(0)
+    return dest
+
+
+def signer_si_active(flux):
+    """Retourne le PDF `flux` signé si une clé est configurée, inchangé sinon."""
+    return signer_pdf(flux) if signature_active() else flux
+
+
+def signer_fichier(chemin_source, chemin_dest):
+    """
+    Signe un fichier PDF ; le résultat est écrit dans un .partiel puis renommé (écriture atomique), avec
+    la date de modification de la source (voir fichiers_a_signer).
+    """
+    partiel = chemin_dest + '.partiel'
+    try:
+        with open(chemin_source, 'rb') as source, open(partiel, 'wb') as dest:
+            signer_pdf(source, dest)
+        date_source = os.stat(chemin_source).st_mtime_ns
+        os.utime(partiel, ns=(date_source, date_source))
+        os.replace(partiel, chemin_dest)
+    finally:
+        if os.path.exists(partiel):
+            os.remove(partiel)
+
+
+def verifier_pdf(source):
+    """
+    Vérifie les signatures du PDF lu dans `source` avec le contexte de validation local.
+    Retourne une liste de dictionnaires, un par signature (vide si le document n'est pas signé) ; une
+    signature impossible à analyser (CMS corrompu, algorithme non pris en charge) y figure avec son erreur.
+    """
+    from pyhanko.pdf_utils.reader import PdfFileReader
+    from pyhanko.sign.validation import validate_pdf_signature
+
+    try:
+        lecteur = PdfFileReader(source, strict=False)
+        signatures = lecteur.embedded_signatures
+    except Exception as e:
+        raise ErreurSignature(f"PDF illisible : {e}") from e
+
+    contexte = contexte_validation()
+    resultats = []
+    for signature in signatures:
+        try:
+            statut = validate_pdf_signature(signature, contexte)
+        except Exception as e:
+            resultats.append({'champ': signature.field_name, 'erreur': str(e) or type(e).__name__, 'conforme': False})
+            continue
+        resultats.append({
+            'champ': signature.field_name,
+            'signataire': statut.signing_cert.subject.human_friendly if statut.signing_cert else None,
+            'date_signature': statut.signer_reported_dt.isoformat() if statut.signer_reported_dt else None,
+            'intacte': statut.intact,
+            'valide': statut.valid,
+            'certificat_de_confiance': statut.trusted,
+            'couvre_tout_le_document': statut.coverage.name == 'ENTIRE_FILE',
+            'conforme': statut.bottom_line,
+        })
+    return resultats
+
+
+def signer_lot(paires):
+    """Signe les fichiers [(source, destination)] ; exécuté dans un processus du pool."""
+    signes, erreurs = 0, []
+    for source, dest in paires:
+        try:
+            signer_fichier(source, dest)
+            signes += 1
+        except (ErreurSignature, OSError) as e:
+            erreurs.append((source, str(e)))
+    return signes, erreurs
+
+
+def fichiers_a_signer(dossier, dossier_sortie, forcer=False):
+    """
+    [(source, destination)] des PDF de `dossier` dont la version signée manque dans `dossier_sortie`, ou
+    date d'une source plus ancienne (document régénéré depuis, voir documents.documents_a_generer).
+    """
+    existants = {}
+    if not forcer and os.path.isdir(dossier_sortie):
+        existants = {entree.name: entree.stat().st_mtime_ns for entree in os.scandir(dossier_sortie)}
+    return [
+        (entree.path, os.path.join(dossier_sortie, entree.name))
+        for entree in sorted(os.scandir(dossier), key=lambda entree: entree.name)
+        if entree.name.lower().endswith('.pdf') and existants.get(entree.name, -1) < entree.stat().st_mtime_ns
+    ]
+
+
+def signer_fichiers(paires, workers=None, taille_lot=TAILLE_LOT_SIGNATURES):
+    """
+    Signe en parallèle les fichiers [(source, destination)].
+    Générateur : produit (nombre signé, [(source, erreur)]) à la fin de chaque lot.
+    """
+    signataire()  # Erreur de configuration signalée tout de suite, pas dans chaque processus
+    paires = list(paires)
+    workers = workers or getattr(settings, 'RAPPORTS_WORKERS', None) or os.cpu_count() or 1
+    lots = [paires[i:i + taille_lot] for i in range(0, len(paires), taille_lot)]
+
+    if workers <= 1 or len(lots) <= 1:
+        for lot in lots:
+            yield signer_lot(lot)
+        return
+
+    # Clé et certificats chargés une seule fois par processus, avant le premier lot
+    with pool_de_processus(workers, 'internships.signature.signataire') as pool:
+        futures = [pool.submit(signer_lot, lot) for lot in lots]
+        for future in as_completed(futures):
+            yield future.result()
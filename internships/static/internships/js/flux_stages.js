@@ -0,0 +1,60 @@
+// Mises à jour en direct des listes de stages (server-sent events)
+// Le serveur envoie, pour chaque stage modifié, ses colonnes affichées : seules les cellules
+// marquées data-champ de la ligne concernée sont remplacées, sans recharger la liste.
+document.addEventListener('DOMContentLoaded', function() {
+    const corps = document.querySelector('tbody[data-flux]');
+    if (!corps || !corps.dataset.flux || !window.EventSource) {
+        return;
+    }
+    const avis = document.getElementById('flux-avis');
+
+    function signalerChangement() {
+        // Ligne absente de la page (nouveau stage, stage nouvellement affecté) : proposer d'actualiser
+        if (avis) {
+            avis.classList.remove('d-none');
+        }
+    }
+
+    function texte(champ, valeur) {
+        if (valeur === null || valeur === undefined || valeur === '') {
+            return '-';
+        }
+        return champ === 'note' ? valeur + '/100' : String(valeur);
+    }
+
+    // EventSource se reconnecte seul et renvoie l'en-tête Last-Event-ID : les événements manqués sont rejoués
+    const source = new EventSource(corps.dataset.flux);
+
+    source.addEventListener('ligne', function(event) {
+        const stage = JSON.parse(event.data);
+        const ligne = document.getElementById('internship-row-' + stage.pk);
+        if (!ligne) {
+            signalerChangement();
+            return;
+        }
+        // Événement plus ancien que la ligne affichée (page rendue après le changement) : ignoré
+        if (Number(ligne.dataset.version) >= stage.v) {
+            return;
+        }
+        ligne.dataset.version = stage.v;
+        // Liste d'un encadreur : stage confié à un autre enseignant, la ligne est retirée
+        if (corps.dataset.encadreur && String(stage.encadreur_id) !== corps.dataset.encadreur) {
+            ligne.remove();
+            return;
+        }
+        ligne.querySelectorAll('[data-champ]').forEach(function(cellule) {
+            const valeur = texte(cellule.dataset.champ, stage[cellule.dataset.champ]);
+            if (cellule.textContent.trim() !== valeur) {
+                cellule.textContent = valeur;
+            }
+        });
+        ligne.classList.add('table-info');
+        setTimeout(function() { ligne.classList.remove('table-info'); }, 3000);
+    });
+
+    // Trop de changements d'un coup (traitement en masse) ou événements perdus : la liste doit être relue
+    source.addEventListener('recharger', function() {
+        source.close();
+        signalerChangement();
+    });
+});
@@ -0,0 +1,162 @@
+# gestion_stages_univ/internships/statistiques.py
+
+import numpy as np
+
+from .models import Teacher, Company, Promotion, Internship
+
+
+# Largeur par défaut des classes de l'histogramme (les notes sont sur 100)
+TRANCHE_HISTOGRAMME = 10
+# Seuil du score z au-delà duquel un encadreur est signalé comme atypique
+SEUIL_Z_ATYPIQUE = 2.0
+# Nombre minimal de notes pour qu'un encadreur puisse être signalé
+MIN_NOTES_ATYPIQUE = 5
+# Notes prises en compte : Internship.note n'a pas de validateur (l'admin accepte une note hors de l'échelle)
+NOTE_MIN, NOTE_MAX = 0, 100
+
+# Colonnes du tableau renvoyé par la requête unique (voir charger_notes)
+_COLONNES = ('note', 'encadreur_id', 'entreprise_selectionnee_id', 'etudiant__promotion_id')
+
+
+def charger_notes(queryset=None):
+    """
+    Récupère toutes les notes en UNE seule requête, sous forme d'un tableau NumPy (n, 4).
+    Les clés étrangères nulles (None) deviennent NaN grâce au dtype float. Les notes hors de
+    [NOTE_MIN, NOTE_MAX] sont écartées : elles donneraient une classe d'histogramme négative.
+    """
+    if queryset is None:
+        queryset = Internship.objects.all()
+    lignes = list(queryset.filter(note__range=(NOTE_MIN, NOTE_MAX)).values_list(*_COLONNES))
+    if not lignes:
+        return np.empty((0, len(_COLONNES)), dtype=float)
+    return np.array(lignes, dtype=float)
+
+
+def _bornes_histogramme(tranche):
+    # Bornes 0, tranche, 2*tranche, ..., 100 (la dernière classe inclut 100, et s'arrête à 100
+    # même si `tranche` ne divise pas 100 : tranche=30 -> [0, 30, 60, 90, 100])
+    return np.append(np.arange(0, 100, tranche), 100)
+
+
+def _agreger_par_groupe(notes, cles, tranche):
+    """
+    Calcule effectif, moyenne, écart-type et histogramme pour chaque valeur de `cles`,
+    sans boucle Python sur les lignes : tout passe par np.unique / np.bincount.
+    """
+    groupes, inverse = np.unique(cles, return_inverse=True)
+    nb_groupes = len(groupes)
+
+    effectifs = np.bincount(inverse, minlength=nb_groupes)
+    sommes = np.bincount(inverse, weights=notes, minlength=nb_groupes)
+    sommes_carres = np.bincount(inverse, weights=notes * notes, minlength=nb_groupes)
+    moyennes = sommes / effectifs
+    # Variance de population, bornée à 0 pour absorber les erreurs d'arrondi
+    ecarts_types = np.sqrt(np.maximum(sommes_carres / effectifs - moyennes ** 2, 0.0))
+
+    nb_classes = int(100 // tranche) + (1 if 100 % tranche else 0)
+    classes = np.minimum((notes // tranche).astype(np.int64), nb_classes - 1)
+    histogrammes = np.bincount(
+        inverse * nb_classes + classes, minlength=nb_groupes * nb_classes
+    ).reshape(nb_groupes, nb_classes)
+
+    return groupes, effectifs, moyennes, ecarts_types, histogrammes
+
+
+def _libelles(modele, ids, champs):
+    """Récupère les libellés d'un lot d'identifiants en une requête."""
+    ids = [int(i) for i in ids if i >= 0]
+    lignes = modele.objects.filter(pk__in=ids).values_list('pk', *champs)
+    return {ligne[0]: " ".join(str(v) for v in ligne[1:] if v) for ligne in lignes}
+
+
+def _serialiser_groupes(groupes, effectifs, moyennes, ecarts_types, histogrammes, libelles):
+    resultats = []
+    for i, cle in enumerate(groupes):
+        cle = int(cle)
+        resultats.append({
+            'id': cle if cle >= 0 else None,
+            'libelle': libelles.get(cle, "Non renseigné"),
+            'effectif': int(effectifs[i]),
+            'moyenne': round(float(moyennes[i]), 2),
+            'ecart_type': round(float(ecarts_types[i]), 2),
+            'histogramme': histogrammes[i].tolist(),
+        })
+    return resultats
+
+
+def calculer_statistiques_notes(queryset=None, tranche=TRANCHE_HISTOGRAMME,
+                                seuil_z=SEUIL_Z_ATYPIQUE, min_notes=MIN_NOTES_ATYPIQUE):
+    """
+    Statistiques de distribution des notes : globales, par encadreur, par entreprise
+    et par promotion, ainsi que la liste des encadreurs atypiques.
+
+    Un encadreur est atypique si la moyenne de ses notes s'écarte de la moyenne globale
+    de plus de `seuil_z` erreurs types (écart-type global / racine de son effectif).
+    """
+    donnees = charger_notes(queryset)
+    bornes = _bornes_histogramme(tranche)
+
+    if donnees.shape[0] == 0:
+        return {
+            'effectif': 0,
+            'bornes_histogramme': bornes.tolist(),
+            'global': None,
+            'par_encadreur': [],
+            'par_entreprise': [],
+            'par_promotion': [],
+            'encadreurs_atypiques': [],
+        }
+
+    notes = donnees[:, 0]
+    # NaN (clé étrangère absente) -> -1 pour regrouper les lignes non renseignées
+    cles = np.nan_to_num(donnees[:, 1:], nan=-1.0).astype(np.int64)
+
+    moyenne_globale = float(notes.mean())
+    ecart_type_global = float(notes.std())
+    histogramme_global = _agreger_par_groupe(notes, np.zeros(len(notes), dtype=np.int64), tranche)[4][0]
+
+    statistiques = {
+        'effectif': int(len(notes)),
+        'bornes_histogramme': bornes.tolist(),
+        'global': {
+            'moyenne': round(moyenne_globale, 2),
+            'ecart_type': round(ecart_type_global, 2),
+            'mediane': round(float(np.median(notes)), 2),
+            'minimum': int(notes.min()),
+            'maximum': int(notes.max()),
+            'histogramme': histogramme_global.tolist(),
+        },
+    }
+
+    dimensions = (
+        ('par_encadreur', 0, Teacher, ('nom_complet',)),
+        ('par_entreprise', 1, Company, ('nom',)),
+        ('par_promotion', 2, Promotion, ('nom', 'annee_academique')),
+    )
+    agregats_encadreurs = None
+    for nom, colonne, modele, champs in dimensions:
+        agregats = _agreger_par_groupe(notes, cles[:, colonne], tranche)
+        libelles = _libelles(modele, agregats[0], champs)
+        statistiques[nom] = _serialiser_groupes(*agregats, libelles)
+        if colonne == 0:
+            agregats_encadreurs = (agregats, libelles)
+
+    # Détection vectorisée des encadreurs atypiques
+    (groupes, effectifs, moyennes, _ecarts, _histos), libelles = agregats_encadreurs
+    atypiques = []
+    if ecart_type_global > 0:
+        scores_z = (moyennes - moyenne_globale) / (ecart_type_global / np.sqrt(effectifs))
+        masque = (groupes >= 0) & (effectifs >= min_notes) & (np.abs(scores_z) > seuil_z)
+        for i in np.flatnonzero(masque):
+            atypiques.append({
+                'id': int(groupes[i]),
+                'libelle': libelles.get(int(groupes[i]), "Non renseigné"),
+                'effectif': int(effectifs[i]),
+                'moyenne': round(float(moyennes[i]), 2),
+                'score_z': round(float(scores_z[i]), 2),
+                'tendance': 'severe' if scores_z[i] < 0 else 'genereux',
+            })
+        atypiques.sort(key=lambda e: -abs(e['score_z']))
+    statistiques['encadreurs_atypiques'] = atypiques
+
+    return statistiques
@@ -0,0 +1,16 @@
+# gestion_stages_univ/internships/templatetags/fragments_lignes.py
+
+from django import template
+
+from internships.fragments import rendre_lignes
+
+register = template.Library()
+
+
+@register.simple_tag
+def lignes_en_cache(objets, gabarit, nom_variable):
+    """
+    Rend une liste de lignes de tableau avec cache par ligne (clé : pk + version).
+    Utilisation : {% lignes_en_cache etudiants 'internships/partials/student_row.html' 'etudiant' %}
+    """
+    return rendre_lignes(objets, gabarit, nom_variable)
@@ -1,3 +1,448 @@
-from django.test import TestCase
+# gestion_stages_univ/internships/tests.py
 
-# Create your tests here.
+import base64
+import io
+import json
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail.backends import locmem
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import documents, signature, workflow
+from .archives import archiver_annee
+from .models import (
+    User, Faculty, Department, Promotion, Teacher, Student, Company, Internship, TransitionStage, CleIdempotence,
+    Notification, StageArchive,
+)
+from .notifications import envoyer_notifications
+from .repliques import ALIAS_REPLIQUE, COOKIE_ECRITURE
+
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+class DonneesDeBase(TestCase):
+    """Une faculté, un encadreur, un étudiant ayant proposé deux entreprises, et un compte facultaire."""
+
+    @classmethod
+    def setUpTestData(cls):
+        faculte = Faculty.objects.create(nom="Sciences", code="ST")
+        departement = Department.objects.create(faculte=faculte, nom="Informatique", code="INFO")
+        promotion = Promotion.objects.create(departement=departement, nom="L3", annee_academique="2024-2025")
+        cls.entreprise_1 = Company.objects.create(nom="Bralima", email_contact="rh@bralima.cd")
+        cls.entreprise_2 = Company.objects.create(nom="Rawbank")
+
+        cls.facultaire = User.objects.create_user('facultaire', password='x', est_facultaire=True)
+        utilisateur = User.objects.create_user('encadreur', password='x', est_enseignant=True)
+        cls.encadreur = Teacher.objects.create(
+            user=utilisateur, matricule="E1", nom_complet="Encadreur Un", departement=departement,
+        )
+        utilisateur = User.objects.create_user('etudiant', password='x', est_etudiant=True, email='etudiant@example.com')
+        cls.etudiant = Student.objects.create(
+            user=utilisateur, matricule="S1", nom_complet="Etudiant Un", promotion=promotion, id_inscription_annee=1,
+            entreprise_proposee_1=cls.entreprise_1, entreprise_proposee_2=cls.entreprise_2,
+        )
+        cls.stage = Internship.objects.create(etudiant=cls.etudiant, statut='PROPOSITION_SOUMISE')
+
+
+class VerrouillageOptimisteTests(DonneesDeBase):
+    """Deux envois de la même modale (même version du stage) : le second est refusé en 409, sans écraser."""
+
+    def test_validation_affectation_deux_fois_meme_version(self):
+        self.client.force_login(self.facultaire)
+        url = reverse('valider_affecter_stage_modal', args=[self.stage.pk])
+        donnees = {
+            'entreprise_selectionnee': self.entreprise_1.pk, 'encadreur': self.encadreur.pk,
+            'version': self.stage.version,
+        }
+
+        reponse = self.client.post(url, donnees, **AJAX)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse.json()['success'])
+
+        reponse = self.client.post(url, {**donnees, 'entreprise_selectionnee': self.entreprise_2.pk}, **AJAX)
+        self.assertEqual(reponse.status_code, 409)
+        self.assertTrue(reponse.json()['conflit'])
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.statut, 'ENCADREUR_AFFECTE')
+        self.assertEqual(self.stage.entreprise_selectionnee, self.entreprise_1)
+        self.assertEqual(self.stage.version, donnees['version'] + 1)
+
+    def test_notation_deux_fois_meme_version(self):
+        Internship.objects.filter(pk=self.stage.pk).update(
+            statut='ENCADREUR_AFFECTE', entreprise_selectionnee=self.entreprise_1, encadreur=self.encadreur,
+        )
+        self.stage.refresh_from_db()
+        self.client.force_login(self.encadreur.user)
+        url = reverse('noter_etudiant_modal', args=[self.stage.pk])
+
+        reponse = self.client.post(url, {'note': 75, 'version': self.stage.version}, **AJAX)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse.json()['success'])
+
+        reponse = self.client.post(url, {'note': 40, 'version': self.stage.version}, **AJAX)
+        self.assertEqual(reponse.status_code, 409)
+        self.assertTrue(reponse.json()['conflit'])
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.statut, 'TERMINE')
+        self.assertEqual(self.stage.note, 75)
+
+    def test_modale_sans_version_refusee(self):
+        self.client.force_login(self.facultaire)
+        url = reverse('valider_affecter_stage_modal', args=[self.stage.pk])
+        donnees = {'entreprise_selectionnee': self.entreprise_1.pk, 'encadreur': self.encadreur.pk}
+        self.assertEqual(self.client.post(url, donnees, **AJAX).status_code, 400)
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.statut, 'PROPOSITION_SOUMISE')
+
+    def test_api_sans_version_refusee(self):
+        url = reverse('api_transition_stage', args=[self.stage.pk])
+        identifiants = 'Basic ' + base64.b64encode(b'facultaire:x').decode()
+        donnees = {'evenement': 'valider', 'entreprise_selectionnee': self.entreprise_1.pk}
+
+        reponse = self.client.post(url, donnees, content_type='application/json', HTTP_AUTHORIZATION=identifiants)
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('version', reponse.json()['details'])
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.statut, 'PROPOSITION_SOUMISE')
+
+        donnees['version'] = self.stage.version
+        reponse = self.client.post(url, donnees, content_type='application/json', HTTP_AUTHORIZATION=identifiants)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['statut'], 'PROPOSITION_VALIDEE')
+
+
+class IdempotenceTests(DonneesDeBase):
+    """Un double envoi du formulaire de propositions (même clé d'idempotence) n'est enregistré qu'une fois."""
+
+    def test_propositions_envoyees_deux_fois(self):
+        Internship.objects.filter(pk=self.stage.pk).update(statut='EN_ATTENTE_PROPOSITION')
+        self.client.force_login(self.etudiant.user)
+        url = reverse('proposer_entreprises_etudiant')
+        donnees = {
+            'entreprise_proposee_1': self.entreprise_1.pk, 'entreprise_proposee_2': self.entreprise_2.pk,
+            'cle_idempotence': 'cle-de-test-0001',
+        }
+
+        premiere = self.client.post(url, donnees, follow=True)
+        seconde = self.client.post(url, donnees, follow=True)
+
+        self.assertEqual(CleIdempotence.objects.filter(utilisateur=self.etudiant.user).count(), 1)
+        self.assertEqual(TransitionStage.objects.filter(stage=self.stage).count(), 1)
+        self.assertIn("soumises", ' '.join(str(m) for m in premiere.context['messages']))
+        self.assertIn("déjà été enregistrées", ' '.join(str(m) for m in seconde.context['messages']))
+        self.stage.refresh_from_db()
+        self.assertEqual(self.stage.statut, 'PROPOSITION_SOUMISE')
+
+
+class EmpreinteConditionnelleTests(DonneesDeBase):
+    """Listes en 304 tant que rien de ce qu'elles affichent n'a changé (voir conditionnel.py)."""
+
+    def setUp(self):
+        self.client.force_login(self.facultaire)
+        self.url = reverse('liste_etudiants_facultaire')
+        self.etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+
+    def test_nouveau_secret_csrf(self):
+        # Reconnexion : Django change le secret CSRF, la page en cache porte l'ancien jeton
+        self.client.cookies['csrftoken'] = 'a' * 32
+        reponse = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse['ETag'], self.etag)
+
+    def test_promotion_renommee(self):
+        promotion = self.etudiant.promotion
+        promotion.nom = "L3 Génie logiciel"
+        promotion.save()
+        reponse = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertContains(reponse, "L3 Génie logiciel")
+
+
+class VerificationDocumentsTests(DonneesDeBase):
+    """Un document émis reste vérifiable (page publique du code QR) après l'archivage de son année."""
+
+    def test_releve_de_note_d_une_annee_archivee(self):
+        Internship.objects.filter(pk=self.stage.pk).update(
+            statut='TERMINE', note=82, entreprise_selectionnee=self.entreprise_1, encadreur=self.encadreur,
+        )
+        chemin = reverse('verifier_document', args=[
+            'releve_note', self.stage.pk, documents.code_verification('releve_note', self.stage.pk),
+        ])
+        self.assertContains(self.client.get(chemin), "82/100")
+
+        archiver_annee('2024-2025')
+        self.assertFalse(Internship.objects.filter(pk=self.stage.pk).exists())
+        self.assertTrue(StageArchive.objects.filter(stage_id=self.stage.pk).exists())
+
+        reponse = self.client.get(chemin)
+        self.assertContains(reponse, "Ce document est authentique")
+        self.assertContains(reponse, "82/100")
+        self.assertContains(reponse, "Bralima")
+        # Code falsifié : toujours refusé
+        faux = reverse('verifier_document', args=['releve_note', self.stage.pk, '0' * 16])
+        self.assertEqual(self.client.get(faux).status_code, 404)
+
+
+class GenerationDocumentsTests(DonneesDeBase):
+    """Reprise de la génération en lot : seuls les documents manquants ou plus anciens que leurs données sont refaits."""
+
+    def setUp(self):
+        Internship.objects.filter(pk=self.stage.pk).update(
+            statut='TERMINE', note=82, entreprise_selectionnee=self.entreprise_1, encadreur=self.encadreur,
+        )
+        self.stage.refresh_from_db()
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        self.assertEqual(documents.documents_a_generer('releve_note', self.dossier), [self.stage.pk])
+        self.assertEqual(list(documents.generer_documents('releve_note', self.dossier, workers=1, signer=False)), [(1, [])])
+        self.assertEqual(documents.documents_a_generer('releve_note', self.dossier), [])
+
+    def test_note_modifiee(self):
+        workflow.mettre_a_jour(self.stage, self.stage.version, note=45)
+        self.assertEqual(documents.documents_a_generer('releve_note', self.dossier), [self.stage.pk])
+
+    def test_entreprise_renommee(self):
+        self.entreprise_1.nom = "Bralima SA"
+        self.entreprise_1.save()
+        self.assertEqual(documents.documents_a_generer('releve_note', self.dossier), [self.stage.pk])
+
+
+class VerificationSignaturesTests(DonneesDeBase):
+    """Vérification locale des signatures PDF : une signature illisible est signalée, sans erreur 500."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dossier = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.dossier, ignore_errors=True)
+        call_command('creer_cle_signature', cls.dossier, stdout=io.StringIO())
+
+    def setUp(self):
+        reglages = override_settings(
+            SIGNATURE_PKCS12=None, SIGNATURE_CERTIFICATS_CONFIANCE=None,
+            SIGNATURE_CLE=f"{self.dossier}/signature_cle.pem", SIGNATURE_CERTIFICAT=f"{self.dossier}/signature_certificat.pem",
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        for cache in (signature.signataire, signature.octets_reserves, signature.contexte_validation):
+            cache.cache_clear()
+            self.addCleanup(cache.cache_clear)
+        self.client.force_login(self.facultaire)
+
+    def _verifier(self, contenu):
+        fichier = SimpleUploadedFile('document.pdf', contenu, content_type='application/pdf')
+        return self.client.post(reverse('verifier_signature_pdf'), {'fichier': fichier})
+
+    def _pdf_signe(self):
+        from reportlab.pdfgen import canvas
+
+        tampon = io.BytesIO()
+        page = canvas.Canvas(tampon)
+        page.drawString(72, 72, "Relevé de note")
+        page.save()
+        tampon.seek(0)
+        return signature.signer_pdf(tampon).getvalue()
+
+    def test_signature_conforme(self):
+        reponse = self._verifier(self._pdf_signe())
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse.json()['conforme'])
+
+    def test_algorithme_non_pris_en_charge(self):
+        # OID de condensat inconnu (SHA-256 modifié) dans le conteneur CMS
+        contenu = self._pdf_signe().replace(b'608648016503040201', b'608648016503040263')
+        reponse = self._verifier(contenu)
+        self.assertEqual(reponse.status_code, 200)
+        resultat = reponse.json()
+        self.assertFalse(resultat['conforme'])
+        self.assertEqual(resultat['signatures'][0]['champ'], 'Signature')
+        self.assertIn('erreur', resultat['signatures'][0])
+
+    def test_fichier_illisible(self):
+        self.assertEqual(self._verifier(b"pas un PDF").status_code, 400)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BoiteEnvoiTests(DonneesDeBase):
+    """Notifications de statut : écrites avec le changement de statut, envoyées plus tard par envoyer_notifications()."""
+
+    def setUp(self):
+        workflow.transition(
+            self.stage, 'affecter_encadreur', acteur=self.facultaire,
+            entreprise_selectionnee=self.entreprise_1, encadreur=self.encadreur,
+        )
+        self.notification = Notification.objects.get(stage=self.stage)
+
+    def test_envoi(self):
+        self.assertEqual(self.notification.statut, 'EN_ATTENTE')
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(envoyer_notifications(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['etudiant@example.com'])
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.statut, 'ENVOYEE')
+        self.assertIsNotNone(self.notification.date_envoi)
+        # Rien de plus à envoyer
+        self.assertEqual(envoyer_notifications(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_nouvel_essai_apres_echec(self):
+        avant = timezone.now()
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=ConnectionError("serveur injoignable")), \
+                self.assertLogs('internships.notifications', 'WARNING'):
+            self.assertEqual(envoyer_notifications(), (0, 1))
+
+        self.assertEqual(mail.outbox, [])
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.statut, 'EN_ATTENTE')
+        self.assertEqual(self.notification.tentatives, 1)
+        self.assertIn("serveur injoignable", self.notification.derniere_erreur)
+        self.assertGreaterEqual(self.notification.prochain_essai, avant + timedelta(minutes=1))
+        # Pas encore l'heure de la nouvelle tentative
+        self.assertEqual(envoyer_notifications(), (0, 0))
+
+        Notification.objects.filter(pk=self.notification.pk).update(prochain_essai=timezone.now())
+        self.assertEqual(envoyer_notifications(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.statut, 'ENVOYEE')
+
+    def _envoyer_deux(self, premiere_erreur):
+        # Deuxième notification dans la boîte : la première échoue avec `premiere_erreur`, la seconde part
+        self.notification.pk = None
+        self.notification.save()
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=[premiere_erreur, 1]), \
+                mock.patch.object(locmem.EmailBackend, 'open') as ouvrir, \
+                mock.patch.object(locmem.EmailBackend, 'close') as fermer, \
+                self.assertLogs('internships.notifications', 'WARNING'):
+            self.assertEqual(envoyer_notifications(), (1, 1))
+        return ouvrir.call_count, fermer.call_count
+
+    def test_destinataire_refuse_garde_la_connexion(self):
+        refus = smtplib.SMTPRecipientsRefused({'etudiant@example.com': (550, b"Boite inconnue")})
+        # Une ouverture et une fermeture pour tout l'envoi
+        self.assertEqual(self._envoyer_deux(refus), (1, 1))
+
+    def test_deconnexion_rouvre_la_connexion_une_fois(self):
+        self.assertEqual(self._envoyer_deux(smtplib.SMTPServerDisconnected("Connexion perdue")), (2, 2))
+
+
+class DiffusionEncadreurTests(DonneesDeBase):
+    """Listes en direct : un stage confié à un autre encadreur est aussi annoncé à l'ancien."""
+
+    def setUp(self):
+        utilisateur = User.objects.create_user('encadreur2', password='x', est_enseignant=True)
+        self.autre = Teacher.objects.create(
+            user=utilisateur, matricule="E2", nom_complet="Encadreur Deux", departement=self.encadreur.departement,
+        )
+        workflow.transition(
+            self.stage, 'affecter_encadreur', entreprise_selectionnee=self.entreprise_1, encadreur=self.encadreur,
+        )
+        self.publies = []
+        faux = mock.Mock(actif=mock.Mock(return_value=True), publier=self.publies.extend)
+        patch = mock.patch('internships.diffusion.diffuseur', return_value=faux)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_changement_d_encadreur_par_le_workflow(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            workflow.transition(self.stage, 'affecter_encadreur', version_attendue=self.stage.version, encadreur=self.autre)
+        self.assertEqual(len(self.publies), 1)
+        self.assertEqual(self.publies[0]['encadreur_id'], self.autre.pk)
+        self.assertEqual(self.publies[0]['ancien_encadreur_id'], self.encadreur.pk)
+
+    def test_changement_d_encadreur_par_save(self):
+        self.stage.encadreur = self.autre
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stage.save()
+        self.assertEqual(self.publies[-1]['ancien_encadreur_id'], self.encadreur.pk)
+
+    def test_meme_encadreur(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            workflow.mettre_a_jour(self.stage, self.stage.version, encadreur=self.encadreur)
+        self.assertNotIn('ancien_encadreur_id', self.publies[-1])
+
+
+class ExportFluxTests(DonneesDeBase):
+    """Export de l'API écrit par morceaux : générateur sous WSGI, itérateur asynchrone sous ASGI."""
+
+    def test_export_wsgi(self):
+        self.client.force_login(self.facultaire)
+        reponse = self.client.get(reverse('api_export', args=['stages']))
+        self.assertFalse(reponse.is_async)
+        lignes = json.loads(b''.join(reponse.streaming_content))
+        self.assertEqual([ligne['id'] for ligne in lignes], [self.stage.pk])
+
+    async def test_export_asgi(self):
+        await self.async_client.aforce_login(self.facultaire)
+        reponse = await self.async_client.get(reverse('api_export', args=['stages']))
+        self.assertTrue(reponse.is_async)
+        lignes = json.loads(b''.join([morceau async for morceau in reponse.streaming_content]))
+        self.assertEqual([ligne['id'] for ligne in lignes], [self.stage.pk])
+
+
+class LectureRepliqueTests(TransactionTestCase):
+    """
+    Réplique locale en second fichier SQLite, recopiée par `synchroniser_replique` : une liste lit sur la
+    réplique, sauf juste après une écriture du même navigateur (cookie ecriture_recente).
+    TransactionTestCase : la copie de la base principale doit voir des données validées.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Alias déclaré comme DB_REPLIQUE le ferait dans settings.py (connections.settings est settings.DATABASES),
+        # après la préparation des bases de test : son fichier est créé par synchroniser_replique, pas par migrate.
+        # Ajouté ensuite à `databases` : les requêtes du test y sont permises
+        cls.dossier = tempfile.mkdtemp()
+        connections.settings[ALIAS_REPLIQUE] = {
+            **connections['default'].settings_dict, 'NAME': f"{cls.dossier}/replique.sqlite3",
+        }
+        cls.databases = cls.databases | {ALIAS_REPLIQUE}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[ALIAS_REPLIQUE].close()
+        del connections[ALIAS_REPLIQUE]
+        del connections.settings[ALIAS_REPLIQUE]
+        shutil.rmtree(cls.dossier)
+        super().tearDownClass()
+
+    def test_lecture_sur_la_replique_puis_sur_la_principale_apres_une_ecriture(self):
+        facultaire = User.objects.create_user('facultaire', password='x', est_facultaire=True)
+        Company.objects.create(nom="Bralima")
+        self.client.force_login(facultaire)
+        call_command('synchroniser_replique', stdout=io.StringIO())
+        # Écrite après la copie : seulement sur la base principale
+        Company.objects.create(nom="Rawbank")
+        url = reverse('liste_entreprises_facultaire')
+
+        reponse = self.client.get(url)
+        self.assertContains(reponse, "Bralima")
+        self.assertNotContains(reponse, "Rawbank")
+
+        reponse = self.client.post(reverse('ajouter_entreprise_modal'), {'nom': "Vodacom"}, **AJAX)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn(COOKIE_ECRITURE, self.client.cookies)
+
+        reponse = self.client.get(url)
+        self.assertContains(reponse, "Rawbank")
+        self.assertContains(reponse, "Vodacom")
+
+        # Cookie expiré : retour sur la réplique, qui n'a toujours pas rattrapé
+        del self.client.cookies[COOKIE_ECRITURE]
+        self.assertNotContains(self.client.get(url), "Vodacom")
@@ -0,0 +1,19 @@
+# gestion_stages_univ/internships/urls_api.py
+
+from django.urls import path
+from . import api # API JSON (voir internships/api.py)
+
+# Incluses sous /api/v1/ : une future version incompatible aura son propre préfixe
+urlpatterns = [
+    path('', api.racine, name='api_racine'),
+    # Changement de statut d'un stage par un événement du workflow
+    path('stages/<int:pk>/transitions/', api.transition_stage, name='api_transition_stage'),
+    # Flux des changements pour la synchronisation incrémentale (voir internships/changements.py)
+    path('changements/', api.changements, name='api_changements'),
+    # Étudiants et stages d'une année, courante ou archivée (voir internships/archives.py)
+    path('historique/', api.historique, name='api_historique'),
+    # stages, etudiants, enseignants, entreprises, promotions (voir api.RESSOURCES)
+    path('<slug:nom>/', api.liste, name='api_liste'),
+    path('<slug:nom>/export/', api.export, name='api_export'),
+    path('<slug:nom>/<int:pk>/', api.detail, name='api_detail'),
+]
@@ -2,43 +2,61 @@
 
 from django.urls import path
 from . import views # Importez vos vues ici
+from . import vues_async # Versions asynchrones des tableaux de bord et des listes
+from django.conf import settings
+
+# Tableaux de bord et listes : vues asynchrones sous ASGI (settings.VUES_ASYNCHRONES), synchrones sinon
+lecture = vues_async if settings.VUES_ASYNCHRONES else views
 
 urlpatterns = [
     # Tableau de bord Facultaire
-    path('tableau-de-bord/', views.tableau_de_bord_facultaire, name='tableau_de_bord_facultaire'),
+    path('tableau-de-bord/', lecture.tableau_de_bord_facultaire, name='tableau_de_bord_facultaire'),
+    # Année académique de travail des listes et du tableau de bord (voir internships/annees.py)
+    path('annee/', views.choisir_annee_academique, name='choisir_annee_academique'),
 
     # --- Gestion des Enseignants ---
-    path('enseignants/', views.liste_enseignants_facultaire, name='liste_enseignants_facultaire'),
+    path('enseignants/', lecture.liste_enseignants_facultaire, name='liste_enseignants_facultaire'),
     path('enseignants/ajouter/', views.enseignant_form_modal, name='ajouter_enseignant_modal'),
     path('enseignants/modifier/<int:pk>/', views.enseignant_form_modal, name='modifier_enseignant_modal'),
     path('enseignants/supprimer/<int:pk>/', views.enseignant_delete_modal, name='supprimer_enseignant_modal'),
 
     # --- Gestion des Étudiants ---
     # URLs pour la gestion des Étudiants (avec modales)
-    path('etudiants/', views.liste_etudiants_facultaire, name='liste_etudiants_facultaire'),
+    path('etudiants/', lecture.liste_etudiants_facultaire, name='liste_etudiants_facultaire'),
     path('etudiants/ajouter/', views.etudiant_form_modal, name='ajouter_etudiant_modal'),
     path('etudiants/modifier/<int:pk>/', views.etudiant_form_modal, name='modifier_etudiant_modal'),
     path('etudiants/supprimer/<int:pk>/', views.etudiant_delete_modal, name='supprimer_etudiant_modal'),
 
     # --- Gestion des Entreprises ---
-    path('entreprises/', views.liste_entreprises_facultaire, name='liste_entreprises_facultaire'),
+    path('entreprises/', lecture.liste_entreprises_facultaire, name='liste_entreprises_facultaire'),
     path('entreprises/ajouter/', views.entreprise_form_modal, name='ajouter_entreprise_modal'),
     path('entreprises/modifier/<int:pk>/', views.entreprise_form_modal, name='modifier_entreprise_modal'),
     path('entreprises/supprimer/<int:pk>/', views.entreprise_delete_modal, name='supprimer_entreprise_modal'),
+    # Doublons d'entreprises : suggestions et fusion (voir internships/doublons.py)
+    path('entreprises/doublons/', views.doublons_entreprises, name='doublons_entreprises'),
+    path('entreprises/doublons/fusionner/', views.fusionner_entreprises, name='fusionner_entreprises'),
 
     # --- Gestion des Stages ---
     # Ajouter ici plus tard les URLs pour les stages (visualisation, validation, affectation)...
     path('proposer-entreprises/', views.formulaire_proposition_etudiant, name='proposer_entreprises_etudiant'),
 
-    path('stages/', views.liste_stages_facultaire, name='liste_stages_facultaire'), # Vue pour lister tous les stages
+    path('stages/', lecture.liste_stages_facultaire, name='liste_stages_facultaire'), # Vue pour lister tous les stages
     path('stages/valider-affecter/<int:pk>/', views.valider_affecter_stage_modal, name='valider_affecter_stage_modal'), # Modale pour validation/affectation
 
     # Vue listant les stages que cet enseignant encadre (peut être le tableau de bord lui-même ou une page séparée)
-    path('stages-encadres/', views.liste_stages_encadres, name='liste_stages_encadres'),
+    path('stages-encadres/', lecture.liste_stages_encadres, name='liste_stages_encadres'),
     # URL pour le formulaire de notation de l'étudiant via modale
     path('noter-etudiant/<int:pk>/', views.formulaire_notation_modal, name='noter_etudiant_modal'),
 
+    # --- Statistiques ---
+    path('statistiques/notes/', views.statistiques_notes, name='statistiques_notes'),
+
     # --- Rapports ---
     path('rapport-affectations-pdf/', views.generate_student_supervisor_pdf_report, name='rapport_affectations_pdf'),
+    path('rapport-affectations-promotions/', views.rapport_affectations_par_promotion, name='rapport_affectations_par_promotion'),
+    path('signatures/verifier/', views.verifier_signature_pdf, name='verifier_signature_pdf'),
 
-]
\ No newline at end of file
+]
+# Liste des stages en direct (server-sent events) : seulement sous ASGI
+if settings.VUES_ASYNCHRONES:
+    urlpatterns.append(path('stages/evenements/', vues_async.flux_stages_facultaire, name='flux_stages_facultaire'))
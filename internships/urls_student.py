@@ -2,16 +2,24 @@
 
 from django.urls import path
 from . import views # Importez vos vues définies dans internships/views.py
+from . import vues_async # Versions asynchrones des tableaux de bord et des listes
+from django.conf import settings
+
+# Tableaux de bord et listes : vues asynchrones sous ASGI (settings.VUES_ASYNCHRONES), synchrones sinon
+lecture = vues_async if settings.VUES_ASYNCHRONES else views
 
 urlpatterns = [
     # Tableau de bord Étudiant
     # Cette vue affiche le résumé du stage de l'étudiant connecté
-    path('tableau-de-bord/', views.tableau_de_bord_etudiant, name='tableau_de_bord_etudiant'),
+    path('tableau-de-bord/', lecture.tableau_de_bord_etudiant, name='tableau_de_bord_etudiant'),
 
     # --- Proposition de Stage ---
     # URL pour le formulaire de proposition d'entreprises par l'étudiant
     path('proposer-entreprises/', views.formulaire_proposition_etudiant, name='proposer_entreprises_etudiant'),
 
+    # Documents individuels de l'étudiant (attestation, lettre d'affectation, relevé de note)
+    path('documents/<str:type_document>/', views.telecharger_document_etudiant, name='telecharger_document_etudiant'),
+
     # Ajoutez ici d'autres URLs spécifiques à l'étudiant si nécessaire
     # Par exemple : voir les détails de l'entreprise validée, voir le profil de l'encadreur affecté, etc.
 ]
\ No newline at end of file
@@ -2,18 +2,26 @@
 
 from django.urls import path
 from . import views # Importez vos vues définies dans internships/views.py
+from . import vues_async # Versions asynchrones des tableaux de bord et des listes
+from django.conf import settings
+
+# Tableaux de bord et listes : vues asynchrones sous ASGI (settings.VUES_ASYNCHRONES), synchrones sinon
+lecture = vues_async if settings.VUES_ASYNCHRONES else views
 
 urlpatterns = [
     # Tableau de bord Enseignant
     # Cette vue peut afficher un résumé ou rediriger vers la liste des stages encadrés
-    path('tableau-de-bord/', views.tableau_de_bord_enseignant, name='tableau_de_bord_enseignant'),
+    path('tableau-de-bord/', lecture.tableau_de_bord_enseignant, name='tableau_de_bord_enseignant'),
 
     # --- Gestion des Stages Encadrés par cet Enseignant ---
     # Vue listant spécifiquement les stages où l'enseignant connecté est l'encadreur
-    path('stages-encadres/', views.liste_stages_encadres, name='liste_stages_encadres'),
+    path('stages-encadres/', lecture.liste_stages_encadres, name='liste_stages_encadres'),
     # URL pour le formulaire de notation d'un étudiant via modale (identifié par l'ID du stage)
     path('noter-etudiant/<int:pk>/', views.formulaire_notation_modal, name='noter_etudiant_modal'),
 
     # Ajoutez ici d'autres URLs spécifiques à l'enseignant si nécessaire
     # Par exemple : voir le profil d'un étudiant, voir les détails d'une entreprise, etc.
-]
\ No newline at end of file
+]
+# Liste des stages encadrés en direct (server-sent events) : seulement sous ASGI
+if settings.VUES_ASYNCHRONES:
+    urlpatterns.append(path('stages-encadres/evenements/', vues_async.flux_stages_encadres, name='flux_stages_encadres'))
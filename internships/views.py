@@ -17,6 +17,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Q
+from django.core.exceptions import ValidationError
 
 # Importations pour les modèles
 from .models import (
@@ -26,13 +27,20 @@ from .forms import (
     TeacherForm, CompanyForm, StudentForm, StudentProposalForm, 
     InternshipValidationForm, InternshipGradingForm # Importer le nouveau formulaire
 )
-
-# Importations pour le PDF
-import io
+from .conditionnel import MODELES_DE_REFERENCE, empreinte_conditionnelle
+from . import rapports # Rapports PDF (xhtml2pdf n'est importé qu'à la génération)
+from . import signature # Signature des PDF (pyHanko n'est importé qu'à la première signature)
+from .workflow import TransitionInvalide # Statut ou version du stage changés par une autre requête
+from . import idempotence # Clés d'idempotence des envois de formulaires
+from . import doublons # Doublons d'entreprises : suggestions et fusion
+from . import annees # Année académique de travail des facultaires
+from .perimetre import perimetre_facultaire # Année de travail et faculté du compte (voir perimetre.py)
+from .repliques import lecture_replique # Lectures sur la réplique de la base, si configurée
+
+from django.conf import settings
 from django.http import FileResponse
-from django.template.loader import get_template
-from django.utils import timezone
-from xhtml2pdf import pisa
+from django.views.decorators.http import require_POST
+from django.utils.http import url_has_allowed_host_and_scheme
 
 # --- Fonctions de test pour les rôles (déjà définies) ---
 def est_facultaire_test(user):
@@ -44,6 +52,58 @@ def est_enseignant_test(user):
 def est_etudiant_test(user):
     return user.is_authenticated and user.est_etudiant
 
+def est_facultaire_universite_test(user):
+    # Compte facultaire sans faculté (voir perimetre.py) : données communes à toutes les facultés
+    return est_facultaire_test(user) and user.faculte_id is None
+
+
+def _reponse_conflit(request, is_ajax, erreur, gabarit_partiel, formulaire, internship, redirection):
+    # Le stage a été modifié par une autre requête depuis l'affichage de la modale (voir Internship.version) :
+    # 409 Conflict avec le message et le formulaire rechargé sur la version actuelle, au lieu d'écraser
+    message = ' '.join(erreur.messages)
+    if not is_ajax:
+        messages.error(request, message)
+        return redirect(redirection)
+    internship.refresh_from_db()
+    html = render_to_string(gabarit_partiel, {'form': formulaire(instance=internship), 'internship': internship}, request=request)
+    return JsonResponse({'success': False, 'conflit': True, 'message': message, 'html': html}, status=409)
+
+# --- Sources des empreintes conditionnelles (ETag / Last-Modified) pour les vues personnelles ---
+def _stages_de_l_enseignant(request):
+    return Internship.objects.filter(encadreur_id=request.user.pk)
+
+def _etudiants_de_l_enseignant(request):
+    return Student.objects.filter(stage__encadreur_id=request.user.pk)
+
+def _entreprises_de_l_enseignant(request):
+    return Company.objects.filter(stages_attribues__encadreur_id=request.user.pk)
+
+def _etudiant_connecte(request):
+    return Student.objects.filter(pk=request.user.pk)
+
+def _stage_de_l_etudiant(request):
+    return Internship.objects.filter(etudiant_id=request.user.pk)
+
+def _entreprises_de_l_etudiant(request):
+    return Company.objects.filter(
+        Q(stages_attribues__etudiant_id=request.user.pk) |
+        Q(proposee_par_etudiants_1__pk=request.user.pk) |
+        Q(proposee_par_etudiants_2__pk=request.user.pk)
+    )
+
+def _encadreur_de_l_etudiant(request):
+    return Teacher.objects.filter(stages_encadres__etudiant_id=request.user.pk)
+
+# Vues facultaires : données du périmètre, année de travail et faculté du compte (voir perimetre.py)
+def _etudiants_du_perimetre(request):
+    return Student.perimetre.all()
+
+def _stages_du_perimetre(request):
+    return Internship.perimetre.all()
+
+def _enseignants_du_perimetre(request):
+    return Teacher.perimetre.all()
+
 # --- Vues des Tableaux de Bord (déjà ébauchées) ---
 
 @login_required # L'utilisateur doit être connecté pour accéder à cette vue
@@ -68,19 +128,24 @@ def home_dashboard(request):
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_etudiants_du_perimetre, _enseignants_du_perimetre, Company, _stages_du_perimetre)
 def tableau_de_bord_facultaire(request):
     statistiques = {
-        'total_etudiants': Student.objects.count(),
-        'total_enseignants': Teacher.objects.count(),
+        'total_etudiants': Student.perimetre.count(),
+        'total_enseignants': Teacher.perimetre.count(),
         'total_entreprises': Company.objects.count(),
-        'propositions_soumises': Internship.objects.filter(statut='PROPOSITION_SOUMISE').count(),
-        'stages_affectes': Internship.objects.filter(statut='ENCADREUR_AFFECTE').count(),
-        'stages_termines': Internship.objects.filter(statut='TERMINE').count(),
+        'propositions_soumises': Internship.perimetre.filter(statut='PROPOSITION_SOUMISE').count(),
+        'stages_affectes': Internship.perimetre.filter(statut='ENCADREUR_AFFECTE').count(),
+        'stages_termines': Internship.perimetre.filter(statut='TERMINE').count(),
     }
     return render(request, 'internships/faculty_dashboard.html', {'statistiques': statistiques})
 
 @login_required
 @user_passes_test(est_enseignant_test)
+@lecture_replique
+@empreinte_conditionnelle(_stages_de_l_enseignant, _etudiants_de_l_enseignant, _entreprises_de_l_enseignant)
 def tableau_de_bord_enseignant(request):
     try:
         enseignant = request.user.teacher
@@ -91,6 +156,8 @@ def tableau_de_bord_enseignant(request):
 
 @login_required
 @user_passes_test(est_etudiant_test)
+@lecture_replique
+@empreinte_conditionnelle(_etudiant_connecte, _stage_de_l_etudiant, _entreprises_de_l_etudiant, _encadreur_de_l_etudiant)
 def tableau_de_bord_etudiant(request):
     try:
         etudiant = request.user.student
@@ -98,25 +165,67 @@ def tableau_de_bord_etudiant(request):
             mon_stage = etudiant.stage
         except Internship.DoesNotExist:
             mon_stage = None
-        return render(request, 'internships/student_dashboard.html', {'etudiant': etudiant, 'mon_stage': mon_stage})
+        from .documents import documents_disponibles
+        return render(request, 'internships/student_dashboard.html', {
+            'etudiant': etudiant, 'mon_stage': mon_stage,
+            'documents_disponibles': documents_disponibles(mon_stage) if mon_stage else [],
+        })
     except Student.DoesNotExist:
          return HttpResponse("Votre profil d'étudiant est incomplet ou incorrectement lié.", status=400)
 
 
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+def statistiques_notes(request):
+    # Distribution des notes (histogrammes, moyennes, écarts-types, encadreurs atypiques)
+    # Les notes sont chargées en une seule requête puis agrégées avec NumPy
+    # Import différé : NumPy n'est chargé que par cette vue, pas au démarrage du worker
+    from .statistiques import calculer_statistiques_notes, TRANCHE_HISTOGRAMME
+
+    try:
+        tranche = int(request.GET.get('tranche', TRANCHE_HISTOGRAMME))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "Le paramètre 'tranche' doit être un entier."}, status=400)
+    if not 1 <= tranche <= 100:
+        return JsonResponse({'success': False, 'message': "Le paramètre 'tranche' doit être compris entre 1 et 100."}, status=400)
+
+    statistiques = calculer_statistiques_notes(Internship.perimetre.all(), tranche=tranche)
+    return JsonResponse({'success': True, 'statistiques': statistiques})
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@require_POST
+def choisir_annee_academique(request):
+    # Sélecteur de la barre de navigation : change l'année de travail puis revient à la page d'origine
+    if not annees.choisir_annee(request, request.POST.get('annee', '')):
+        messages.error(request, "Année académique inconnue.")
+    suivante = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(suivante, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        suivante = reverse('tableau_de_bord_facultaire')
+    return redirect(suivante)
+
+
 # --- Vues pour la Gestion des Enseignants (par le Facultaire - déjà définies) ---
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_enseignants_du_perimetre, *MODELES_DE_REFERENCE)
 def liste_enseignants_facultaire(request):
-    enseignants = Teacher.objects.all().select_related('departement')
+    enseignants = Teacher.perimetre.all().select_related('departement')
     return render(request, 'internships/faculty_teacher_list.html', {'enseignants': enseignants})
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@perimetre_facultaire
 def enseignant_form_modal(request, pk=None):
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
     if pk:
-        enseignant = get_object_or_404(Teacher, pk=pk)
+        enseignant = get_object_or_404(Teacher.perimetre, pk=pk)
         form = TeacherForm(request.POST or None, instance=enseignant)
     else:
         enseignant = None
@@ -144,8 +253,9 @@ def enseignant_form_modal(request, pk=None):
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@perimetre_facultaire
 def enseignant_delete_modal(request, pk):
-    enseignant = get_object_or_404(Teacher, pk=pk)
+    enseignant = get_object_or_404(Teacher.perimetre, pk=pk)
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
     if request.method == 'POST':
@@ -167,6 +277,8 @@ def enseignant_delete_modal(request, pk):
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@empreinte_conditionnelle(Company)
 def liste_entreprises_facultaire(request):
     entreprises = Company.objects.all()
     return render(request, 'internships/faculty_company_list.html', {'entreprises': entreprises})
@@ -222,24 +334,63 @@ def entreprise_delete_modal(request, pk):
         return render(request, 'internships/faculty_company_confirm_delete.html', {'entreprise': entreprise})
 
 
+# Les entreprises sont communes à toutes les facultés : leur fusion est réservée aux comptes de toute l'université
+@login_required
+@user_passes_test(est_facultaire_universite_test)
+@lecture_replique
+def doublons_entreprises(request):
+    # Suggestions de fusion : entreprises comparées seulement au sein de leurs blocs (voir doublons.py)
+    try:
+        seuil = float(request.GET.get('seuil', doublons.SEUIL_SUGGESTION))
+    except ValueError:
+        return HttpResponseBadRequest("Le paramètre 'seuil' doit être un nombre.")
+    if not 0.5 <= seuil <= 1:
+        return HttpResponseBadRequest("Le paramètre 'seuil' doit être compris entre 0.5 et 1.")
+    groupes = doublons.suggestions(seuil)
+    return render(request, 'internships/faculty_company_duplicates.html', {'groupes': groupes, 'seuil': seuil})
+
+@login_required
+@user_passes_test(est_facultaire_universite_test)
+@require_POST
+def fusionner_entreprises(request):
+    # Fusion d'un groupe : l'entreprise choisie est conservée, les doublons cochés sont repointés puis supprimés
+    try:
+        resultat = doublons.fusionner(request.POST.get('conservee'), request.POST.getlist('doublons'))
+    except doublons.FusionImpossible as e:
+        messages.error(request, str(e))
+    except (TypeError, ValueError):
+        messages.error(request, "Sélection d'entreprises invalide.")
+    else:
+        messages.success(
+            request,
+            f"{resultat['supprimees']} doublon(s) fusionné(s) : {resultat['etudiants']} étudiant(s) "
+            f"et {resultat['stages']} stage(s) repointés.",
+        )
+    return redirect('doublons_entreprises')
+
+
 # --- Nouvelles Vues pour la Gestion des Étudiants (par le Facultaire) ---
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_etudiants_du_perimetre, *MODELES_DE_REFERENCE)
 def liste_etudiants_facultaire(request):
-    # Vue listant tous les étudiants
+    # Vue listant les étudiants de l'année de travail
     # Utiliser select_related pour charger la promotion, le département et la faculté en une requête
-    etudiants = Student.objects.all().select_related('promotion', 'promotion__departement', 'promotion__departement__faculte')
+    etudiants = Student.perimetre.all().select_related('promotion', 'promotion__departement', 'promotion__departement__faculte')
     return render(request, 'internships/faculty_student_list.html', {'etudiants': etudiants})
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@perimetre_facultaire
 def etudiant_form_modal(request, pk=None):
     # Vue utilisée pour l'ajout (pk=None) et la modification (pk=int) d'un étudiant via modale
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
     if pk: # Modification
-        etudiant = get_object_or_404(Student, pk=pk)
+        etudiant = get_object_or_404(Student.perimetre, pk=pk)
         form = StudentForm(request.POST or None, instance=etudiant)
     else: # Ajout
         etudiant = None
@@ -281,9 +432,10 @@ def etudiant_form_modal(request, pk=None):
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@perimetre_facultaire
 def etudiant_delete_modal(request, pk):
     # Vue pour la suppression d'un étudiant via modale
-    etudiant = get_object_or_404(Student, pk=pk)
+    etudiant = get_object_or_404(Student.perimetre, pk=pk)
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
     if request.method == 'POST':
@@ -307,29 +459,108 @@ def etudiant_delete_modal(request, pk):
 
 # --- Ajoutez ici les autres vues plus tard (Stages: propositions, validation, affectation, notation) ---
 
-# --- Vue de génération PDF (déjà définie) ---
+# --- Vue de génération PDF ---
+# La pile PDF (xhtml2pdf, reportlab...) est importée par le module rapports au premier appel seulement
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
 def generate_student_supervisor_pdf_report(request):
-    stages = Internship.objects.select_related(
-        'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
-        'entreprise_selectionnee', 'encadreur'
-    ).filter(statut='ENCADREUR_AFFECTE').order_by(
-        'etudiant__promotion__annee_academique', 'etudiant__promotion__nom', 'etudiant__nom_complet'
-    )
+    # Moteur sélectionnable : ?moteur=reportlab (natif, rapide) ou ?moteur=xhtml2pdf (template HTML)
+    try:
+        moteur = rapports.moteur_rapport('affectations', request.GET.get('moteur'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    try:
+        buffer = signature.signer_si_active(rapports.rapport_affectations_pdf(moteur=moteur))
+    except (rapports.ErreurRapportPDF, signature.ErreurSignature) as e:
+        return HttpResponse('Erreur lors de la génération du PDF. ' + str(e), status=500)
+
+    return FileResponse(buffer, as_attachment=True, filename=rapports.nom_fichier_rapport('rapport_affectations_stages'))
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+def rapport_affectations_par_promotion(request):
+    # Rapport des affectations découpé par promotion (?par=departement pour un découpage par département).
+    # ?format=zip : un PDF par partie dans une archive ; ?format=pdf : parties fusionnées en un document.
+    # Processus plafonnés à RAPPORTS_WORKERS_REQUETE (voir rapports_lots) ; les gros rapports passent
+    # par la commande `manage.py rapport_affectations`.
+    from . import rapports_lots
+
+    format_sortie = request.GET.get('format', 'zip')
+    try:
+        moteur = rapports.moteur_rapport('affectations', request.GET.get('moteur'))
+        fichier, _nb_parties = rapports_lots.rapport_affectations_par_partie(
+            par=request.GET.get('par', 'promotion'), format=format_sortie, moteur=moteur,
+            workers=settings.RAPPORTS_WORKERS_REQUETE,
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    except (rapports.ErreurRapportPDF, signature.ErreurSignature) as e:
+        return HttpResponse('Erreur lors de la génération du PDF. ' + str(e), status=500)
 
-    template_path = 'internships/reports/liste_etudiants_encadreurs.html'
-    template = get_template(template_path)
-    html = template.render({'stages': stages, 'date_rapport': timezone.now()})
+    nom = rapports.nom_fichier_rapport('rapport_affectations_par_promotion', extension=format_sortie)
+    return FileResponse(fichier, as_attachment=True, filename=nom)
 
-    buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8')
 
-    if pisa_status.err:
-        return HttpResponse('Erreur lors de la génération du PDF. ' + str(pisa_status.err), status=500)
+# --- Vérification locale des signatures PDF ---
+@login_required
+@user_passes_test(est_facultaire_test)
+@require_POST
+def verifier_signature_pdf(request):
+    # Reçoit un PDF (champ 'fichier') et renvoie en JSON l'état de chacune de ses signatures,
+    # vérifiées hors ligne avec les certificats de confiance configurés
+    fichier = request.FILES.get('fichier')
+    if fichier is None:
+        return JsonResponse({'erreur': "Aucun fichier reçu (champ 'fichier')."}, status=400)
+    try:
+        signatures = signature.verifier_pdf(fichier)
+    except signature.ErreurSignature as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    return JsonResponse({
+        'fichier': fichier.name,
+        'signe': bool(signatures),
+        'conforme': bool(signatures) and all(s['conforme'] for s in signatures),
+        'signatures': signatures,
+    })
+
+
+# --- Documents individuels (attestation, lettre d'affectation, relevé de note) ---
+@login_required
+@user_passes_test(est_etudiant_test)
+def telecharger_document_etudiant(request, type_document):
+    # L'étudiant connecté télécharge un de ses documents, rendu à la demande
+    from . import documents
 
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'rapport_affectations_stages_{timezone.now().strftime("%Y%m%d")}.pdf')
+    if type_document not in documents.TYPES_DOCUMENTS:
+        return HttpResponseBadRequest("Type de document inconnu.")
+    stage = get_object_or_404(documents.stages_eligibles(type_document), etudiant_id=request.user.pk)
+    try:
+        buffer = signature.signer_si_active(documents.rendre_document(type_document, stage))
+    except (rapports.ErreurRapportPDF, signature.ErreurSignature) as e:
+        return HttpResponse('Erreur lors de la génération du PDF. ' + str(e), status=500)
+
+    nom = documents.nom_fichier_document(type_document, stage.pk, stage.etudiant.matricule)
+    return FileResponse(buffer, as_attachment=True, filename=nom)
+
+
+def verifier_document(request, type_document, pk, code):
+    # Page publique (cible du code QR) : confirme qu'un document a bien été émis par la Faculté
+    from . import documents
+
+    fiche = None
+    if type_document in documents.TYPES_DOCUMENTS and documents.verifier_code(type_document, pk, code):
+        # Stage courant, ou archivé avec son année (les documents restent vérifiables après l'archivage)
+        fiche = documents.fiche_verification(type_document, pk)
+    contexte = {
+        'fiche': fiche,
+        'type_document': type_document,
+        'titre': documents.TYPES_DOCUMENTS.get(type_document, {}).get('titre', ''),
+    }
+    return render(request, 'internships/documents/verification.html', contexte, status=200 if fiche else 404)
 
 
 
@@ -361,9 +592,16 @@ def formulaire_proposition_etudiant(request):
         if form.is_valid():
             # La méthode save() du formulaire gère la mise à jour de Student et la création/mise à jour de Internship
             try:
-                form.save()
+                # La clé d'idempotence est réservée dans la même transaction que l'enregistrement
+                with transaction.atomic():
+                    idempotence.reserver_cle(request)
+                    form.save(acteur=request.user)
                 messages.success(request, "Vos propositions de stage ont été enregistrées et soumises.")
                 return redirect('tableau_de_bord_etudiant') # Rediriger vers le tableau de bord étudiant
+            except idempotence.RequeteDejaTraitee:
+                 # Double envoi ou nouvelle tentative d'un envoi déjà enregistré : même issue que le premier
+                 messages.info(request, "Ces propositions avaient déjà été enregistrées.")
+                 return redirect('tableau_de_bord_etudiant')
             except ValidationError as e:
                  # Gérer les erreurs de validation personnalisées de la méthode save (ex: même entreprise proposée)
                  messages.error(request, f"Erreur lors de l'enregistrement : {e.message}")
@@ -377,7 +615,10 @@ def formulaire_proposition_etudiant(request):
         # Initialiser le formulaire avec l'instance Student pour pré-remplir les champs s'il a déjà proposé
         form = StudentProposalForm(instance=etudiant)
 
-    # Afficher le formulaire
+    # Afficher le formulaire (seul, s'il est chargé dans la modale du tableau de bord)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        html = render_to_string('internships/partials/student_proposal_form.html', {'form': form}, request=request)
+        return HttpResponse(html, status=400 if form.errors else 200)
     return render(request, 'internships/student_proposal_form.html', {'form': form})
 
 
@@ -387,42 +628,21 @@ def formulaire_proposition_etudiant(request):
 # def valider_affecter_stage(request, pk): ...
 
 
-# --- Vue de génération PDF (déjà définie) ---
-@login_required
-@user_passes_test(est_facultaire_test)
-def generate_student_supervisor_pdf_report(request):
-    stages = Internship.objects.select_related(
-        'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
-        'entreprise_selectionnee', 'encadreur'
-    ).filter(statut='ENCADREUR_AFFECTE').order_by(
-        'etudiant__promotion__annee_academique', 'etudiant__promotion__nom', 'etudiant__nom_complet'
-    )
-
-    template_path = 'internships/reports/liste_etudiants_encadreurs.html'
-    template = get_template(template_path)
-    html = template.render({'stages': stages, 'date_rapport': timezone.now()})
-
-    buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8')
-
-    if pisa_status.err:
-        return HttpResponse('Erreur lors de la génération du PDF. ' + str(pisa_status.err), status=500)
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'rapport_affectations_stages_{timezone.now().strftime("%Y%m%d")}.pdf')
-
-
-
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_stages_du_perimetre, _etudiants_du_perimetre, Company, _enseignants_du_perimetre, *MODELES_DE_REFERENCE)
 def liste_stages_facultaire(request):
-    # Vue listant tous les stages avec les infos pertinentes
+    # Vue listant les stages de l'année de travail avec les infos pertinentes
     # Utiliser select_related pour charger les objets liés en une requête
-    stages = Internship.objects.all().select_related(
+    stages = Internship.perimetre.all().select_related(
         'etudiant',
         'etudiant__promotion',
         'etudiant__promotion__departement',
+        'etudiant__entreprise_proposee_1', # Affichées dans chaque ligne (et dans la version du cache de ligne)
+        'etudiant__entreprise_proposee_2',
         'entreprise_selectionnee',
         'encadreur'
     ).order_by( # Trier pour une meilleure visualisation
@@ -435,9 +655,10 @@ def liste_stages_facultaire(request):
 
 @login_required
 @user_passes_test(est_facultaire_test)
+@perimetre_facultaire
 def valider_affecter_stage_modal(request, pk):
     # Vue utilisée pour valider l'entreprise et affecter l'encadreur via modale
-    internship = get_object_or_404(Internship, pk=pk)
+    internship = get_object_or_404(Internship.perimetre, pk=pk)
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
     # Optionnel: Ajouter une validation ici si le statut n'est pas "PROPOSITION_SOUMISE" ou "ENCADREUR_AFFECTE"
@@ -455,7 +676,13 @@ def valider_affecter_stage_modal(request, pk):
         form = InternshipValidationForm(request.POST, instance=internship)
         if form.is_valid():
             # La méthode save() du formulaire gère la mise à jour du statut et des dates
-            form.save()
+            try:
+                form.save(acteur=request.user)
+            except TransitionInvalide as e:
+                return _reponse_conflit(
+                    request, is_ajax, e, 'internships/partials/form_validation_affectation.html',
+                    InternshipValidationForm, internship, 'liste_stages_facultaire',
+                )
 
             # Optionnel: Ajouter un message flash
             messages.success(request, f"Stage de {internship.etudiant.nom_complet} validé et encadreur affecté avec succès.")
@@ -497,35 +724,12 @@ def valider_affecter_stage_modal(request, pk):
 # def liste_stages_encadres(request): ... (déjà ébauché)
 # def formulaire_notation_modal(request, pk): ...
 
-# --- Vue de génération PDF (déjà définie) ---
-@login_required
-@user_passes_test(est_facultaire_test)
-def generate_student_supervisor_pdf_report(request):
-    stages = Internship.objects.select_related(
-        'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
-        'entreprise_selectionnee', 'encadreur'
-    ).filter(statut='ENCADREUR_AFFECTE').order_by(
-        'etudiant__promotion__annee_academique', 'etudiant__promotion__nom', 'etudiant__nom_complet'
-    )
-
-    template_path = 'internships/reports/liste_etudiants_encadreurs.html'
-    template = get_template(template_path)
-    html = template.render({'stages': stages, 'date_rapport': timezone.now()})
-
-    buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8')
-
-    if pisa_status.err:
-        return HttpResponse('Erreur lors de la génération du PDF. ' + str(pisa_status.err), status=500)
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'rapport_affectations_stages_{timezone.now().strftime("%Y%m%d")}.pdf')
-
-
 
 
 @login_required
 @user_passes_test(est_enseignant_test) # Seuls les enseignants peuvent accéder à cette liste
+@lecture_replique
+@empreinte_conditionnelle(_stages_de_l_enseignant, _etudiants_de_l_enseignant, _entreprises_de_l_enseignant, *MODELES_DE_REFERENCE)
 def liste_stages_encadres(request):
     # Vue listant les stages où l'enseignant connecté est l'encadreur
     try:
@@ -582,7 +786,13 @@ def formulaire_notation_modal(request, pk):
         form = InternshipGradingForm(request.POST, instance=internship)
         if form.is_valid():
             # La méthode save() du formulaire gère la mise à jour de la note, du statut et de la date de notation
-            form.save()
+            try:
+                form.save(acteur=request.user)
+            except TransitionInvalide as e:
+                return _reponse_conflit(
+                    request, is_ajax, e, 'internships/partials/form_notation.html',
+                    InternshipGradingForm, internship, 'liste_stages_encadres',
+                )
 
             messages.success(request, f"La note pour {internship.etudiant.nom_complet} a été enregistrée.")
 
@@ -615,27 +825,3 @@ def formulaire_notation_modal(request, pk):
     else:
          # Rendre une page complète si non AJAX (moins probable)
          return render(request, 'internships/teacher_grading_page.html', {'form': form, 'internship': internship})
-
-# --- Vue de génération PDF (déjà définie) ---
-@login_required
-@user_passes_test(est_facultaire_test)
-def generate_student_supervisor_pdf_report(request):
-    stages = Internship.objects.select_related(
-        'etudiant', 'etudiant__promotion', 'etudiant__promotion__departement',
-        'entreprise_selectionnee', 'encadreur'
-    ).filter(statut='ENCADREUR_AFFECTE').order_by(
-        'etudiant__promotion__annee_academique', 'etudiant__promotion__nom', 'etudiant__nom_complet'
-    )
-
-    template_path = 'internships/reports/liste_etudiants_encadreurs.html'
-    template = get_template(template_path)
-    html = template.render({'stages': stages, 'date_rapport': timezone.now()})
-
-    buffer = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8')
-
-    if pisa_status.err:
-        return HttpResponse('Erreur lors de la génération du PDF. ' + str(pisa_status.err), status=500)
-
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'rapport_affectations_stages_{timezone.now().strftime("%Y%m%d")}.pdf')
\ No newline at end of file
@@ -0,0 +1,257 @@
+# gestion_stages_univ/internships/vues_async.py
+#
+# Versions asynchrones des tableaux de bord et des listes (lecture seule), servies à la place de
+# celles de views.py quand settings.VUES_ASYNCHRONES est vrai (par défaut sous asgi.py).
+# Les requêtes passent par l'ORM asynchrone (acount, aaggregate, aiterator) et les agrégats
+# indépendants sont lancés ensemble avec asyncio.gather ; le rendu du template, synchrone
+# (accès paresseux aux relations, cache des lignes), s'exécute dans un thread via sync_to_async.
+#
+# Comparaison avec les vues synchrones servies par WSGI : `manage.py comparer_vues_async`.
+#
+# Les flux server-sent events des listes de stages (flux_stages_*) ne sont servis que sous ASGI :
+# une connexion ouverte y occupe une tâche asyncio, pas un thread.
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+
+from . import diffusion
+from .conditionnel import MODELES_DE_REFERENCE, empreinte_conditionnelle
+from .models import Company, Internship, Student, Teacher
+from .perimetre import faculte_de_l_utilisateur, perimetre_facultaire
+from .repliques import lecture_replique
+from .views import (
+    _encadreur_de_l_etudiant, _enseignants_du_perimetre, _entreprises_de_l_enseignant, _entreprises_de_l_etudiant,
+    _etudiant_connecte, _etudiants_de_l_enseignant, _etudiants_du_perimetre, _stage_de_l_etudiant, _stages_de_l_enseignant,
+    _stages_du_perimetre,
+    est_enseignant_test, est_etudiant_test, est_facultaire_test,
+)
+
+
+arender = sync_to_async(render)
+
+
+async def _liste(queryset):
+    # Les templates parcourent la liste plusieurs fois (cache des lignes) : elle est chargée d'avance
+    return [objet async for objet in queryset.aiterator(chunk_size=2000)]
+
+
+# --- Tableaux de bord ---
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_etudiants_du_perimetre, _enseignants_du_perimetre, Company, _stages_du_perimetre)
+async def tableau_de_bord_facultaire(request):
+    # Trois comptages indépendants et un seul agrégat conditionnel pour les statuts, lancés ensemble
+    total_etudiants, total_enseignants, total_entreprises, par_statut = await asyncio.gather(
+        Student.perimetre.acount(),
+        Teacher.perimetre.acount(),
+        Company.objects.acount(),
+        Internship.perimetre.aaggregate(
+            propositions_soumises=Count('pk', filter=Q(statut='PROPOSITION_SOUMISE')),
+            stages_affectes=Count('pk', filter=Q(statut='ENCADREUR_AFFECTE')),
+            stages_termines=Count('pk', filter=Q(statut='TERMINE')),
+        ),
+    )
+    statistiques = {
+        'total_etudiants': total_etudiants,
+        'total_enseignants': total_enseignants,
+        'total_entreprises': total_entreprises,
+        **par_statut,
+    }
+    return await arender(request, 'internships/faculty_dashboard.html', {'statistiques': statistiques})
+
+
+@login_required
+@user_passes_test(est_enseignant_test)
+@lecture_replique
+@empreinte_conditionnelle(_stages_de_l_enseignant, _etudiants_de_l_enseignant, _entreprises_de_l_enseignant)
+async def tableau_de_bord_enseignant(request):
+    # Le profil et les stages encadrés sont lus ensemble (les stages sont filtrés sur la clé du profil)
+    enseignant, stages_encadres = await asyncio.gather(
+        Teacher.objects.filter(pk=request.user.pk).afirst(),
+        _liste(Internship.objects.filter(encadreur_id=request.user.pk).select_related('etudiant', 'entreprise_selectionnee')),
+    )
+    if enseignant is None:
+        return HttpResponse("Votre profil d'enseignant est incomplet ou incorrectement lié.", status=400)
+    return await arender(request, 'internships/teacher_dashboard.html', {'stages_encadres': stages_encadres})
+
+
+@login_required
+@user_passes_test(est_etudiant_test)
+@lecture_replique
+@empreinte_conditionnelle(_etudiant_connecte, _stage_de_l_etudiant, _entreprises_de_l_etudiant, _encadreur_de_l_etudiant)
+async def tableau_de_bord_etudiant(request):
+    from .documents import documents_disponibles
+
+    etudiant, mon_stage = await asyncio.gather(
+        Student.objects.filter(pk=request.user.pk).afirst(),
+        Internship.objects.filter(etudiant_id=request.user.pk).select_related('entreprise_selectionnee', 'encadreur').afirst(),
+    )
+    if etudiant is None:
+        return HttpResponse("Votre profil d'étudiant est incomplet ou incorrectement lié.", status=400)
+    return await arender(request, 'internships/student_dashboard.html', {
+        'etudiant': etudiant, 'mon_stage': mon_stage,
+        'documents_disponibles': documents_disponibles(mon_stage) if mon_stage else [],
+    })
+
+
+# --- Listes ---
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_enseignants_du_perimetre, *MODELES_DE_REFERENCE)
+async def liste_enseignants_facultaire(request):
+    enseignants = await _liste(Teacher.perimetre.all().select_related('departement'))
+    return await arender(request, 'internships/faculty_teacher_list.html', {'enseignants': enseignants})
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@empreinte_conditionnelle(Company)
+async def liste_entreprises_facultaire(request):
+    entreprises = await _liste(Company.objects.all())
+    return await arender(request, 'internships/faculty_company_list.html', {'entreprises': entreprises})
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_etudiants_du_perimetre, *MODELES_DE_REFERENCE)
+async def liste_etudiants_facultaire(request):
+    etudiants = await _liste(
+        Student.perimetre.all().select_related('promotion', 'promotion__departement', 'promotion__departement__faculte')
+    )
+    return await arender(request, 'internships/faculty_student_list.html', {'etudiants': etudiants})
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+@lecture_replique
+@perimetre_facultaire
+@empreinte_conditionnelle(_stages_du_perimetre, _etudiants_du_perimetre, Company, _enseignants_du_perimetre, *MODELES_DE_REFERENCE)
+async def liste_stages_facultaire(request):
+    stages = await _liste(Internship.perimetre.all().select_related(
+        'etudiant',
+        'etudiant__promotion',
+        'etudiant__promotion__departement',
+        'etudiant__entreprise_proposee_1',
+        'etudiant__entreprise_proposee_2',
+        'entreprise_selectionnee',
+        'encadreur'
+    ).order_by(
+        'etudiant__promotion__annee_academique',
+        'etudiant__promotion__nom',
+        'statut',
+        'etudiant__nom_complet'
+    ))
+    return await arender(request, 'internships/faculty_internship_list.html', {'stages': stages})
+
+
+@login_required
+@user_passes_test(est_enseignant_test)
+@lecture_replique
+@empreinte_conditionnelle(_stages_de_l_enseignant, _etudiants_de_l_enseignant, _entreprises_de_l_enseignant, *MODELES_DE_REFERENCE)
+async def liste_stages_encadres(request):
+    enseignant, stages_a_noter = await asyncio.gather(
+        Teacher.objects.filter(pk=request.user.pk).aexists(),
+        _liste(
+            Internship.objects.filter(encadreur_id=request.user.pk)
+            .select_related('etudiant', 'entreprise_selectionnee').order_by('statut', 'etudiant__nom_complet')
+        ),
+    )
+    if not enseignant:
+        messages.error(request, "Votre profil d'enseignant est introuvable ou incorrectement lié.")
+        return redirect('logout')
+    return await arender(request, 'internships/teacher_internship_list.html', {'stages_a_noter': stages_a_noter})
+
+
+# --- Listes en direct (server-sent events) ---
+
+# Une connexion est fermée au bout de DUREE_MAX_FLUX secondes : EventSource se reconnecte seul avec
+# l'en-tête Last-Event-ID (événements manqués rejoués), et la session est ainsi revérifiée.
+DUREE_MAX_FLUX = 600
+INTERVALLE_PING = 20  # commentaire SSE périodique, pour les proxys qui coupent les connexions muettes
+DELAI_RECONNEXION_MS = 3000
+
+
+def _message_sse(evenement):
+    entete = f"id: {evenement['id']}\n" if 'id' in evenement else ''
+    return f"{entete}event: {evenement['type']}\ndata: {json.dumps(evenement, separators=(',', ':'))}\n\n"
+
+
+def _flux_stages(request, visible):
+    try:
+        dernier_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        dernier_id = None
+
+    async def evenements():
+        diffuseur = diffusion.diffuseur()
+        # Abonnement pris dans le générateur : le finally le libère quand le client se déconnecte
+        abonnement, a_rejouer = diffuseur.abonner(dernier_id)
+        boucle = asyncio.get_running_loop()
+        fin = boucle.time() + DUREE_MAX_FLUX
+        try:
+            yield f"retry: {DELAI_RECONNEXION_MS}\n\n"
+            if a_rejouer is None:
+                yield _message_sse({'type': 'recharger'})
+                return
+            for evenement in a_rejouer:
+                if visible(evenement):
+                    yield _message_sse(evenement)
+            while (reste := fin - boucle.time()) > 0:
+                if abonnement.deborde:
+                    yield _message_sse({'type': 'recharger'})
+                    return
+                try:
+                    evenement = await asyncio.wait_for(abonnement.file.get(), timeout=min(INTERVALLE_PING, reste))
+                except TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if visible(evenement):
+                    yield _message_sse(evenement)
+        finally:
+            diffuseur.desabonner(abonnement)
+
+    reponse = StreamingHttpResponse(evenements(), content_type='text/event-stream')
+    reponse['Cache-Control'] = 'no-cache'
+    reponse['X-Accel-Buffering'] = 'no'  # nginx : ne pas mettre le flux en tampon
+    return reponse
+
+
+@login_required
+@user_passes_test(est_facultaire_test)
+async def flux_stages_facultaire(request):
+    # Compte limité à une faculté : seulement les stages de celle-ci (et les demandes de rechargement)
+    faculte_id = faculte_de_l_utilisateur(await request.auser())
+    if faculte_id is None:
+        return _flux_stages(request, lambda evenement: True)
+    return _flux_stages(
+        request, lambda evenement: evenement['type'] != 'ligne' or evenement['faculte_id'] == faculte_id,
+    )
+
+
+@login_required
+@user_passes_test(est_enseignant_test)
+async def flux_stages_encadres(request):
+    # Seulement les stages encadrés par l'enseignant connecté, ou qu'il vient de perdre (la ligne est alors
+    # retirée de sa liste), et les demandes de rechargement
+    enseignant_id = (await request.auser()).pk
+    return _flux_stages(
+        request, lambda evenement: evenement['type'] != 'ligne' or enseignant_id in (
+            evenement['encadreur_id'], evenement.get('ancien_encadreur_id'),
+        ),
+    )
@@ -0,0 +1,252 @@
+# gestion_stages_univ/internships/workflow.py
+#
+# Machine à états du stage (Internship.statut). Chaque événement définit, pour chaque statut
+# de départ autorisé, le statut d'arrivée et les dates à mettre à jour. La même table sert :
+# - à transition_many(), qui applique un événement à tout un queryset en UNE requête UPDATE
+#   conditionnelle (CASE WHEN sur le statut de départ) ;
+# - à transition(), qui passe par transition_many() pour un seul stage : le formulaire et les
+#   traitements en masse partagent donc la même implémentation (et la même protection contre
+#   les modifications concurrentes : l'UPDATE ne touche le stage que s'il a encore un statut de départ).
+# Chaque écriture incrémente Internship.version. transition() et mettre_a_jour() acceptent la version
+# lue par le formulaire (version_attendue) : l'UPDATE est alors conditionné à cette version, sans verrou
+# de ligne, et une écriture concurrente se traduit par ModificationConcurrente plutôt que par un écrasement.
+# update() n'émet pas post_save : les stages modifiés sont ajoutés au flux des changements (changements.py)
+# et signalés à diffusion.py (listes en direct).
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import diffusion
+from .changements import MODIFICATION, enregistrer_changements
+from .journal import journaliser_transitions, ligne_transition
+from .models import Internship
+from .notifications import notifier_changements_statut
+
+
+# Effets sur les champs date
+MAINTENANT = 'maintenant'                # date et heure du changement
+AUJOURDHUI = 'aujourdhui'                # date du jour (champs DateField)
+SI_VIDE_MAINTENANT = 'si_vide_maintenant' # seulement si la date n'est pas encore renseignée
+SI_VIDE_AUJOURDHUI = 'si_vide_aujourdhui'
+EFFACER = 'effacer'
+
+# événement -> {statut de départ: (statut d'arrivée, {champ: effet})}
+TRANSITIONS = {
+    # L'étudiant soumet (ou modifie) ses propositions d'entreprises
+    'soumettre': {
+        'EN_ATTENTE_PROPOSITION': ('PROPOSITION_SOUMISE', {'date_proposition_soumise': MAINTENANT}),
+        'PROPOSITION_SOUMISE': ('PROPOSITION_SOUMISE', {'date_proposition_soumise': MAINTENANT}),
+    },
+    # L'étudiant retire toutes ses propositions
+    'retirer_proposition': {
+        'EN_ATTENTE_PROPOSITION': ('EN_ATTENTE_PROPOSITION', {'date_proposition_soumise': EFFACER}),
+        'PROPOSITION_SOUMISE': ('EN_ATTENTE_PROPOSITION', {'date_proposition_soumise': EFFACER}),
+    },
+    # Le facultaire valide l'entreprise, sans encadreur pour l'instant
+    'valider': {
+        'PROPOSITION_SOUMISE': ('PROPOSITION_VALIDEE', {'date_validation': MAINTENANT}),
+    },
+    # Le facultaire affecte (ou change) l'encadreur ; valide aussi l'entreprise si ce n'était pas fait
+    'affecter_encadreur': {
+        'PROPOSITION_SOUMISE': ('ENCADREUR_AFFECTE', {'date_validation': SI_VIDE_MAINTENANT, 'date_encadreur_affecte': MAINTENANT}),
+        'PROPOSITION_VALIDEE': ('ENCADREUR_AFFECTE', {'date_encadreur_affecte': MAINTENANT}),
+        'ENCADREUR_AFFECTE': ('ENCADREUR_AFFECTE', {'date_encadreur_affecte': MAINTENANT}),
+    },
+    'demarrer': {
+        'ENCADREUR_AFFECTE': ('EN_COURS', {'date_debut': SI_VIDE_AUJOURDHUI}),
+    },
+    # L'encadreur attribue (ou modifie) la note
+    'noter': {
+        'ENCADREUR_AFFECTE': ('TERMINE', {'date_notation': MAINTENANT}),
+        'EN_COURS': ('TERMINE', {'date_notation': MAINTENANT, 'date_fin': SI_VIDE_AUJOURDHUI}),
+        'TERMINE': ('TERMINE', {'date_notation': MAINTENANT}),
+    },
+    'annuler': {
+        statut: ('ANNULE', {}) for statut, _ in Internship.STATUT_CHOICES if statut not in ('TERMINE', 'ANNULE')
+    },
+}
+
+
+class TransitionInvalide(ValidationError):
+    """L'événement n'est pas permis depuis le statut actuel du stage."""
+
+
+class ModificationConcurrente(TransitionInvalide):
+    """Le stage a été modifié par quelqu'un d'autre depuis sa lecture (version périmée)."""
+
+    def __init__(self, message="Ce stage a été modifié par un autre utilisateur entre-temps ; rechargez le formulaire."):
+        super().__init__(message)
+
+
+def _regles(evenement):
+    try:
+        return TRANSITIONS[evenement]
+    except KeyError:
+        raise ValueError(f"Événement inconnu : '{evenement}' (choix : {', '.join(TRANSITIONS)}).") from None
+
+
+def peut(stage, evenement):
+    """Vrai si l'événement est permis depuis le statut actuel du stage."""
+    return stage.statut in _regles(evenement)
+
+
+def statuts_de_depart(evenement):
+    return list(_regles(evenement))
+
+
+def _valeur_python(effet, actuelle, maintenant):
+    if effet == MAINTENANT:
+        return maintenant
+    if effet == AUJOURDHUI:
+        return timezone.localdate(maintenant)
+    if effet == SI_VIDE_MAINTENANT:
+        return actuelle or maintenant
+    if effet == SI_VIDE_AUJOURDHUI:
+        return actuelle or timezone.localdate(maintenant)
+    return None  # EFFACER
+
+
+def _expression_sql(effet, champ, maintenant):
+    if effet == MAINTENANT:
+        return Value(maintenant)
+    if effet == AUJOURDHUI:
+        return Value(timezone.localdate(maintenant))
+    if effet == SI_VIDE_MAINTENANT:
+        return Coalesce(F(champ), Value(maintenant))
+    if effet == SI_VIDE_AUJOURDHUI:
+        return Coalesce(F(champ), Value(timezone.localdate(maintenant)))
+    return Value(None)  # EFFACER
+
+
+def _affectations_sql(regles, maintenant):
+    """Expressions SET de l'UPDATE : chaque champ dépend du statut de départ de la ligne (CASE WHEN)."""
+    affectations = {
+        'statut': Case(
+            *[When(statut=depart, then=Value(arrivee)) for depart, (arrivee, _) in regles.items()],
+            default=F('statut'), output_field=Internship._meta.get_field('statut'),
+        ),
+    }
+    champs = {champ for _, effets in regles.values() for champ in effets}
+    for champ in sorted(champs):
+        affectations[champ] = Case(
+            *[
+                When(statut=depart, then=_expression_sql(effets[champ], champ, maintenant))
+                for depart, (_, effets) in regles.items() if champ in effets
+            ],
+            default=F(champ), output_field=Internship._meta.get_field(champ),
+        )
+    # update() ne met pas à jour auto_now : indispensable pour les empreintes ETag et le cache des lignes
+    affectations['date_modification'] = maintenant
+    affectations['version'] = F('version') + 1
+    return affectations
+
+
+def transition_many(queryset, evenement, acteur=None, journaliser=True, notifier=True, **valeurs):
+    """
+    Applique `evenement` aux stages du queryset qui sont dans un statut de départ autorisé
+    (les autres sont ignorés), en une seule requête UPDATE. `valeurs` : autres champs à écrire
+    en même temps (ex: encadreur=..., note=...).
+
+    Les transitions sont inscrites au journal et les notifications mises en boîte d'envoi
+    en requêtes groupées, dans la même transaction. Retourne le nombre de stages modifiés.
+    """
+    regles = _regles(evenement)
+    maintenant = timezone.now()
+    eligibles = queryset.filter(statut__in=list(regles))
+
+    with transaction.atomic():
+        # Stages touchés et leurs statuts de départ (journal, notifications, flux des changements, diffusion),
+        # verrouillés jusqu'à la fin de la transaction si le journal ou les notifications en dépendent
+        # (sans effet sous SQLite)
+        selection = eligibles.select_for_update() if journaliser or notifier else eligibles
+        lus = list(selection.values_list('pk', 'statut', 'encadreur_id'))
+        if not lus:
+            return 0
+        anciens = {pk: statut for pk, statut, _ in lus}
+
+        nombre = eligibles.update(**_affectations_sql(regles, maintenant), **valeurs)
+        if nombre:
+            enregistrer_changements(Internship, anciens, MODIFICATION)
+            # L'ancien encadreur est aussi prévenu : la ligne quitte sa liste (voir diffusion.lignes_stages)
+            diffusion.signaler_stages(anciens, {pk: encadreur for pk, _, encadreur in lus})
+
+        changements = {pk: ancien for pk, ancien in anciens.items() if regles[ancien][0] != ancien}
+        if journaliser and changements:
+            acteur_id = acteur.pk if acteur is not None and acteur.is_authenticated else None
+            journaliser_transitions([
+                ligne_transition(pk, ancien, regles[ancien][0], acteur_id, maintenant)
+                for pk, ancien in changements.items()
+            ])
+        if notifier and changements:
+            stages = Internship.objects.filter(pk__in=list(changements)).select_related(
+                'etudiant__user', 'entreprise_selectionnee', 'encadreur'
+            )
+            notifier_changements_statut((stage, changements[stage.pk]) for stage in stages)
+
+    return nombre
+
+
+def transition(stage, evenement, acteur=None, enregistrer=True, version_attendue=None, **valeurs):
+    """
+    Applique `evenement` à un stage. Lève TransitionInvalide si le statut actuel ne le permet pas
+    (y compris si le stage a changé de statut entre-temps dans une autre requête), et
+    ModificationConcurrente si `version_attendue` est donnée et n'est plus la version en base.
+
+    enregistrer=True : écriture en base via transition_many() puis rechargement des champs modifiés.
+    enregistrer=False : modification de l'instance en mémoire seulement (formulaire save(commit=False)).
+    Retourne le statut de départ.
+    """
+    regles = _regles(evenement)
+    ancien_statut = stage.statut
+    if ancien_statut not in regles:
+        raise TransitionInvalide(
+            f"Action impossible : le stage est au statut « {stage.get_statut_display()} »."
+        )
+    arrivee, effets = regles[ancien_statut]
+
+    if not enregistrer:
+        maintenant = timezone.now()
+        stage.statut = arrivee
+        for champ, effet in effets.items():
+            setattr(stage, champ, _valeur_python(effet, getattr(stage, champ), maintenant))
+        for champ, valeur in valeurs.items():
+            setattr(stage, champ, valeur)
+        return ancien_statut
+
+    queryset = Internship.objects.filter(pk=stage.pk, statut=ancien_statut)
+    if version_attendue is not None:
+        queryset = queryset.filter(version=version_attendue)
+    if not transition_many(queryset, evenement, acteur=acteur, **valeurs):
+        if version_attendue is not None:
+            raise ModificationConcurrente()
+        raise TransitionInvalide("Le statut de ce stage a été modifié entre-temps ; rechargez la page.")
+    stage.refresh_from_db(fields=['statut', 'date_modification', 'version', *effets, *valeurs])
+    return ancien_statut
+
+
+def mettre_a_jour(stage, version_attendue=None, **valeurs):
+    """
+    Écrit seulement les champs `valeurs` du stage (sans changement de statut), en une requête UPDATE
+    conditionnée à `version_attendue` si elle est donnée. Lève ModificationConcurrente si le stage
+    a été modifié entre-temps. Met à jour l'instance et retourne la nouvelle version.
+    """
+    queryset = Internship.objects.filter(pk=stage.pk)
+    if version_attendue is not None:
+        queryset = queryset.filter(version=version_attendue)
+    anciens_encadreurs = None
+    if 'encadreur' in valeurs or 'encadreur_id' in valeurs:
+        # L'instance porte déjà le nouvel encadreur (formulaire save(commit=False)) : l'ancien est relu
+        anciens_encadreurs = dict(queryset.values_list('pk', 'encadreur_id'))
+    maintenant = timezone.now()
+    if not queryset.update(**valeurs, date_modification=maintenant, version=F('version') + 1):
+        raise ModificationConcurrente()
+    enregistrer_changements(Internship, [stage.pk], MODIFICATION)
+    diffusion.signaler_stages([stage.pk], anciens_encadreurs)
+    for champ, valeur in valeurs.items():
+        setattr(stage, champ, valeur)
+    stage.date_modification = maintenant
+    stage.refresh_from_db(fields=['version'])
+    return stage.version
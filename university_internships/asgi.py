@@ -12,5 +12,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "university_internships.settings")
+# Sous ASGI, les tableaux de bord et les listes sont servis par les vues asynchrones (settings.VUES_ASYNCHRONES)
+os.environ.setdefault("VUES_ASYNCHRONES", "True")
 
 application = get_asgi_application()
+
+# Profil de production : compiler tous les templates au démarrage du worker
+from django.conf import settings  # noqa: E402
+
+if settings.PRECHARGER_GABARITS:
+    from internships.gabarits import precharger_gabarits  # noqa: E402
+    precharger_gabarits()
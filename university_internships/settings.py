@@ -67,6 +67,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware", # Supporte les messages flash
     "django.middleware.clickjacking.XFrameOptionsMiddleware", # Protection contre le clickjacking
+    "internships.repliques.ecritures_recentes", # Lire ses propres écritures malgré la réplique (voir repliques.py)
     # Ajoutez d'autres middlewares ici si nécessaire (ex: WhiteNoise pour les statiques en prod)
 ]
 
@@ -79,12 +80,14 @@ TEMPLATES = [
         # Utile pour les templates de projet qui ne sont pas spécifiques à une app (ex: templates génériques d'erreurs 404/500)
         "DIRS": [BASE_DIR / 'templates'], # Optionnel: créez un dossier 'templates' à la racine du projet si besoin
         "APP_DIRS": True, # Cherche automatiquement les templates dans les sous-dossiers 'templates' des applications installées
+        # (remplacé par des chargeurs explicites dans le profil de production, voir plus bas)
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug", # Utile en DEBUG=True
                 "django.template.context_processors.request", # Nécessaire pour certains fonctionnalités (ex: CSRF)
                 "django.contrib.auth.context_processors.auth", # Fournit le contexte 'user'
                 "django.contrib.messages.context_processors.messages", # Fournit le contexte 'messages'
+                "internships.annees.contexte_annee", # Sélecteur d'année académique des facultaires
                 # Ajoutez d'autres context processors si nécessaire
             ],
             # Options pour les balises et filtres de templates
@@ -96,6 +99,29 @@ TEMPLATES = [
     },
 ]
 
+# --- Profil de production des templates ---
+# Chargeur en cache explicite : chaque template n'est compilé qu'une fois par processus.
+# Avec PRECHARGER_GABARITS, wsgi.py / asgi.py compilent tous les templates de l'application
+# au démarrage du worker (durée affichée dans les logs) au lieu de la première requête.
+GABARITS_PRODUCTION = os.getenv("GABARITS_PRODUCTION", str(not DEBUG)).lower() == "true"
+PRECHARGER_GABARITS = os.getenv("PRECHARGER_GABARITS", str(GABARITS_PRODUCTION)).lower() == "true"
+
+# Tableaux de bord et listes en vues asynchrones (internships/vues_async.py) ; asgi.py l'active par défaut,
+# les vues synchrones restent servies sous WSGI
+VUES_ASYNCHRONES = os.getenv("VUES_ASYNCHRONES", "False").lower() == "true"
+# Diffuseur des mises à jour en direct des listes de stages (internships/diffusion.py) : le diffuseur
+# local suffit avec un seul worker ASGI ; plusieurs workers demandent une classe sur un canal partagé
+DIFFUSEUR_EVENEMENTS = "internships.diffusion.DiffuseurLocal"
+
+if GABARITS_PRODUCTION:
+    TEMPLATES[0]["APP_DIRS"] = False # Incompatible avec l'option 'loaders'
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("django.template.loaders.cached.Loader", [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ]),
+    ]
+
 WSGI_APPLICATION = "university_internships.wsgi.application"
 
 
@@ -109,16 +135,30 @@ DATABASES = {
     }
 }
 
-# Exemple de configuration pour PostgreSQL en production (utilisant des variables d'environnement)
-# if not DEBUG: # Appliquer cette config seulement en production
-#     DATABASES["default"] = {
-#         "ENGINE": "django.db.backends.postgresql",
-#         "NAME": os.getenv("DB_NAME", "university_internships_db"), # Nom de la base de données
-#         "USER": os.getenv("DB_USER", "db_user"),             # Utilisateur de la base de données
-#         "PASSWORD": os.getenv("DB_PASSWORD", "your_password"),     # Mot de passe de la base de données
-#         "HOST": os.getenv("DB_HOST", "localhost"),           # Hôte de la base de données (IP ou nom d'hôte)
-#         "PORT": os.getenv("DB_PORT", ""),                    # Port de la base de données (laisser vide pour le défaut)
-#     }
+# PostgreSQL (production, ou test de charge avec `DB_MOTEUR=postgresql manage.py test_de_charge`) :
+# configuration lue dans les variables d'environnement
+if os.getenv("DB_MOTEUR", "sqlite") == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("DB_NAME", "university_internships_db"), # Nom de la base de données
+        "USER": os.getenv("DB_USER", "db_user"),             # Utilisateur de la base de données
+        "PASSWORD": os.getenv("DB_PASSWORD", ""),            # Mot de passe de la base de données
+        "HOST": os.getenv("DB_HOST", "localhost"),           # Hôte de la base de données (IP ou nom d'hôte)
+        "PORT": os.getenv("DB_PORT", ""),                    # Port de la base de données (laisser vide pour le défaut)
+    }
+
+# Réplique en lecture (voir internships/repliques.py) : listes, tableaux de bord, rapports et exports y lisent.
+# SQLite : DB_REPLIQUE est le chemin du second fichier (`manage.py synchroniser_replique` le recopie) ;
+# PostgreSQL : l'hôte de la réplique, mêmes identifiants que la base principale.
+if os.getenv("DB_REPLIQUE"):
+    DATABASES["replique"] = {
+        **DATABASES["default"],
+        ("HOST" if DATABASES["default"]["ENGINE"].endswith("postgresql") else "NAME"): os.getenv("DB_REPLIQUE"),
+        "TEST": {"MIRROR": "default"}, # Tests : la réplique est la base de test principale
+    }
+DATABASE_ROUTERS = ["internships.repliques.RouteurRepliques"]
+# Durée pendant laquelle un navigateur qui vient d'écrire lit sur la base principale (retard de réplication toléré)
+REPLIQUE_DELAI_COLLANT_SECONDES = int(os.getenv("REPLIQUE_DELAI_COLLANT_SECONDES", 10))
 
 
 # --- Validation du Mot de Passe ---
@@ -211,19 +251,24 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 # --- Configuration des Emails ---
 # Nécessaire pour la réinitialisation de mot de passe, confirmation email, etc.
 
-# En développement, utilisez le backend console pour voir les emails dans la console
-# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-
-# En production, configurez un vrai serveur SMTP
-# Assurez-vous d'utiliser des variables d'environnement pour les identifiants
-# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-# EMAIL_HOST = os.getenv("EMAIL_HOST")
-# EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587)) # Port SMTP (ex: 587 pour TLS, 465 pour SSL)
-# EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True").lower() == "true" # Utiliser TLS ?
-# EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "False").lower() == "true" # Utiliser SSL ?
-# EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER") # Votre nom d'utilisateur SMTP
-# EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD") # Votre mot de passe SMTP
-# DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@votreapp.com") # Adresse email par défaut pour l'envoi
+# Backend choisi par variable d'environnement :
+# - développement (DEBUG=True) : console par défaut, ou fichiers (EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend + EMAIL_FILE_PATH)
+# - tests : locmem (utilisé automatiquement par le lanceur de tests de Django)
+# - production (DEBUG=False) : SMTP par défaut ; jamais la console, qui marquerait les e-mails envoyés sans les envoyer
+# Les notifications de statut ne sont jamais envoyées pendant la requête : voir `manage.py envoyer_notifications`.
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend" if DEBUG else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH", os.path.join(BASE_DIR, "emails_envoyes"))
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587)) # Port SMTP (ex: 587 pour TLS, 465 pour SSL)
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True").lower() == "true" # Utiliser TLS ?
+EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "False").lower() == "true" # Utiliser SSL ?
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "") # Votre nom d'utilisateur SMTP
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "") # Votre mot de passe SMTP
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 30)) # Un serveur SMTP bloqué ne doit pas figer le processus d'envoi
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@votreapp.com") # Adresse email par défaut pour l'envoi
 
 
 # --- Paramètres d'Administration ---
@@ -238,4 +283,103 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Ajoutez d'autres paramètres globaux ici si nécessaire
 # Par exemple, des constantes comme le nombre maximum de propositions, la note maximale, etc.
 # MAX_PROPOSALS = 2
-# MAX_GRADE = 100
\ No newline at end of file
+# MAX_GRADE = 100
+
+# --- Requêtes conditionnelles (ETag / Last-Modified) ---
+# Intégré à l'empreinte des listes et tableaux de bord : changer cette valeur à chaque
+# déploiement invalide les pages que les navigateurs gardent en cache (templates modifiés).
+VERSION_APPLICATION = os.getenv("VERSION_APPLICATION", "")
+
+
+# --- Cache ---
+# "fragments" contient le HTML des lignes de listes (une entrée par ligne et par version).
+# En production avec plusieurs workers, préférez un cache partagé (Redis, Memcached).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments-lignes",
+        "OPTIONS": {"MAX_ENTRIES": 50000}, # Assez pour plusieurs listes de milliers de lignes
+    },
+}
+FRAGMENTS_CACHE_ALIAS = "fragments"
+FRAGMENTS_CACHE_DUREE = 60 * 60 * 24 # Secondes ; la version de la ligne invalide déjà les entrées obsolètes
+
+
+# --- Journalisation ---
+# Affiche les messages INFO de l'application (ex: durée de préchargement des templates)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "internships": {"handlers": ["console"], "level": os.getenv("NIVEAU_LOG", "INFO")},
+    },
+}
+
+
+# --- Budget de démarrage ---
+# Temps d'import maximal de internships.views (commande `manage.py mesurer_import_vues`, à lancer en CI)
+BUDGET_IMPORT_VUES_MS = float(os.getenv("BUDGET_IMPORT_VUES_MS", "100"))
+
+
+# --- Rapports PDF ---
+# Moteur par rapport : "xhtml2pdf" (template HTML) ou "reportlab" (tableaux natifs, plus rapide)
+MOTEURS_RAPPORTS_PDF = {
+    "affectations": os.getenv("MOTEUR_RAPPORT_AFFECTATIONS", "xhtml2pdf"),
+}
+# Nombre de processus pour les rapports découpés par promotion (défaut : nombre de CPU)
+RAPPORTS_WORKERS = int(os.getenv("RAPPORTS_WORKERS", "0")) or None
+# Plafond dans une requête HTTP (1 : parties rendues l'une après l'autre, sans processus). Les gros
+# rapports passent par la commande `manage.py rapport_affectations`, qui utilise RAPPORTS_WORKERS.
+RAPPORTS_WORKERS_REQUETE = int(os.getenv("RAPPORTS_WORKERS_REQUETE", "1"))
+# Démarrage des processus des pools (rapports, documents, signatures) : "spawn" ou "forkserver".
+# "fork" copie un processus serveur multi-threadé et peut bloquer sur un verrou hérité.
+RAPPORTS_CONTEXTE_PROCESSUS = os.getenv("RAPPORTS_CONTEXTE_PROCESSUS", "spawn")
+
+
+# --- Documents individuels ---
+# Adresse publique du site, préfixée aux URL de vérification imprimées dans les codes QR
+URL_PUBLIQUE = os.getenv("URL_PUBLIQUE", "http://127.0.0.1:8000")
+# Dossier de sortie par défaut de `manage.py generer_documents` (un sous-dossier par type)
+DOCUMENTS_DOSSIER = os.getenv("DOCUMENTS_DOSSIER", os.path.join(BASE_DIR, "documents_generes"))
+
+
+# --- Signature des PDF (pyHanko) ---
+# Clé PKCS#12 (SIGNATURE_PKCS12) ou clé + certificat PEM (SIGNATURE_CLE / SIGNATURE_CERTIFICAT).
+# Sans clé configurée, les PDF sont produits sans signature. Clé de test : `manage.py creer_cle_signature <dossier>`
+SIGNATURE_PKCS12 = os.getenv("SIGNATURE_PKCS12") or None
+SIGNATURE_CLE = os.getenv("SIGNATURE_CLE") or None
+SIGNATURE_CERTIFICAT = os.getenv("SIGNATURE_CERTIFICAT") or None
+SIGNATURE_MOT_DE_PASSE = os.getenv("SIGNATURE_MOT_DE_PASSE") or None
+# Certificats intermédiaires à joindre à la signature (chemins séparés par des virgules)
+SIGNATURE_CHAINE = [c for c in os.getenv("SIGNATURE_CHAINE", "").split(",") if c]
+# Certificats de confiance pour la vérification locale (défaut : le certificat de signature)
+SIGNATURE_CERTIFICATS_CONFIANCE = [c for c in os.getenv("SIGNATURE_CERTIFICATS_CONFIANCE", "").split(",") if c]
+SIGNATURE_CHAMP = "Signature"
+SIGNATURE_RAISON = "Document officiel de la Faculté"
+SIGNATURE_LIEU = os.getenv("SIGNATURE_LIEU") or None
+
+
+# --- Journal des transitions de statut ---
+# Durée de conservation en base (`manage.py purger_transitions`, à planifier ; --archiver pour garder un CSV)
+RETENTION_TRANSITIONS_JOURS = int(os.getenv("RETENTION_TRANSITIONS_JOURS", 5 * 365))
+
+# --- Idempotence des envois de formulaires ---
+# Durée de conservation des clés (`manage.py purger_cles_idempotence`, à planifier) :
+# un double envoi ou une nouvelle tentative est reconnu pendant ce délai
+RETENTION_CLES_IDEMPOTENCE_HEURES = int(os.getenv("RETENTION_CLES_IDEMPOTENCE_HEURES", 24))
+
+# --- Flux des changements (synchronisation des systèmes externes) ---
+# Durée de conservation (`manage.py flux_changements --purger`, à planifier) : un consommateur plus en retard
+# doit refaire une synchronisation complète
+RETENTION_CHANGEMENTS_JOURS = int(os.getenv("RETENTION_CHANGEMENTS_JOURS", 90))
+
+# --- Année académique de travail des facultaires ---
+# Année par défaut des listes et du tableau de bord (voir internships/annees.py) ; sans valeur,
+# la plus récente des promotions non archivées. Chaque facultaire peut en choisir une autre.
+ANNEE_ACADEMIQUE_COURANTE = os.getenv("ANNEE_ACADEMIQUE_COURANTE") or None
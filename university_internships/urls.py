@@ -46,6 +46,12 @@ urlpatterns = [
     path('enseignant/', include('internships.urls_teacher')),
     path('etudiant/', include('internships.urls_student')),
 
+    # API JSON versionnée (systèmes externes, ex: scolarité)
+    path('api/v1/', include('internships.urls_api')),
+
+
+    # Vérification publique des documents émis (cible des codes QR imprimés)
+    path('documents/verifier/<str:type_document>/<int:pk>/<str:code>/', views.verifier_document, name='verifier_document'),
 
     # Redirection de la racine vers la page de connexion ou le tableau de bord par défaut après connexion
     path('', RedirectView.as_view(pattern_name='login'), name='home'), # Redirige la racine vers la connexion
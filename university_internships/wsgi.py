@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "university_internships.settings")
 
 application = get_wsgi_application()
+
+# Profil de production : compiler tous les templates au démarrage du worker
+from django.conf import settings  # noqa: E402
+
+if settings.PRECHARGER_GABARITS:
+    from internships.gabarits import precharger_gabarits  # noqa: E402
+    precharger_gabarits()